@@ -8,6 +8,10 @@ from frappe import _
 import pymysql
 import traceback
 from o2o_erpnext.config.ssh_tunnel_manager import SSHTunnelManager
+from o2o_erpnext.config.connection_pool import close_pool, get_all_pools_status
+from o2o_erpnext.config import circuit_breaker
+from o2o_erpnext.config.tunnel_supervisor import get_tunnel_health
+from o2o_erpnext.config import query_instrumentation
 
 
 @frappe.whitelist()
@@ -58,6 +62,9 @@ def stop_ssh_tunnel(connection_name):
     try:
         result = SSHTunnelManager.stop_tunnel(connection_name)
         
+        # Pooled connections ride on the stopped tunnel
+        close_pool(connection_name)
+        
         if result['success']:
             frappe.msgprint(
                 _('SSH Tunnel stopped successfully'),
@@ -107,6 +114,172 @@ def get_ssh_tunnel_status(connection_name):
         }
 
 
+@frappe.whitelist()
+def get_connection_pool_status():
+    """
+    Get occupancy of the portal connection pools in this worker
+    
+    Returns:
+        dict: Pool status per Database Connection
+    """
+    try:
+        return {
+            'success': True,
+            'pools': get_all_pools_status(),
+            'tunnels': SSHTunnelManager.get_all_tunnels_status()
+        }
+        
+    except Exception as e:
+        frappe.log_error(
+            message=f"Get Connection Pool Status Error: {str(e)}\n{traceback.format_exc()}",
+            title="Get Connection Pool Status Failed"
+        )
+        return {
+            'success': False,
+            'message': str(e)
+        }
+
+
+@frappe.whitelist()
+def get_portal_tunnel_health():
+    """
+    Get SSH tunnel health as published by each worker's tunnel supervisor
+    
+    Returns:
+        dict: Health entries per worker and connection
+    """
+    try:
+        return {
+            'success': True,
+            'health': get_tunnel_health()
+        }
+        
+    except Exception as e:
+        frappe.log_error(
+            message=f"Get Portal Tunnel Health Error: {str(e)}\n{traceback.format_exc()}",
+            title="Get Portal Tunnel Health Failed"
+        )
+        return {
+            'success': False,
+            'message': str(e)
+        }
+
+
+@frappe.whitelist()
+def get_portal_query_stats(minutes=15):
+    """
+    Get portal query timings per endpoint over a rolling window
+    
+    Args:
+        minutes (int): Size of the rolling window
+        
+    Returns:
+        dict: Count, latency percentiles, rows and reuse ratios per endpoint
+    """
+    frappe.only_for("System Manager")
+    try:
+        return {
+            'success': True,
+            'minutes': int(minutes),
+            'slow_query_threshold_ms': query_instrumentation.get_instrumentation_settings()['portal_slow_query_threshold_ms'],
+            'endpoints': query_instrumentation.get_query_stats(minutes)
+        }
+        
+    except Exception as e:
+        frappe.log_error(
+            message=f"Get Portal Query Stats Error: {str(e)}\n{traceback.format_exc()}",
+            title="Get Portal Query Stats Failed"
+        )
+        return {
+            'success': False,
+            'message': str(e)
+        }
+
+
+@frappe.whitelist()
+def get_portal_query_metrics(minutes=15):
+    """
+    Prometheus text endpoint for portal query timings
+    
+    Scrape /api/method/o2o_erpnext.api.database_connection_api.get_portal_query_metrics
+    with a System Manager API key.
+    
+    Args:
+        minutes (int): Size of the rolling window
+        
+    Returns:
+        Response: text/plain exposition format
+    """
+    from werkzeug.wrappers import Response
+    
+    frappe.only_for("System Manager")
+    return Response(
+        query_instrumentation.render_prometheus(int(minutes)),
+        mimetype="text/plain; version=0.0.4; charset=utf-8"
+    )
+
+
+@frappe.whitelist()
+def get_portal_circuit_status():
+    """
+    Get state of the shared portal circuit breaker
+    
+    Returns:
+        dict: Breaker state and settings
+    """
+    try:
+        return {
+            'success': True,
+            'circuit': circuit_breaker.get_breaker_status()
+        }
+        
+    except Exception as e:
+        frappe.log_error(
+            message=f"Get Portal Circuit Status Error: {str(e)}\n{traceback.format_exc()}",
+            title="Get Portal Circuit Status Failed"
+        )
+        return {
+            'success': False,
+            'message': str(e)
+        }
+
+
+@frappe.whitelist()
+def reset_portal_circuit():
+    """
+    Force the portal circuit breaker closed
+    
+    Returns:
+        dict: Success status
+    """
+    frappe.only_for("System Manager")
+    circuit_breaker.reset_breaker()
+    return {
+        'success': True,
+        'message': 'Portal circuit breaker reset'
+    }
+
+
+@frappe.whitelist()
+def rebuild_portal_statistics():
+    """
+    Rebuild the cached portal invoice statistics in the background
+    
+    Returns:
+        dict: Success status
+    """
+    frappe.only_for("System Manager")
+    frappe.enqueue(
+        'o2o_erpnext.config.portal_statistics.refresh_portal_statistics',
+        queue='long',
+        full=True
+    )
+    return {
+        'success': True,
+        'message': 'Portal statistics rebuild queued'
+    }
+
+
 @frappe.whitelist()
 def get_all_ssh_connections():
     """
@@ -289,6 +462,7 @@ def restart_ssh_tunnel(connection_name):
     try:
         # Stop tunnel if active
         stop_result = SSHTunnelManager.stop_tunnel(connection_name)
+        close_pool(connection_name)
         
         # Wait a moment
         import time
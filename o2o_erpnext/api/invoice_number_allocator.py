@@ -0,0 +1,506 @@
+"""
+Invoice Number Allocator Module
+Block-leased allocation of AGO2O invoice numbers from the portal invoice_counter
+
+Instead of a portal round trip per Purchase Invoice autoname, a worker process
+leases a block of numbers in one transaction and hands them out locally:
+
+- numbers released to invoice_number_gap are reclaimed first, lowest first,
+- the rest of the block is reserved with a single atomic
+  UPDATE invoice_counter SET last_number = LAST_INSERT_ID(last_number + n),
+- every lease is recorded in invoice_number_lease with an expiry.
+
+Table creation and the counter backfill from purchase_requisitions live in
+bootstrap_invoice_counter, which runs once per (prefix, financial year) and
+is cached, so it stays off the naming path. bench o2o-invoice-counter
+inspects, bootstraps, resyncs and reclaims series.
+
+A worker stops handing out a block when its lease expires. The scheduled
+reclaim step returns numbers of expired leases that neither ERPNext nor the
+portal used to invoice_number_gap, so numbering stays dense when blocks are
+only partly used (worker restarts, failed inserts).
+"""
+
+import os
+import socket
+import threading
+import time
+
+import frappe
+import pymysql.cursors
+
+from frappe.utils import add_to_date, cint, now_datetime
+
+from o2o_erpnext.api.php_portal_invoices import like_prefix
+from o2o_erpnext.config.external_db_updated import (
+    get_active_database_connection,
+    get_external_db_connection
+)
+
+# Allocator defaults - each can be overridden in site_config.json
+DEFAULT_ALLOCATOR_SETTINGS = {
+    'invoice_number_block_size': 10,     # Numbers leased per round trip
+    'invoice_number_lease_ttl': 300,     # Seconds a worker may hand out a leased block
+    'invoice_number_reclaim_grace': 600  # Seconds after expiry before unused numbers are reclaimed
+}
+
+COUNTER_TABLE_DDL = """
+    CREATE TABLE IF NOT EXISTS invoice_counter (
+        id INT PRIMARY KEY AUTO_INCREMENT,
+        prefix VARCHAR(20) NOT NULL DEFAULT 'AGO2O',
+        financial_year VARCHAR(10) NOT NULL,
+        last_number INT NOT NULL DEFAULT 0,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+        UNIQUE KEY unique_prefix_year (prefix, financial_year)
+    )
+"""
+
+LEASE_TABLE_DDL = """
+    CREATE TABLE IF NOT EXISTS invoice_number_lease (
+        id INT PRIMARY KEY AUTO_INCREMENT,
+        prefix VARCHAR(20) NOT NULL,
+        financial_year VARCHAR(10) NOT NULL,
+        start_number INT NOT NULL,
+        end_number INT NOT NULL,
+        worker VARCHAR(140) NOT NULL,
+        leased_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        expires_at DATETIME NOT NULL,
+        KEY idx_lease_expiry (expires_at)
+    )
+"""
+
+GAP_TABLE_DDL = """
+    CREATE TABLE IF NOT EXISTS invoice_number_gap (
+        prefix VARCHAR(20) NOT NULL,
+        financial_year VARCHAR(10) NOT NULL,
+        number INT NOT NULL,
+        released_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        PRIMARY KEY (prefix, financial_year, number)
+    )
+"""
+
+BOOTSTRAP_CACHE_KEY = 'o2o_invoice_counter_bootstrapped'
+BOOTSTRAP_CACHE_TTL = 7 * 24 * 3600
+GAPS_CACHE_KEY = 'o2o_invoice_number_gaps'
+
+# Series bootstrapped as seen by this process (cache keys)
+_bootstrapped = set()
+
+# Numbers leased by this process: (connection, prefix, financial_year) ->
+# {'numbers': [...], 'expires': monotonic deadline}
+_leases = {}
+_leases_lock = threading.Lock()
+
+
+def get_allocator_settings():
+    """
+    Get allocator settings from site config, falling back to defaults
+
+    Returns:
+        dict: Allocator settings
+    """
+    conf = frappe.conf or {}
+    return {key: conf.get(key, default) for key, default in DEFAULT_ALLOCATOR_SETTINGS.items()}
+
+
+def get_worker_id():
+    """Identifier of this worker process in invoice_number_lease"""
+    return f"{socket.gethostname()}:{os.getpid()}"[:140]
+
+
+def allocate_invoice_number(prefix='AGO2O', financial_year='25-26', fast_fail=False):
+    """
+    Get the next invoice number of a series, leasing a new block when needed
+
+    Args:
+        prefix (str): Invoice prefix (default: 'AGO2O')
+        financial_year (str): Financial year (default: '25-26')
+        fast_fail (bool): Honour the portal circuit breaker (naming inside a user request)
+
+    Returns:
+        int: Invoice serial number
+    """
+    key = (get_active_database_connection()['name'], prefix, financial_year)
+
+    with _leases_lock:
+        lease = _leases.get(key)
+        if not lease or not lease['numbers'] or time.monotonic() >= lease['expires']:
+            lease = _leases[key] = lease_number_block(prefix, financial_year, fast_fail=fast_fail)
+        return lease['numbers'].pop(0)
+
+
+def lease_number_block(prefix, financial_year, fast_fail=False):
+    """
+    Lease a block of numbers: released gaps first, then a fresh range from the counter
+
+    The series is bootstrapped at most once per cache lifetime; after that a
+    lease is the counter UPDATE and the lease row, plus the gap claim while
+    the reclaim step has flagged released numbers.
+
+    Returns:
+        dict: numbers (ascending) and expires (monotonic deadline)
+    """
+    settings = get_allocator_settings()
+    block_size = max(cint(settings['invoice_number_block_size']), 1)
+    ttl = cint(settings['invoice_number_lease_ttl'])
+    connection_name = get_active_database_connection()['name']
+    gaps_key = series_cache_key(GAPS_CACHE_KEY, connection_name, prefix, financial_year)
+
+    with get_external_db_connection(fast_fail=fast_fail) as conn:
+        with conn.cursor(pymysql.cursors.DictCursor) as cursor:
+            if not is_bootstrapped(connection_name, prefix, financial_year):
+                bootstrap_invoice_counter(prefix, financial_year, conn=conn)
+
+            try:
+                numbers = []
+                if frappe.cache().get_value(gaps_key):
+                    numbers = claim_gaps(cursor, prefix, financial_year, block_size)
+                    if len(numbers) < block_size:
+                        # A flag lost to a race with the reclaim step is set again by its next run
+                        frappe.cache().delete_value(gaps_key)
+
+                ranges = [(number, number) for number in numbers]
+                remaining = block_size - len(numbers)
+                if remaining:
+                    end_number = reserve_range(cursor, prefix, financial_year, remaining)
+                    if end_number is None:
+                        # Counter row gone (or a new financial year on a stale cache).
+                        # The rollback puts claimed gaps back, so the whole block comes from the counter
+                        conn.rollback()
+                        if numbers:
+                            frappe.cache().set_value(gaps_key, 1)
+                        numbers, ranges, remaining = [], [], block_size
+                        bootstrap_invoice_counter(prefix, financial_year, conn=conn)
+                        end_number = reserve_range(cursor, prefix, financial_year, remaining)
+                        if end_number is None:
+                            raise Exception(f"Invoice counter for {prefix}/{financial_year} is missing")
+                    ranges.append((end_number - remaining + 1, end_number))
+                    numbers.extend(range(end_number - remaining + 1, end_number + 1))
+
+                expires_at = add_to_date(now_datetime(), seconds=ttl)
+                cursor.executemany("""
+                    INSERT INTO invoice_number_lease
+                        (prefix, financial_year, start_number, end_number, worker, expires_at)
+                    VALUES (%s, %s, %s, %s, %s, %s)
+                """, [(prefix, financial_year, start, end, get_worker_id(), expires_at) for start, end in ranges])
+
+                conn.commit()
+            except Exception:
+                conn.rollback()
+                raise
+
+    frappe.logger().info(f"Leased invoice numbers {numbers[0]}-{numbers[-1]} of {prefix}/{financial_year}")
+    return {'numbers': numbers, 'expires': time.monotonic() + ttl}
+
+
+def claim_gaps(cursor, prefix, financial_year, limit):
+    """
+    Take up to limit released numbers of a series, lowest first
+
+    A concurrent lease waits on the locked gap rows and then skips the ones
+    deleted here. SKIP LOCKED is not used, as older portal servers (before
+    MySQL 8.0 / MariaDB 10.6) reject it.
+    """
+    cursor.execute("""
+        SELECT number FROM invoice_number_gap
+        WHERE prefix = %s AND financial_year = %s
+        ORDER BY number
+        LIMIT %s
+        FOR UPDATE
+    """, (prefix, financial_year, limit))
+    numbers = [row['number'] for row in cursor.fetchall()]
+    if numbers:
+        cursor.execute(
+            f"DELETE FROM invoice_number_gap WHERE prefix = %s AND financial_year = %s "
+            f"AND number IN ({', '.join(['%s'] * len(numbers))})",
+            [prefix, financial_year] + numbers
+        )
+    return numbers
+
+
+def reserve_range(cursor, prefix, financial_year, count):
+    """
+    Advance the counter by count in one atomic statement
+
+    LAST_INSERT_ID(expr) hands the new value back with the UPDATE's own
+    response (cursor.lastrowid), so no follow-up SELECT is needed.
+
+    Returns:
+        int: Last number of the reserved range, or None when the counter row is missing
+    """
+    cursor.execute("""
+        UPDATE invoice_counter
+        SET last_number = LAST_INSERT_ID(last_number + %s)
+        WHERE prefix = %s AND financial_year = %s
+    """, (count, prefix, financial_year))
+    if not cursor.rowcount:
+        return None
+    return cursor.lastrowid
+
+
+def series_cache_key(base, connection_name, prefix, financial_year):
+    return f"{base}:{connection_name}:{prefix}:{financial_year}"
+
+
+def is_bootstrapped(connection_name, prefix, financial_year):
+    """Whether the series was bootstrapped on this portal, per worker then per site cache"""
+    key = series_cache_key(BOOTSTRAP_CACHE_KEY, connection_name, prefix, financial_year)
+    if key in _bootstrapped:
+        return True
+    if frappe.cache().get_value(key):
+        _bootstrapped.add(key)
+        return True
+    return False
+
+
+def bootstrap_invoice_counter(prefix='AGO2O', financial_year='25-26', conn=None):
+    """
+    Create the allocator tables and the series' counter row when missing.
+    Idempotent: an existing counter is never changed.
+
+    Runs from the post-model-sync patch for the current financial year and
+    from the first lease of a series not yet bootstrapped (e.g. a new
+    financial year). The outcome is cached per portal connection.
+
+    Args:
+        prefix (str): Invoice prefix (default: 'AGO2O')
+        financial_year (str): Financial year (default: '25-26')
+        conn: Open portal connection to use (optional)
+
+    Returns:
+        int: Counter value of the series
+    """
+    if conn is None:
+        with get_external_db_connection() as conn:
+            return bootstrap_invoice_counter(prefix, financial_year, conn=conn)
+
+    with conn.cursor(pymysql.cursors.DictCursor) as cursor:
+        for ddl in (COUNTER_TABLE_DDL, LEASE_TABLE_DDL, GAP_TABLE_DDL):
+            cursor.execute(ddl)
+
+        cursor.execute("""
+            INSERT IGNORE INTO invoice_counter (prefix, financial_year, last_number)
+            SELECT %s, %s, COALESCE(MAX(CAST(SUBSTRING_INDEX(invoice_number, '/', -1) AS UNSIGNED)), 0)
+            FROM purchase_requisitions
+            WHERE invoice_number LIKE %s
+        """, (prefix, financial_year, like_prefix(f"{prefix}/{financial_year}/")))
+
+        cursor.execute(
+            "SELECT last_number FROM invoice_counter WHERE prefix = %s AND financial_year = %s",
+            (prefix, financial_year)
+        )
+        last_number = cursor.fetchone()['last_number']
+    conn.commit()
+
+    key = series_cache_key(BOOTSTRAP_CACHE_KEY, get_active_database_connection()['name'], prefix, financial_year)
+    frappe.cache().set_value(key, 1, expires_in_sec=BOOTSTRAP_CACHE_TTL)
+    _bootstrapped.add(key)
+
+    frappe.logger().info(f"Invoice counter {prefix}/{financial_year} bootstrapped at {last_number}")
+    return last_number
+
+
+def reclaim_invoice_number_gaps():
+    """
+    Return unused numbers of expired leases to invoice_number_gap.
+    Runs from the scheduler.
+
+    A number counts as used when a Purchase Invoice or a portal requisition
+    carries it. Leases are only considered invoice_number_reclaim_grace
+    seconds after expiry, so no insert that took a number can still be running.
+
+    Every run also flags each series that still has released numbers, so a
+    gaps flag lost to a cache flush or a race with a lease is restored.
+
+    Returns:
+        dict: leases and numbers reclaimed
+    """
+    grace = cint(get_allocator_settings()['invoice_number_reclaim_grace'])
+    cutoff = add_to_date(now_datetime(), seconds=-grace)
+    reclaimed = {'leases': 0, 'numbers': 0}
+    connection_name = get_active_database_connection()['name']
+
+    with get_external_db_connection() as conn:
+        with conn.cursor(pymysql.cursors.DictCursor) as cursor:
+            cursor.execute(LEASE_TABLE_DDL)
+            cursor.execute(GAP_TABLE_DDL)
+            cursor.execute("""
+                SELECT id, prefix, financial_year, start_number, end_number
+                FROM invoice_number_lease
+                WHERE expires_at < %s
+                ORDER BY prefix, financial_year, start_number
+            """, (cutoff,))
+            leases = cursor.fetchall()
+
+            by_series = {}
+            for lease in leases:
+                by_series.setdefault((lease['prefix'], lease['financial_year']), []).append(lease)
+
+            for (prefix, financial_year), series_leases in by_series.items():
+                low = min(lease['start_number'] for lease in series_leases)
+                high = max(lease['end_number'] for lease in series_leases)
+                used = get_used_numbers(cursor, prefix, financial_year, low, high)
+
+                unused = sorted({
+                    number
+                    for lease in series_leases
+                    for number in range(lease['start_number'], lease['end_number'] + 1)
+                    if number not in used
+                })
+                if unused:
+                    cursor.executemany("""
+                        INSERT IGNORE INTO invoice_number_gap (prefix, financial_year, number)
+                        VALUES (%s, %s, %s)
+                    """, [(prefix, financial_year, number) for number in unused])
+
+                lease_ids = [lease['id'] for lease in series_leases]
+                cursor.execute(
+                    f"DELETE FROM invoice_number_lease WHERE id IN ({', '.join(['%s'] * len(lease_ids))})",
+                    lease_ids
+                )
+                conn.commit()
+
+                reclaimed['leases'] += len(series_leases)
+                reclaimed['numbers'] += len(unused)
+
+            # invoice_number_gap is the durable record; the cache flag only saves leases a query
+            cursor.execute("SELECT DISTINCT prefix, financial_year FROM invoice_number_gap")
+            for series in cursor.fetchall():
+                frappe.cache().set_value(
+                    series_cache_key(GAPS_CACHE_KEY, connection_name, series['prefix'], series['financial_year']), 1
+                )
+
+    if reclaimed['numbers']:
+        frappe.logger().info(f"Reclaimed {reclaimed['numbers']} unused invoice numbers from {reclaimed['leases']} leases")
+    return reclaimed
+
+
+def get_used_numbers(cursor, prefix, financial_year, low, high):
+    """
+    Serial numbers of a series between low and high used in ERPNext or the portal
+
+    Returns:
+        set: Used serial numbers
+    """
+    pattern = like_prefix(f"{prefix}/{financial_year}/")
+
+    used = set(frappe.db.sql_list("""
+        SELECT CAST(SUBSTRING_INDEX(name, '/', -1) AS UNSIGNED)
+        FROM `tabPurchase Invoice`
+        WHERE name LIKE %s
+        AND CAST(SUBSTRING_INDEX(name, '/', -1) AS UNSIGNED) BETWEEN %s AND %s
+    """, (pattern, low, high)))
+
+    cursor.execute("""
+        SELECT CAST(SUBSTRING_INDEX(invoice_number, '/', -1) AS UNSIGNED) as number
+        FROM purchase_requisitions
+        WHERE invoice_number LIKE %s
+        AND CAST(SUBSTRING_INDEX(invoice_number, '/', -1) AS UNSIGNED) BETWEEN %s AND %s
+    """, (pattern, low, high))
+    used.update(row['number'] for row in cursor.fetchall())
+
+    return {int(number) for number in used}
+
+
+def get_invoice_counter_status(prefix='AGO2O', financial_year='25-26'):
+    """
+    State of a series: counter, open leases, gaps and the highest numbers in use
+
+    Returns:
+        dict: Series status; in_sync is False when a used number is above the counter
+    """
+    with get_external_db_connection(read_only=True) as conn:
+        with conn.cursor(pymysql.cursors.DictCursor) as cursor:
+            cursor.execute(
+                "SELECT last_number, created_at, updated_at FROM invoice_counter "
+                "WHERE prefix = %s AND financial_year = %s",
+                (prefix, financial_year)
+            )
+            counter = cursor.fetchone()
+
+            cursor.execute("""
+                SELECT COUNT(*) as leases, COALESCE(SUM(end_number - start_number + 1), 0) as numbers
+                FROM invoice_number_lease
+                WHERE prefix = %s AND financial_year = %s
+            """, (prefix, financial_year))
+            leases = cursor.fetchone()
+
+            cursor.execute(
+                "SELECT COUNT(*) as gaps FROM invoice_number_gap WHERE prefix = %s AND financial_year = %s",
+                (prefix, financial_year)
+            )
+            gaps = cursor.fetchone()['gaps']
+
+            cursor.execute("""
+                SELECT invoice_number, order_code, created_at
+                FROM purchase_requisitions
+                WHERE invoice_number LIKE %s
+                ORDER BY created_at DESC
+                LIMIT 5
+            """, (like_prefix(f"{prefix}/{financial_year}/"),))
+            recent = cursor.fetchall()
+
+            max_used = get_max_used_number(cursor, prefix, financial_year)
+
+    last_number = counter['last_number'] if counter else None
+    return {
+        'prefix': prefix,
+        'financial_year': financial_year,
+        'bootstrapped': bool(counter),
+        'last_number': last_number,
+        'updated_at': counter['updated_at'] if counter else None,
+        'open_leases': leases['leases'],
+        'leased_numbers': int(leases['numbers']),
+        'gaps': gaps,
+        'max_used': max_used,
+        'in_sync': counter is not None and last_number >= max_used,
+        'recent_portal_invoices': recent
+    }
+
+
+def resync_invoice_counter(prefix='AGO2O', financial_year='25-26'):
+    """
+    Raise a series' counter to the highest number used in ERPNext or the portal.
+    The counter is never lowered, as that would hand out used numbers again.
+
+    Returns:
+        dict: Counter before and after
+    """
+    bootstrap_invoice_counter(prefix, financial_year)
+
+    with get_external_db_connection() as conn:
+        with conn.cursor(pymysql.cursors.DictCursor) as cursor:
+            max_used = get_max_used_number(cursor, prefix, financial_year)
+            cursor.execute(
+                "SELECT last_number FROM invoice_counter WHERE prefix = %s AND financial_year = %s FOR UPDATE",
+                (prefix, financial_year)
+            )
+            before = cursor.fetchone()['last_number']
+            cursor.execute("""
+                UPDATE invoice_counter SET last_number = GREATEST(last_number, %s)
+                WHERE prefix = %s AND financial_year = %s
+            """, (max_used, prefix, financial_year))
+        conn.commit()
+
+    return {'before': before, 'after': max(before, max_used), 'max_used': max_used}
+
+
+def get_max_used_number(cursor, prefix, financial_year):
+    """Highest serial of a series carried by a Purchase Invoice or a portal requisition"""
+    pattern = like_prefix(f"{prefix}/{financial_year}/")
+
+    erpnext_max = frappe.db.sql("""
+        SELECT MAX(CAST(SUBSTRING_INDEX(name, '/', -1) AS UNSIGNED))
+        FROM `tabPurchase Invoice`
+        WHERE name LIKE %s
+    """, (pattern,))[0][0]
+
+    cursor.execute("""
+        SELECT MAX(CAST(SUBSTRING_INDEX(invoice_number, '/', -1) AS UNSIGNED)) as max_number
+        FROM purchase_requisitions
+        WHERE invoice_number LIKE %s
+    """, (pattern,))
+    portal_max = cursor.fetchone()['max_number']
+
+    return max(cint(erpnext_max), cint(portal_max))
@@ -0,0 +1,346 @@
+"""
+Invoice Reconciliation Module
+Checksum-based reconciliation of portal invoices (purchase_requisitions) against
+ERPNext Purchase Invoices (matched by title)
+
+Both MySQL servers aggregate their invoices into buckets and return only
+COUNT(*) and SUM(CRC32(invoice_number)) per bucket (invoice_number|amount
+with compare_totals). Buckets whose
+count and checksum agree are done; only differing buckets are split into
+their sub-buckets, and only differing leaf buckets are fetched row by row.
+The data transferred and compared in Python therefore grows with the number
+of discrepancies rather than with the number of invoices, and every
+drill-down query is restricted to its parent bucket with an index-friendly
+condition (number prefix or date range).
+
+Bucket levels:
+- series: series (e.g. AGO2O/25-26) > block of 1000 numbers > block of 100 numbers,
+          for numbers of the form PREFIX/FY/SERIAL
+- day:    month > day, of the portal requisition date (PORTAL_INVOICE_DATE_SQL)
+          and ERPNext posting_date; pushes write posting_date into
+          requisition_at and imports set posting_date from it
+
+Totals are not compared by default: invoices pushed from ERPNext carry no
+purchase_order_items on the portal, so only invoices imported with their
+items have a total on both sides.
+"""
+
+import frappe
+import pymysql.cursors
+
+from frappe import _
+from frappe.utils import add_days, add_months, cint, getdate
+
+from o2o_erpnext.api.php_portal_invoices import PORTAL_INVOICE_DATE_SQL, like_prefix
+from o2o_erpnext.config.external_db_updated import get_external_db_connection
+
+# Amount compared per invoice, rounded the same way on both servers
+AMOUNT_SQL = "CAST(ROUND({0}, 2) AS DECIMAL(18, 2))"
+
+
+def _serial(column):
+    """Serial part of an invoice number such as AGO2O/25-26/0046"""
+    return f"CAST(SUBSTRING_INDEX({column}, '/', -1) AS UNSIGNED)"
+
+
+def _series_filter(column):
+    return lambda value: (f"{column} LIKE %s", [like_prefix(f"{value}/")])
+
+
+def _block_filter(column, size):
+    return lambda value: (f"{_serial(column)} BETWEEN %s AND %s", [int(value) * size, int(value) * size + size - 1])
+
+
+def _month_filter(column):
+    def condition(value):
+        start = getdate(f"{value}-01")
+        return f"{column} >= %s AND {column} < %s", [start, add_months(start, 1)]
+    return condition
+
+
+def _day_filter(column):
+    def condition(value):
+        day = getdate(value)
+        return f"{column} >= %s AND {column} < %s", [day, add_days(day, 1)]
+    return condition
+
+
+def _bucket_levels(bucket_by):
+    """
+    Levels of a bucketing mode, coarsest first
+
+    Each side of a level has the expression computing a row's bucket and a
+    function building the WHERE condition that selects one bucket.
+
+    Returns:
+        list: dicts with name, portal and erpnext (expression, filter)
+    """
+    portal_number, erpnext_number = 'pr.invoice_number', 'title'
+    if bucket_by == 'series':
+        return [
+            {
+                'name': 'series',
+                'portal': (f"SUBSTRING_INDEX({portal_number}, '/', 2)", _series_filter(portal_number)),
+                'erpnext': (f"SUBSTRING_INDEX({erpnext_number}, '/', 2)", _series_filter(erpnext_number))
+            },
+            {
+                'name': 'block_1000',
+                'portal': (f"FLOOR({_serial(portal_number)} / 1000)", _block_filter(portal_number, 1000)),
+                'erpnext': (f"FLOOR({_serial(erpnext_number)} / 1000)", _block_filter(erpnext_number, 1000))
+            },
+            {
+                'name': 'block_100',
+                'portal': (f"FLOOR({_serial(portal_number)} / 100)", _block_filter(portal_number, 100)),
+                'erpnext': (f"FLOOR({_serial(erpnext_number)} / 100)", _block_filter(erpnext_number, 100))
+            }
+        ]
+
+    if bucket_by == 'day':
+        portal_date, erpnext_date = PORTAL_INVOICE_DATE_SQL, 'posting_date'
+        return [
+            {
+                'name': 'month',
+                'portal': (f"DATE_FORMAT({portal_date}, '%%Y-%%m')", _month_filter(portal_date)),
+                'erpnext': (f"DATE_FORMAT({erpnext_date}, '%%Y-%%m')", _month_filter(erpnext_date))
+            },
+            {
+                'name': 'day',
+                'portal': (portal_date, _day_filter(portal_date)),
+                'erpnext': (erpnext_date, _day_filter(erpnext_date))
+            }
+        ]
+
+    frappe.throw(_("Bucket by must be 'series' or 'day'"))
+
+
+@frappe.whitelist()
+def reconcile_portal_invoices(prefix='AGO2O/', bucket_by='series', compare_totals=0):
+    """
+    Reconcile portal invoices with ERPNext Purchase Invoices
+
+    Args:
+        prefix (str): Invoice number prefix to reconcile, e.g. 'AGO2O/25-26/'
+        bucket_by (str): 'series' or 'day'
+        compare_totals (bool): Also include the invoice total (portal item
+            total_amt vs ERPNext grand_total) in the checksum. Only meaningful
+            for invoices imported with their items; pushed invoices have no
+            portal items. Off by default: only invoice numbers are reconciled
+
+    Returns:
+        dict: Discrepancies (missing_in_erpnext, extra_in_erpnext,
+            amount_mismatches, duplicates_in_erpnext, duplicates_in_portal),
+            the mismatched buckets and query statistics
+    """
+    try:
+        levels = _bucket_levels(bucket_by)
+
+        with get_external_db_connection(read_only=True) as conn:
+            with conn.cursor(pymysql.cursors.DictCursor) as cursor:
+                return InvoiceReconciler(cursor, prefix, levels, cint(compare_totals)).run()
+
+    except Exception as e:
+        frappe.log_error(
+            message=f"Error reconciling portal invoices: {str(e)}",
+            title="Invoice Reconciliation Error"
+        )
+        return {
+            'success': False,
+            'message': f'Failed to reconcile invoices: {str(e)}',
+            'error': str(e)
+        }
+
+
+class InvoiceReconciler:
+    """
+    One reconciliation run over a portal cursor
+
+    Usage:
+        InvoiceReconciler(cursor, 'AGO2O/', _bucket_levels('series'), True).run()
+    """
+
+    def __init__(self, cursor, prefix, levels, compare_totals):
+        self.cursor = cursor
+        self.prefix = prefix or ''
+        self.levels = levels
+        self.compare_totals = compare_totals
+        self.stats = {'queries': 0, 'buckets_compared': 0, 'buckets_mismatched': 0, 'rows_compared': 0}
+        self.mismatched_buckets = []
+        self.result = {
+            'missing_in_erpnext': [],
+            'extra_in_erpnext': [],
+            'amount_mismatches': [],
+            'duplicates_in_erpnext': [],
+            'duplicates_in_portal': []
+        }
+
+    def run(self):
+        """
+        Compare bucket checksums level by level, then diff the rows of the
+        leaf buckets that still differ
+
+        Returns:
+            dict: See reconcile_portal_invoices()
+        """
+        paths = [()]
+        for depth in range(len(self.levels)):
+            next_paths = []
+            for path in paths:
+                portal = self.portal_buckets(path, depth)
+                erpnext = self.erpnext_buckets(path, depth)
+                for bucket in sorted(set(portal) | set(erpnext), key=str):
+                    self.stats['buckets_compared'] += 1
+                    if portal.get(bucket) != erpnext.get(bucket):
+                        next_paths.append(path + (bucket,))
+            paths = next_paths
+            if not paths:
+                break
+
+        for path in paths:
+            self.stats['buckets_mismatched'] += 1
+            self.mismatched_buckets.append(self.describe(path))
+            self.diff_rows(path)
+
+        summary = {key: len(value) for key, value in self.result.items()}
+        return {
+            'success': True,
+            'in_sync': not paths,
+            'message': 'Portal and ERPNext invoices match' if not paths else
+                f"{sum(summary.values())} discrepancies in {len(paths)} buckets",
+            'summary': dict(summary, **self.stats),
+            'mismatched_buckets': self.mismatched_buckets,
+            **self.result
+        }
+
+    def describe(self, path):
+        return {self.levels[depth]['name']: value for depth, value in enumerate(path)}
+
+    def rows_query(self, side, path, bucket_depth=None):
+        """
+        Per-invoice rows of a bucket path, optionally with their bucket at a deeper level
+
+        Args:
+            side (str): 'portal' or 'erpnext'
+            path (tuple): Bucket values from the top level down
+            bucket_depth (int): Level whose bucket is selected as `bucket`
+
+        Returns:
+            tuple: (query, params)
+        """
+        conditions, params = [], []
+        for depth, value in enumerate(path):
+            expression, condition = self.levels[depth][side]
+            if value is None:
+                conditions.append(f"{expression} IS NULL")
+            else:
+                sql, values = condition(value)
+                conditions.append(sql)
+                params.extend(values)
+
+        bucket = f", {self.levels[bucket_depth][side][0]} as bucket" if bucket_depth is not None else ""
+
+        if side == 'portal':
+            amount = AMOUNT_SQL.format("COALESCE(SUM(poi.total_amt), 0)") if self.compare_totals else "''"
+            items_join = "LEFT JOIN purchase_order_items poi ON poi.purchase_order_id = pr.id" if self.compare_totals else ""
+            query = f"""
+                SELECT pr.id, pr.invoice_number, {amount} as amount{bucket}
+                FROM purchase_requisitions pr
+                {items_join}
+                WHERE pr.is_delete = 0 AND pr.invoice_number LIKE %s
+                {''.join(f' AND {condition}' for condition in conditions)}
+                GROUP BY pr.id
+            """
+        else:
+            amount = AMOUNT_SQL.format("grand_total") if self.compare_totals else "''"
+            query = f"""
+                SELECT name, title as invoice_number, {amount} as amount{bucket}
+                FROM `tabPurchase Invoice`
+                WHERE docstatus < 2 AND title LIKE %s
+                {''.join(f' AND {condition}' for condition in conditions)}
+            """
+
+        return query, [like_prefix(self.prefix)] + params
+
+    def checksum_query(self, side, path, depth):
+        rows_sql, params = self.rows_query(side, path, bucket_depth=depth)
+        return f"""
+            SELECT bucket, COUNT(*) as row_count,
+                   SUM(CRC32(CONCAT_WS('|', invoice_number, amount))) as checksum
+            FROM ({rows_sql}) invoices
+            GROUP BY bucket
+        """, params
+
+    def portal_buckets(self, path, depth):
+        self.cursor.execute(*self.checksum_query('portal', path, depth))
+        self.stats['queries'] += 1
+        return {self.bucket_key(row['bucket']): (int(row['row_count']), int(row['checksum'] or 0))
+                for row in self.cursor.fetchall()}
+
+    def erpnext_buckets(self, path, depth):
+        rows = frappe.db.sql(*self.checksum_query('erpnext', path, depth), as_dict=True)
+        self.stats['queries'] += 1
+        return {self.bucket_key(row.bucket): (int(row.row_count), int(row.checksum or 0)) for row in rows}
+
+    @staticmethod
+    def bucket_key(value):
+        """Bucket values compared across servers: dates and numbers as strings"""
+        return None if value is None else str(value)
+
+    def diff_rows(self, path):
+        """Fetch both sides of one leaf bucket and record its discrepancies"""
+        self.cursor.execute(*self.rows_query('portal', path))
+        portal, portal_duplicates = {}, {}
+        for row in self.cursor.fetchall():
+            if row['invoice_number'] in portal:
+                portal_duplicates.setdefault(row['invoice_number'], [portal[row['invoice_number']]['id']]).append(row['id'])
+            portal.setdefault(row['invoice_number'], row)
+
+        erpnext = {}
+        for row in frappe.db.sql(*self.rows_query('erpnext', path), as_dict=True):
+            erpnext.setdefault(row.invoice_number, []).append(row)
+
+        self.stats['queries'] += 2
+        self.stats['rows_compared'] += len(portal) + sum(len(rows) for rows in erpnext.values())
+
+        bucket = self.describe(path)
+        for invoice_number, portal_ids in portal_duplicates.items():
+            self.result['duplicates_in_portal'].append({
+                'invoice_number': invoice_number,
+                'portal_ids': portal_ids,
+                'bucket': bucket
+            })
+
+        for invoice_number, row in portal.items():
+            matches = erpnext.get(invoice_number)
+            if not matches:
+                self.result['missing_in_erpnext'].append({
+                    'invoice_number': invoice_number,
+                    'portal_id': row['id'],
+                    'portal_amount': float(row['amount']) if self.compare_totals else None,
+                    'bucket': bucket
+                })
+                continue
+
+            if len(matches) > 1:
+                self.result['duplicates_in_erpnext'].append({
+                    'invoice_number': invoice_number,
+                    'erpnext_names': [match.name for match in matches],
+                    'bucket': bucket
+                })
+
+            if self.compare_totals and all(match.amount != row['amount'] for match in matches):
+                self.result['amount_mismatches'].append({
+                    'invoice_number': invoice_number,
+                    'portal_id': row['id'],
+                    'portal_amount': float(row['amount']),
+                    'erpnext_name': matches[0].name,
+                    'erpnext_amount': float(matches[0].amount),
+                    'bucket': bucket
+                })
+
+        for invoice_number, matches in erpnext.items():
+            if invoice_number not in portal:
+                self.result['extra_in_erpnext'].append({
+                    'invoice_number': invoice_number,
+                    'erpnext_names': [match.name for match in matches],
+                    'bucket': bucket
+                })
@@ -1,9 +1,17 @@
 import frappe
 import pymysql
 from frappe import _
+from frappe.utils import cint, getdate
 from datetime import datetime
 import pymysql.cursors
-from o2o_erpnext.config.external_db_updated import get_external_db_connection
+from o2o_erpnext.config.external_db_updated import (
+    get_external_db_connection,
+    run_portal_queries,
+    stream_portal_query
+)
+from o2o_erpnext.config.portal_statistics import get_portal_statistics
+from o2o_erpnext.api.portal_import_batch import ImportBatch
+from o2o_erpnext.api.portal_import_resolver import EntityResolver, ExistingInvoiceResolver
 
 def safe_date_format(date_value, format_string='%Y-%m-%d %H:%M:%S'):
     """
@@ -38,17 +46,293 @@ def safe_date_format(date_value, format_string='%Y-%m-%d %H:%M:%S'):
     except:
         return str(date_value) if date_value else ''
 
-def validate_invoice_prerequisites(invoice_data):
+def like_prefix(value):
+    """
+    LIKE pattern matching values that start with value
+    
+    Prefix patterns are served by a range scan on an index over the column
+    (see config/portal_indexes.py), unlike '%value%'.
+    
+    Args:
+        value (str): Literal prefix; LIKE wildcards in it are escaped
+        
+    Returns:
+        str: Pattern such as 'AGO2O/25-26/%'
+    """
+    escaped = str(value).replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+    return f"{escaped}%"
+
+def unique_by_invoice_number(rows):
+    """
+    Yield (invoice_number, row) for the first row of each invoice number
+
+    Args:
+        rows (iterable): Portal rows, typically a streamed cursor
+
+    Yields:
+        tuple: (invoice_number, row)
+    """
+    seen = set()
+    for row in rows:
+        invoice_number = row['invoice_number']
+        if invoice_number in seen:
+            continue
+        seen.add(invoice_number)
+        yield invoice_number, row
+
+def resolve_existing_in_chunks(grouped_rows, chunk_size=500):
+    """
+    Attach the batch-resolved existing invoices to (invoice_number, row) pairs
+    
+    Args:
+        grouped_rows (iterable): Pairs from unique_by_invoice_number
+        chunk_size (int): Pairs resolved per ExistingInvoiceResolver query
+        
+    Yields:
+        tuple: (invoice_number, row, ExistingInvoiceResolver)
+    """
+    chunk = []
+    for pair in grouped_rows:
+        chunk.append(pair)
+        if len(chunk) >= chunk_size:
+            existing_invoices = ExistingInvoiceResolver.load(titles=[number for number, _row in chunk])
+            for invoice_number, row in chunk:
+                yield invoice_number, row, existing_invoices
+            chunk = []
+    
+    if chunk:
+        existing_invoices = ExistingInvoiceResolver.load(titles=[number for number, _row in chunk])
+        for invoice_number, row in chunk:
+            yield invoice_number, row, existing_invoices
+
+# Requisition ids per purchase_order_items IN (...) query
+PORTAL_ITEMS_BATCH_SIZE = 1000
+
+# Requisition columns shaped into invoices by format_portal_invoice()
+PORTAL_INVOICE_COLUMNS = """
+    pr.id as requisition_id,
+    pr.order_name,
+    pr.entity,
+    pr.subentity_id,
+    pr.delivery_date,
+    pr.validity_date,
+    pr.order_code,
+    pr.address,
+    pr.remark,
+    pr.acknowledgement,
+    pr.order_status,
+    pr.status as requisition_status,
+    pr.created_at as requisition_date,
+    pr.created_by,
+    pr.invoice_number,
+    pr.invoice_generated,
+    pr.invoice_generated_at,
+    pr.requisition_at
+"""
+
+# Date of a requisition that an ERPNext Purchase Invoice carries as posting_date.
+# Pushes from ERPNext write posting_date into requisition_at and imports set
+# posting_date from it (with set_posting_time, so validate keeps it), so both
+# sides bucket by the same day in reconciliation
+PORTAL_INVOICE_DATE_SQL = "DATE(COALESCE(pr.requisition_at, pr.created_at))"
+
+def portal_invoice_date(requisition):
+    """
+    Posting date of the Purchase Invoice imported from a requisition row
+    (see PORTAL_INVOICE_DATE_SQL)
+    
+    Returns:
+        str: Date as YYYY-MM-DD, or None when the row carries no date
+    """
+    value = requisition.get('requisition_at') or requisition.get('created_at') or requisition.get('requisition_date')
+    return str(getdate(value)) if value else None
+
+def fetch_requisition_items(cursor, requisition_ids):
+    """
+    Fetch the items of many requisitions with one IN query per batch of ids
+    
+    Args:
+        cursor: Portal DictCursor
+        requisition_ids (list): purchase_requisitions ids
+        
+    Returns:
+        dict: requisition id -> list of item rows (ordered by item id)
+    """
+    items_by_requisition = {requisition_id: [] for requisition_id in requisition_ids}
+    
+    for i in range(0, len(requisition_ids), PORTAL_ITEMS_BATCH_SIZE):
+        batch = requisition_ids[i:i + PORTAL_ITEMS_BATCH_SIZE]
+        placeholders = ', '.join(['%s'] * len(batch))
+        cursor.execute(f"""
+            SELECT 
+                poi.id as item_id,
+                poi.purchase_order_id,
+                poi.category_id,
+                poi.subcategory_id,
+                poi.product_id,
+                poi.vendor_id,
+                poi.brand_id,
+                poi.quantity,
+                poi.unit_rate,
+                poi.uom,
+                poi.total_amt,
+                poi.gst_amt,
+                poi.cost,
+                poi.status as item_status,
+                v.name as vendor_name,
+                v.code as vendor_code,
+                v.email as vendor_email,
+                v.gstn as vendor_gstn
+            FROM purchase_order_items poi
+            LEFT JOIN vendors v ON poi.vendor_id = v.id
+            WHERE poi.purchase_order_id IN ({placeholders})
+            ORDER BY poi.purchase_order_id, poi.id
+        """, batch)
+        
+        for item in cursor.fetchall():
+            items_by_requisition.setdefault(item['purchase_order_id'], []).append(item)
+    
+    return items_by_requisition
+
+def fetch_requisition_totals(cursor, requisition_ids):
+    """
+    Fetch item totals of many requisitions with one GROUP BY query per batch of ids
+    
+    Args:
+        cursor: Portal DictCursor
+        requisition_ids (list): purchase_requisitions ids
+        
+    Returns:
+        dict: requisition id -> totals row; requisitions without items are absent
+    """
+    totals_by_requisition = {}
+    
+    for i in range(0, len(requisition_ids), PORTAL_ITEMS_BATCH_SIZE):
+        batch = requisition_ids[i:i + PORTAL_ITEMS_BATCH_SIZE]
+        placeholders = ', '.join(['%s'] * len(batch))
+        cursor.execute(f"""
+            SELECT 
+                poi.purchase_order_id,
+                COUNT(poi.id) as total_items,
+                SUM(poi.total_amt) as total_amount,
+                SUM(poi.gst_amt) as total_gst,
+                GROUP_CONCAT(DISTINCT v.name SEPARATOR ', ') as vendor_names,
+                GROUP_CONCAT(DISTINCT v.code SEPARATOR ', ') as vendor_codes
+            FROM purchase_order_items poi
+            LEFT JOIN vendors v ON poi.vendor_id = v.id
+            WHERE poi.purchase_order_id IN ({placeholders})
+            GROUP BY poi.purchase_order_id
+        """, batch)
+        
+        for totals in cursor.fetchall():
+            totals_by_requisition[totals['purchase_order_id']] = totals
+    
+    return totals_by_requisition
+
+def summarize_requisition_items(items):
+    """
+    Compute the totals row of a requisition from its item rows, matching what
+    fetch_requisition_totals returns for it
+    
+    Args:
+        items (list): Item rows from fetch_requisition_items
+        
+    Returns:
+        dict: total_items, total_amount, total_gst, vendor_names, vendor_codes
+    """
+    vendor_names = sorted({item['vendor_name'] for item in items if item['vendor_name']})
+    vendor_codes = sorted({item['vendor_code'] for item in items if item['vendor_code']})
+    
+    return {
+        'total_items': len(items),
+        'total_amount': sum(float(item['total_amt']) for item in items if item['total_amt'] is not None) if items else None,
+        'total_gst': sum(float(item['gst_amt']) for item in items if item['gst_amt'] is not None) if items else None,
+        'vendor_names': ', '.join(vendor_names) or None,
+        'vendor_codes': ', '.join(vendor_codes) or None
+    }
+
+def format_portal_item(item):
+    """Shape a purchase_order_items row for the portal invoice listing"""
+    return {
+        'item_id': item['item_id'],
+        'category_id': item['category_id'],
+        'subcategory_id': item['subcategory_id'],
+        'product_id': item['product_id'],
+        'vendor_id': item['vendor_id'],
+        'brand_id': item['brand_id'],
+        'quantity': float(item['quantity']) if item['quantity'] else 0.0,
+        'unit_rate': float(item['unit_rate']) if item['unit_rate'] else 0.0,
+        'uom': item['uom'] or 'Nos',
+        'total_amount': float(item['total_amt']) if item['total_amt'] else 0.0,
+        'gst_amount': float(item['gst_amt']) if item['gst_amt'] else 0.0,
+        'cost': float(item['cost']) if item['cost'] else 0.0,
+        'status': item['item_status'],
+        'vendor_name': item['vendor_name'] or 'Unknown Vendor',
+        'vendor_code': item['vendor_code'] or '',
+        'vendor_email': item['vendor_email'] or '',
+        'vendor_gstn': item['vendor_gstn'] or ''
+    }
+
+def format_portal_invoice(req, totals):
+    """
+    Shape a requisition row and its totals for the portal invoice listing
+    
+    Args:
+        req (dict): Row selected by get_recent_portal_invoices
+        totals (dict): Totals row, or None when the requisition has no items
+        
+    Returns:
+        dict: Invoice summary
+    """
+    totals = totals or {}
+    total_amount = totals.get('total_amount')
+    total_gst = totals.get('total_gst')
+    
+    return {
+        'invoice_id': req['requisition_id'],
+        'invoice_number': req['order_code'],
+        'order_name': req['order_name'],
+        'customer_name': req['entity'],
+        'customer_id': req['subentity_id'],
+        'created_date': safe_date_format(req['requisition_date']),
+        'due_date': safe_date_format(req['delivery_date'], '%Y-%m-%d'),
+        'validity_date': safe_date_format(req['validity_date'], '%Y-%m-%d'),
+        'address': req['address'] or '',
+        'remark': req['remark'] or '',
+        'acknowledgement': req['acknowledgement'],
+        'order_status': req['order_status'],
+        'status': req['requisition_status'],
+        'created_by': req['created_by'],
+        'portal_invoice_number': req['invoice_number'] or '',
+        'invoice_generated': bool(req['invoice_generated']),
+        'invoice_generated_at': safe_date_format(req['invoice_generated_at']),
+        'posting_date': portal_invoice_date(req),
+        'total_items': totals.get('total_items') or 0,
+        'total_amount': float(total_amount) if total_amount else 0.0,
+        'total_gst': float(total_gst) if total_gst else 0.0,
+        'grand_total': float(total_amount or 0) + float(total_gst or 0),
+        'vendor_names': totals.get('vendor_names') or 'No Vendors',
+        'vendor_codes': totals.get('vendor_codes') or ''
+    }
+
+def validate_invoice_prerequisites(invoice_data, existing_invoices=None, entities=None):
     """
     Comprehensive validation for invoice import prerequisites
     Checks if customer, supplier, branch, sub-branch exist in ERPNext
     
     Args:
         invoice_data (dict): Invoice data from portal
+        existing_invoices (ExistingInvoiceResolver): Batch-resolved existing invoices,
+            looked up individually when not given
+        entities (EntityResolver): Batch-preloaded master records,
+            looked up individually when not given
         
     Returns:
         dict: Validation results with missing entities and suggestions
     """
+    if entities is None:
+        entities = EntityResolver(preload=False)
+    
     # Debug logging
     invoice_ref = invoice_data.get('invoice_number', invoice_data.get('order_code', 'Unknown'))
     frappe.logger().info(f"🔍 Validating prerequisites for invoice: {invoice_ref}")
@@ -76,10 +360,7 @@ def validate_invoice_prerequisites(invoice_data):
     
     if customer_name:
         # Check if customer exists in ERPNext
-        existing_customer = frappe.get_all('Customer', 
-                                         filters={'customer_name': customer_name},
-                                         limit=1)
-        if not existing_customer:
+        if not entities.exists('Customer', customer_name):
             frappe.logger().info(f"❌ Customer '{customer_name}' not found in ERPNext")
             validation_result['missing_entities']['customers'].append({
                 'name': customer_name,
@@ -105,10 +386,7 @@ def validate_invoice_prerequisites(invoice_data):
     
     if entity_code or branch_name or vendor_names:
         supplier_name = branch_name or entity_code or vendor_names
-        existing_supplier = frappe.get_all('Supplier', 
-                                         filters={'supplier_name': supplier_name},
-                                         limit=1)
-        if not existing_supplier:
+        if not entities.exists('Supplier', supplier_name):
             frappe.logger().info(f"❌ Supplier '{supplier_name}' not found in ERPNext")
             validation_result['missing_entities']['suppliers'].append({
                 'name': supplier_name,
@@ -125,10 +403,7 @@ def validate_invoice_prerequisites(invoice_data):
     
     # 3. Check Branch (Company in ERPNext)
     if branch_name:
-        existing_company = frappe.get_all('Company', 
-                                        filters={'company_name': branch_name},
-                                        limit=1)
-        if not existing_company:
+        if not entities.exists('Company', branch_name):
             validation_result['missing_entities']['branches'].append({
                 'name': branch_name,
                 'code': entity_code
@@ -142,16 +417,9 @@ def validate_invoice_prerequisites(invoice_data):
     sub_branch_name = invoice_data.get('sub_branch_name')
     
     if subentity_code and sub_branch_name:
-        # Check Cost Center first
-        existing_cost_center = frappe.get_all('Cost Center', 
-                                            filters={'cost_center_name': sub_branch_name},
-                                            limit=1)
-        if not existing_cost_center:
-            # Check Department as alternative
-            existing_department = frappe.get_all('Department', 
-                                               filters={'department_name': sub_branch_name},
-                                               limit=1)
-            if not existing_department:
+        # Check Cost Center first, Department as alternative
+        if not entities.exists('Cost Center', sub_branch_name):
+            if not entities.exists('Department', sub_branch_name):
                 validation_result['missing_entities']['sub_branches'].append({
                     'name': sub_branch_name,
                     'code': subentity_code
@@ -164,10 +432,9 @@ def validate_invoice_prerequisites(invoice_data):
     invoice_number = invoice_data.get('invoice_number', '')
     if invoice_number.startswith('AGO2O'):
         # Check if this invoice already exists
-        existing_invoice = frappe.get_all('Purchase Invoice', 
-                                        filters={'title': invoice_number},
-                                        limit=1)
-        if existing_invoice:
+        if existing_invoices is None:
+            existing_invoices = ExistingInvoiceResolver.load(titles=[invoice_number])
+        if existing_invoices.by_title(invoice_number):
             validation_result['warnings'].append(
                 f"Invoice '{invoice_number}' already exists in ERPNext. Consider skipping or updating."
             )
@@ -311,7 +578,7 @@ def validate_and_suggest_entities(invoice_data):
                 """
 
                 # Execute SQL with external DB connection
-                with get_external_db_connection() as conn:
+                with get_external_db_connection(read_only=True) as conn:
                     with conn.cursor(pymysql.cursors.DictCursor) as cursor:
                         cursor.execute(query, (limit,))
                         invoices = cursor.fetchall()
@@ -366,124 +633,118 @@ def check_database_structure_and_data():
     Check the remote database structure and recent data to understand invoice numbering
     """
     try:
-        with get_external_db_connection() as conn:
-            with conn.cursor(pymysql.cursors.DictCursor) as cursor:
-                
-                result = {
-                    'success': True,
-                    'database_info': {},
-                    'recent_data': {},
-                    'invoice_patterns': []
-                }
-                
-                # 1. Check purchase_requisitions table structure
-                cursor.execute('DESCRIBE purchase_requisitions')
-                fields = cursor.fetchall()
-                result['database_info']['purchase_requisitions_fields'] = [
-                    {'field': f['Field'], 'type': f['Type'], 'null': f['Null'], 'key': f['Key']} 
-                    for f in fields
-                ]
-                
-                # 2. Get recent purchase requisitions data
-                cursor.execute('''
-                    SELECT id, order_name, order_code, invoice_number, invoice_series, 
-                           entity, subentity_id, delivery_date, created_at, 
-                           invoice_generated, invoice_generated_at, status
-                    FROM purchase_requisitions 
-                    WHERE is_delete = 0 
-                    ORDER BY id DESC 
-                    LIMIT 20
-                ''')
-                recent_requisitions = cursor.fetchall()
-                result['recent_data']['purchase_requisitions'] = [
-                    {
-                        'id': r['id'],
-                        'order_name': r['order_name'],
-                        'order_code': r['order_code'],
-                        'invoice_number': r['invoice_number'],
-                        'invoice_series': r['invoice_series'],
-                        'entity': r['entity'],
-                        'created_at': safe_date_format(r['created_at']),
-                        'status': r['status']
-                    } for r in recent_requisitions
-                ]
-                
-                # 3. Check if there are other tables that might contain invoice data
-                cursor.execute('SHOW TABLES LIKE "%invoice%"')
-                invoice_tables = cursor.fetchall()
-                result['database_info']['invoice_related_tables'] = [t[list(t.keys())[0]] for t in invoice_tables]
-                
-                # 4. Check for AGO20 pattern invoices specifically
-                cursor.execute('''
-                    SELECT id, order_name, order_code, invoice_number, invoice_series,
-                           entity, created_at, status
-                    FROM purchase_requisitions 
-                    WHERE (order_code LIKE '%AGO20%' OR invoice_number LIKE '%AGO20%' 
-                           OR order_name LIKE '%AGO20%')
-                    AND is_delete = 0 
-                    ORDER BY id DESC 
-                    LIMIT 10
-                ''')
-                ago20_invoices = cursor.fetchall()
-                result['recent_data']['ago20_pattern_invoices'] = [
-                    {
-                        'id': r['id'],
-                        'order_name': r['order_name'],
-                        'order_code': r['order_code'],
-                        'invoice_number': r['invoice_number'],
-                        'invoice_series': r['invoice_series'],
-                        'created_at': safe_date_format(r['created_at'])
-                    } for r in ago20_invoices
-                ]
-                
-                # 5. Check different invoice number patterns
-                cursor.execute('''
-                    SELECT DISTINCT 
-                        SUBSTRING(order_code, 1, 10) as order_code_pattern,
-                        SUBSTRING(invoice_number, 1, 10) as invoice_number_pattern,
-                        COUNT(*) as count
-                    FROM purchase_requisitions 
-                    WHERE is_delete = 0 
-                    AND (order_code IS NOT NULL OR invoice_number IS NOT NULL)
-                    GROUP BY order_code_pattern, invoice_number_pattern
-                    ORDER BY count DESC
-                    LIMIT 20
-                ''')
-                patterns = cursor.fetchall()
-                result['invoice_patterns'] = [
-                    {
-                        'order_code_pattern': p['order_code_pattern'],
-                        'invoice_number_pattern': p['invoice_number_pattern'],
-                        'count': p['count']
-                    } for p in patterns
-                ]
-                
-                # 6. Check entities table for customer mapping
-                cursor.execute('SELECT id, name, address, created_at FROM entitys ORDER BY id DESC LIMIT 10')
-                entities = cursor.fetchall()
-                result['recent_data']['entities'] = [
-                    {
-                        'id': e['id'],
-                        'name': e['name'],
-                        'address': e['address'][:100] if e['address'] else '',
-                        'created_at': safe_date_format(e['created_at'])
-                    } for e in entities
-                ]
-                
-                # 7. Check vendors table
-                cursor.execute('SELECT id, name, address, email, created_at FROM vendors ORDER BY id DESC LIMIT 10')
-                vendors = cursor.fetchall()
-                result['recent_data']['vendors'] = [
-                    {
-                        'id': v['id'],
-                        'name': v['name'],
-                        'address': v['address'][:100] if v['address'] else '',
-                        'email': v['email'],
-                        'created_at': safe_date_format(v['created_at'])
-                    } for v in vendors
-                ]
-                
-                return result
+        # Independent probes run concurrently on pooled connections
+        rows = run_portal_queries({
+            # 1. Check purchase_requisitions table structure
+            'fields': 'DESCRIBE purchase_requisitions',
+            # 2. Get recent purchase requisitions data
+            'recent_requisitions': '''
+                SELECT id, order_name, order_code, invoice_number, invoice_series, 
+                       entity, subentity_id, delivery_date, created_at, 
+                       invoice_generated, invoice_generated_at, status
+                FROM purchase_requisitions 
+                WHERE is_delete = 0 
+                ORDER BY id DESC 
+                LIMIT 20
+            ''',
+            # 3. Check if there are other tables that might contain invoice data
+            'invoice_tables': 'SHOW TABLES LIKE "%invoice%"',
+            # 4. Check for AGO20 pattern invoices specifically
+            'ago20_invoices': '''
+                SELECT id, order_name, order_code, invoice_number, invoice_series,
+                       entity, created_at, status
+                FROM purchase_requisitions 
+                WHERE (order_code LIKE '%AGO20%' OR invoice_number LIKE '%AGO20%' 
+                       OR order_name LIKE '%AGO20%')
+                AND is_delete = 0 
+                ORDER BY id DESC 
+                LIMIT 10
+            ''',
+            # 5. Check different invoice number patterns
+            'patterns': '''
+                SELECT DISTINCT 
+                    SUBSTRING(order_code, 1, 10) as order_code_pattern,
+                    SUBSTRING(invoice_number, 1, 10) as invoice_number_pattern,
+                    COUNT(*) as count
+                FROM purchase_requisitions 
+                WHERE is_delete = 0 
+                AND (order_code IS NOT NULL OR invoice_number IS NOT NULL)
+                GROUP BY order_code_pattern, invoice_number_pattern
+                ORDER BY count DESC
+                LIMIT 20
+            ''',
+            # 6. Check entities table for customer mapping
+            'entities': 'SELECT id, name, address, created_at FROM entitys ORDER BY id DESC LIMIT 10',
+            # 7. Check vendors table
+            'vendors': 'SELECT id, name, address, email, created_at FROM vendors ORDER BY id DESC LIMIT 10'
+        })
+        
+        result = {
+            'success': True,
+            'database_info': {},
+            'recent_data': {},
+            'invoice_patterns': []
+        }
+        
+        result['database_info']['purchase_requisitions_fields'] = [
+            {'field': f['Field'], 'type': f['Type'], 'null': f['Null'], 'key': f['Key']} 
+            for f in rows['fields']
+        ]
+        
+        result['recent_data']['purchase_requisitions'] = [
+            {
+                'id': r['id'],
+                'order_name': r['order_name'],
+                'order_code': r['order_code'],
+                'invoice_number': r['invoice_number'],
+                'invoice_series': r['invoice_series'],
+                'entity': r['entity'],
+                'created_at': safe_date_format(r['created_at']),
+                'status': r['status']
+            } for r in rows['recent_requisitions']
+        ]
+        
+        result['database_info']['invoice_related_tables'] = [t[list(t.keys())[0]] for t in rows['invoice_tables']]
+        
+        result['recent_data']['ago20_pattern_invoices'] = [
+            {
+                'id': r['id'],
+                'order_name': r['order_name'],
+                'order_code': r['order_code'],
+                'invoice_number': r['invoice_number'],
+                'invoice_series': r['invoice_series'],
+                'created_at': safe_date_format(r['created_at'])
+            } for r in rows['ago20_invoices']
+        ]
+        
+        result['invoice_patterns'] = [
+            {
+                'order_code_pattern': p['order_code_pattern'],
+                'invoice_number_pattern': p['invoice_number_pattern'],
+                'count': p['count']
+            } for p in rows['patterns']
+        ]
+        
+        result['recent_data']['entities'] = [
+            {
+                'id': e['id'],
+                'name': e['name'],
+                'address': e['address'][:100] if e['address'] else '',
+                'created_at': safe_date_format(e['created_at'])
+            } for e in rows['entities']
+        ]
+        
+        result['recent_data']['vendors'] = [
+            {
+                'id': v['id'],
+                'name': v['name'],
+                'address': v['address'][:100] if v['address'] else '',
+                'email': v['email'],
+                'created_at': safe_date_format(v['created_at'])
+            } for v in rows['vendors']
+        ]
+        
+        return result
                 
     except Exception as e:
         frappe.log_error(
@@ -509,7 +770,7 @@ def search_specific_invoice_numbers(invoice_numbers):
             import json
             invoice_numbers = json.loads(invoice_numbers)
         
-        with get_external_db_connection() as conn:
+        with get_external_db_connection(read_only=True) as conn:
             with conn.cursor(pymysql.cursors.DictCursor) as cursor:
                 
                 result = {
@@ -568,41 +829,61 @@ def search_specific_invoice_numbers(invoice_numbers):
         }
 
 @frappe.whitelist()
-def get_recent_purchase_requisitions(limit=500, offset=0):
-    """Get recent purchase requisitions from ProcureUAT database with entity and subentity names"""
+def get_recent_purchase_requisitions(limit=500, offset=0, cursor=None, count_mode='cached'):
+    """
+    Get recent purchase requisitions from ProcureUAT database with entity and subentity names
+    
+    Args:
+        limit (int): Number of requisitions per page
+        offset (int): Rows to skip, only used without a cursor
+        cursor (str): next_cursor of the previous page; pages by (created_at, id)
+            so deep pages cost the same as the first
+        count_mode (str): 'exact', 'cached' (default) or 'estimate', see portal_pagination
+        
+    Returns:
+        dict: Requisitions and pagination info including next_cursor
+    """
+    from o2o_erpnext.config.portal_pagination import (
+        count_requisitions,
+        decode_page_cursor,
+        encode_page_cursor
+    )
+    
     try:
         # Import the updated function that includes JOINs
         from o2o_erpnext.config.external_db_updated import get_procureuat_purchase_requisitions
         
         # Convert parameters to integers
         limit = int(limit)
-        offset = int(offset)
+        offset = int(offset or 0)
+        after = decode_page_cursor(cursor) if cursor else None
+        if after:
+            offset = 0
 
-        # Use the updated function that includes entity and subentity names
-        requisitions = get_procureuat_purchase_requisitions(limit=limit, offset=offset)
+        # One extra row tells whether another page exists without counting
+        requisitions = get_procureuat_purchase_requisitions(limit=limit + 1, offset=offset, after=after)
+        has_more = len(requisitions) > limit
+        requisitions = requisitions[:limit]
 
-        # Get total count for pagination
-        with get_external_db_connection() as conn:
-            with conn.cursor() as cursor:
-                cursor.execute("SELECT COUNT(*) as total FROM purchase_requisitions WHERE is_delete = 0")
-                total_result = cursor.fetchone()
-                total_records = total_result['total'] if total_result else 0
+        count = count_requisitions(["pr.is_delete = 0"], count_mode=count_mode)
+        total_records = count['total']
 
         # Calculate pagination info
         current_offset = offset
         fetched_count = len(requisitions)
-        has_more = (current_offset + fetched_count) < total_records
 
-        frappe.logger().info(f"Purchase Requisitions API - Fetched: {fetched_count}, Offset: {current_offset}, Total: {total_records}")
+        frappe.logger().info(f"Purchase Requisitions API - Fetched: {fetched_count}, Offset: {current_offset}, Cursor: {bool(after)}, Total: {total_records}")
 
         return {
             'status': 'success',
             'data': requisitions,
             'pagination': {
                 'total_records': total_records,
+                'total_is_approximate': count['approximate'],
                 'current_offset': current_offset,
                 'fetched_count': fetched_count,
                 'has_more': has_more,
+                'next_cursor': encode_page_cursor(requisitions[-1]) if has_more else None,
                 'limit': limit
             }
         }
@@ -618,15 +899,94 @@ def get_recent_purchase_requisitions(limit=500, offset=0):
                 'current_offset': 0,
                 'fetched_count': 0,
                 'has_more': False,
+                'next_cursor': None,
                 'limit': limit
             }
         }
 
-# Alias for backward compatibility
 @frappe.whitelist()
-def get_recent_portal_invoices(limit=500):
-    """Alias for get_recent_purchase_requisitions"""
-    return get_recent_purchase_requisitions(limit)
+def get_recent_portal_invoices(limit=500, status_filter=None, date_from=None, date_to=None, stale_ok=1):
+    """
+    Fetch recent portal invoices from the external database
+    
+    Args:
+        limit (int): Number of invoices to fetch (default: 500)
+        status_filter (str): Filter by status (optional)
+        date_from (str): Start date filter (optional)
+        date_to (str): End date filter (optional)
+        stale_ok (bool): Accept cached statistics past their TTL while they refresh in the background
+        
+    Returns:
+        dict: Success status and invoice data
+    """
+    try:
+        with get_external_db_connection(read_only=True) as conn:
+            with conn.cursor(pymysql.cursors.DictCursor) as cursor:
+                # Simplified query to get purchase requisitions first
+                query = f"""
+                SELECT {PORTAL_INVOICE_COLUMNS}
+                FROM purchase_requisitions pr
+                WHERE pr.is_delete = 0 
+                AND pr.status = 'active'
+                """
+                
+                params = []
+                
+                # Add filters
+                if status_filter and status_filter != 'active':
+                    query += " AND pr.status = %s"
+                    params.append(status_filter)
+                
+                if date_from:
+                    query += " AND DATE(pr.created_at) >= %s"
+                    params.append(date_from)
+                
+                if date_to:
+                    query += " AND DATE(pr.created_at) <= %s"
+                    params.append(date_to)
+                
+                query += """
+                ORDER BY pr.created_at DESC
+                LIMIT %s
+                """
+                params.append(int(limit))
+                
+                cursor.execute(query, params)
+                requisitions = cursor.fetchall()
+                
+                # Items of all requisitions in one batched query, totals computed here
+                items_by_requisition = fetch_requisition_items(
+                    cursor, [req['requisition_id'] for req in requisitions]
+                )
+                
+                invoices = []
+                for req in requisitions:
+                    items = items_by_requisition.get(req['requisition_id'], [])
+                    invoice = format_portal_invoice(req, summarize_requisition_items(items))
+                    invoice['items'] = [format_portal_item(item) for item in items]
+                    invoices.append(invoice)
+                
+                # Cached statistics, incrementally refreshed instead of a full-table scan
+                statistics = get_portal_statistics(stale_ok=stale_ok)
+                statistics['fetched_count'] = len(invoices)
+                
+                return {
+                    'success': True,
+                    'message': f'Successfully fetched {len(invoices)} portal invoices',
+                    'invoices': invoices,
+                    'statistics': statistics,
+                    'total_fetched': len(invoices)
+                }
+                
+    except Exception as e:
+        frappe.log_error(f"Error fetching portal invoices: {str(e)}")
+        return {
+            'success': False,
+            'message': f'Error fetching portal invoices: {str(e)}',
+            'invoices': [],
+            'statistics': {},
+            'total_fetched': 0
+        }
 
 @frappe.whitelist()
 def test_purchase_requisitions_connection():
@@ -649,7 +1009,7 @@ def test_purchase_requisitions_connection():
         LIMIT 5
         """
         
-        with get_external_db_connection() as conn:
+        with get_external_db_connection(read_only=True) as conn:
             with conn.cursor(pymysql.cursors.DictCursor) as cursor:
                 cursor.execute(query)
                 sample_data = cursor.fetchall()
@@ -704,28 +1064,25 @@ def check_invoice_discrepancy():
         }
         
         # 1. Get recent invoices from remote database
-        with get_external_db_connection() as conn:
-            with conn.cursor(pymysql.cursors.DictCursor) as cursor:
-                cursor.execute('''
-                    SELECT id, order_name, order_code, invoice_number, invoice_series,
-                           entity, created_at, status
-                    FROM purchase_requisitions 
-                    WHERE invoice_number IS NOT NULL 
-                    AND is_delete = 0 
-                    ORDER BY id DESC 
-                    LIMIT 20
-                ''')
-                remote_invoices = cursor.fetchall()
-                result['remote_invoices'] = [
-                    {
-                        'id': r['id'],
-                        'order_name': r['order_name'],
-                        'order_code': r['order_code'],
-                        'invoice_number': r['invoice_number'],
-                        'invoice_series': r['invoice_series'],
-                        'created_at': safe_date_format(r['created_at'])
-                    } for r in remote_invoices
-                ]
+        remote_invoices = stream_portal_query('''
+            SELECT id, order_name, order_code, invoice_number, invoice_series,
+                   entity, created_at, status
+            FROM purchase_requisitions 
+            WHERE invoice_number IS NOT NULL 
+            AND is_delete = 0 
+            ORDER BY id DESC 
+            LIMIT 20
+        ''', read_only=True)
+        result['remote_invoices'] = [
+            {
+                'id': r['id'],
+                'order_name': r['order_name'],
+                'order_code': r['order_code'],
+                'invoice_number': r['invoice_number'],
+                'invoice_series': r['invoice_series'],
+                'created_at': safe_date_format(r['created_at'])
+            } for r in remote_invoices
+        ]
         
         # 2. Get Purchase Invoices from ERPNext
         erpnext_invoices = frappe.db.sql('''
@@ -804,16 +1161,17 @@ def find_ago2o_invoices():
         }
         
         # 1. Get all AGO2O invoices from remote database
-        with get_external_db_connection() as conn:
+        with get_external_db_connection(read_only=True) as conn:
             with conn.cursor(pymysql.cursors.DictCursor) as cursor:
+                # Prefix range scan on (is_delete, invoice_number)
                 cursor.execute('''
                     SELECT id, order_name, order_code, invoice_number, invoice_series,
                            entity, created_at, status, remark
                     FROM purchase_requisitions 
-                    WHERE invoice_number LIKE '%AGO2O%'
-                    AND is_delete = 0 
+                    WHERE is_delete = 0 
+                    AND invoice_number LIKE %s
                     ORDER BY invoice_series ASC, id ASC
-                ''')
+                ''', (like_prefix('AGO2O/'),))
                 remote_invoices = cursor.fetchall()
                 result['remote_ago2o_invoices'] = [
                     {
@@ -882,296 +1240,126 @@ def find_ago2o_invoices():
             'message': f'Failed to find AGO2O invoices: {str(e)}',
             'error': str(e)
         }
+
+@frappe.whitelist()
+def get_portal_invoice_detail(invoice_id):
     """
-    Fetch recent portal invoices from the external database
+    Get detailed information for a specific portal invoice
     
     Args:
-        limit (int): Number of invoices to fetch (default: 500)
-        status_filter (str): Filter by status (optional)
-        date_from (str): Start date filter (optional)
-        date_to (str): End date filter (optional)
+        invoice_id (int): The invoice ID to fetch details for
         
     Returns:
-        dict: Success status and invoice data
+        dict: Invoice details with all items
+    """
+    result = get_portal_invoice_details_bulk([invoice_id])
+    if not result['success']:
+        return {
+            'success': False,
+            'message': result['message'],
+            'invoice': None
+        }
+    
+    invoice_detail = result['invoices'].get(cint(invoice_id))
+    if not invoice_detail:
+        return {
+            'success': False,
+            'message': 'Invoice not found',
+            'invoice': None
+        }
+    
+    return {
+        'success': True,
+        'message': 'Invoice details fetched successfully',
+        'invoice': invoice_detail
+    }
+
+@frappe.whitelist()
+def get_portal_invoice_details_bulk(invoice_ids):
+    """
+    Get detailed information for many portal invoices over one connection
+    
+    Headers and items are fetched with one IN query each (per 1000 ids)
+    instead of two queries and a connection per invoice.
+    
+    Args:
+        invoice_ids (list): Portal invoice IDs
+        
+    Returns:
+        dict: Success status, invoices (detail as in get_portal_invoice_detail,
+            keyed by invoice ID) and missing (IDs not found)
     """
     try:
+        if isinstance(invoice_ids, str):
+            invoice_ids = frappe.parse_json(invoice_ids)
+        invoice_ids = list(dict.fromkeys(cint(invoice_id) for invoice_id in invoice_ids or []))
+        
+        headers = {}
+        items_by_invoice = {}
         with get_external_db_connection() as conn:
             with conn.cursor(pymysql.cursors.DictCursor) as cursor:
-                # Simplified query to get purchase requisitions first
-                query = """
-                SELECT 
-                    pr.id as requisition_id,
-                    pr.order_name,
-                    pr.entity,
-                    pr.subentity_id,
-                    pr.delivery_date,
-                    pr.validity_date,
-                    pr.order_code,
-                    pr.address,
-                    pr.remark,
-                    pr.acknowledgement,
-                    pr.order_status,
-                    pr.status as requisition_status,
-                    pr.created_at as requisition_date,
-                    pr.created_by,
-                    pr.invoice_number,
-                    pr.invoice_generated,
-                    pr.invoice_generated_at
-                FROM purchase_requisitions pr
-                WHERE pr.is_delete = 0 
-                AND pr.status = 'active'
-                """
-                
-                params = []
-                
-                # Add filters
-                if status_filter and status_filter != 'active':
-                    query += " AND pr.status = %s"
-                    params.append(status_filter)
-                
-                if date_from:
-                    query += " AND DATE(pr.created_at) >= %s"
-                    params.append(date_from)
-                
-                if date_to:
-                    query += " AND DATE(pr.created_at) <= %s"
-                    params.append(date_to)
-                
-                query += """
-                ORDER BY pr.created_at DESC
-                LIMIT %s
-                """
-                params.append(int(limit))
-                
-                cursor.execute(query, params)
-                requisitions = cursor.fetchall()
-                
-                # Get detailed items for each requisition
-                invoices = []
-                for req in requisitions:
-                    # Get totals for this requisition
-                    totals_query = """
+                for i in range(0, len(invoice_ids), PORTAL_ITEMS_BATCH_SIZE):
+                    batch = invoice_ids[i:i + PORTAL_ITEMS_BATCH_SIZE]
+                    placeholders = ', '.join(['%s'] * len(batch))
+                    
+                    # Invoice headers with their totals
+                    cursor.execute(f"""
                     SELECT 
+                        pr.*,
                         COUNT(poi.id) as total_items,
                         SUM(poi.total_amt) as total_amount,
-                        SUM(poi.gst_amt) as total_gst,
-                        GROUP_CONCAT(DISTINCT v.name SEPARATOR ', ') as vendor_names,
-                        GROUP_CONCAT(DISTINCT v.code SEPARATOR ', ') as vendor_codes
-                    FROM purchase_order_items poi
-                    LEFT JOIN vendors v ON poi.vendor_id = v.id
-                    WHERE poi.purchase_order_id = %s
-                    """
-                    
-                    cursor.execute(totals_query, (req['requisition_id'],))
-                    totals = cursor.fetchone()
+                        SUM(poi.gst_amt) as total_gst
+                    FROM purchase_requisitions pr
+                    LEFT JOIN purchase_order_items poi ON pr.id = poi.purchase_order_id
+                    WHERE pr.id IN ({placeholders}) AND pr.is_delete = 0
+                    GROUP BY pr.id
+                    """, batch)
+                    for header in cursor.fetchall():
+                        headers[header['id']] = header
                     
-                    # Get items for this requisition
-                    items_query = """
+                    # All items of the batch
+                    cursor.execute(f"""
                     SELECT 
-                        poi.id as item_id,
-                        poi.category_id,
-                        poi.subcategory_id,
-                        poi.product_id,
-                        poi.vendor_id,
-                        poi.brand_id,
-                        poi.quantity,
-                        poi.unit_rate,
-                        poi.uom,
-                        poi.total_amt,
-                        poi.gst_amt,
-                        poi.cost,
-                        poi.status as item_status,
+                        poi.*,
                         v.name as vendor_name,
                         v.code as vendor_code,
                         v.email as vendor_email,
                         v.gstn as vendor_gstn
                     FROM purchase_order_items poi
                     LEFT JOIN vendors v ON poi.vendor_id = v.id
-                    WHERE poi.purchase_order_id = %s
-                    ORDER BY poi.id
-                    """
-                    
-                    cursor.execute(items_query, (req['requisition_id'],))
-                    items = cursor.fetchall()
-                    
-                    # Process items
-                    processed_items = []
-                    for item in items:
-                        processed_items.append({
-                            'item_id': item['item_id'],
-                            'category_id': item['category_id'],
-                            'subcategory_id': item['subcategory_id'],
-                            'product_id': item['product_id'],
-                            'vendor_id': item['vendor_id'],
-                            'brand_id': item['brand_id'],
-                            'quantity': float(item['quantity']) if item['quantity'] else 0.0,
-                            'unit_rate': float(item['unit_rate']) if item['unit_rate'] else 0.0,
-                            'uom': item['uom'] or 'Nos',
-                            'total_amount': float(item['total_amt']) if item['total_amt'] else 0.0,
-                            'gst_amount': float(item['gst_amt']) if item['gst_amt'] else 0.0,
-                            'cost': float(item['cost']) if item['cost'] else 0.0,
-                            'status': item['item_status'],
-                            'vendor_name': item['vendor_name'] or 'Unknown Vendor',
-                            'vendor_code': item['vendor_code'] or '',
-                            'vendor_email': item['vendor_email'] or '',
-                            'vendor_gstn': item['vendor_gstn'] or ''
-                        })
-                    
-                    # Create invoice object
-                    invoice = {
-                        'invoice_id': req['requisition_id'],
-                        'invoice_number': req['order_code'],
-                        'order_name': req['order_name'],
-                        'customer_name': req['entity'],
-                        'customer_id': req['subentity_id'],
-                        'created_date': safe_date_format(req['requisition_date']),
-                        'due_date': safe_date_format(req['delivery_date'], '%Y-%m-%d'),
-                        'validity_date': safe_date_format(req['validity_date'], '%Y-%m-%d'),
-                        'address': req['address'] or '',
-                        'remark': req['remark'] or '',
-                        'acknowledgement': req['acknowledgement'],
-                        'order_status': req['order_status'],
-                        'status': req['requisition_status'],
-                        'created_by': req['created_by'],
-                        'portal_invoice_number': req['invoice_number'] or '',
-                        'invoice_generated': bool(req['invoice_generated']),
-                        'invoice_generated_at': safe_date_format(req['invoice_generated_at']),
-                        'total_items': totals['total_items'] or 0,
-                        'total_amount': float(totals['total_amount']) if totals['total_amount'] else 0.0,
-                        'total_gst': float(totals['total_gst']) if totals['total_gst'] else 0.0,
-                        'grand_total': float(totals['total_amount'] or 0) + float(totals['total_gst'] or 0),
-                        'vendor_names': totals['vendor_names'] or 'No Vendors',
-                        'vendor_codes': totals['vendor_codes'] or '',
-                        'items': processed_items
-                    }
-                    
-                    invoices.append(invoice)
-                
-                # Get statistics
-                stats_query = """
-                SELECT 
-                    COUNT(DISTINCT pr.id) as total_invoices,
-                    COUNT(DISTINCT poi.vendor_id) as total_vendors,
-                    SUM(poi.total_amt) as total_value,
-                    SUM(poi.gst_amt) as total_gst_value,
-                    AVG(poi.total_amt) as avg_invoice_value,
-                    MIN(pr.created_at) as oldest_invoice,
-                    MAX(pr.created_at) as newest_invoice
-                FROM purchase_requisitions pr
-                LEFT JOIN purchase_order_items poi ON pr.id = poi.purchase_order_id
-                WHERE pr.is_delete = 0 AND pr.status = 'active'
-                """
-                
-                cursor.execute(stats_query)
-                stats = cursor.fetchone()
-                
-                statistics = {
-                    'total_invoices': stats['total_invoices'] or 0,
-                    'total_vendors': stats['total_vendors'] or 0,
-                    'total_value': float(stats['total_value']) if stats['total_value'] else 0.0,
-                    'total_gst_value': float(stats['total_gst_value']) if stats['total_gst_value'] else 0.0,
-                    'avg_invoice_value': float(stats['avg_invoice_value']) if stats['avg_invoice_value'] else 0.0,
-                    'oldest_invoice': safe_date_format(stats['oldest_invoice'], '%Y-%m-%d'),
-                    'newest_invoice': safe_date_format(stats['newest_invoice'], '%Y-%m-%d'),
-                    'fetched_count': len(invoices)
-                }
-                
-                return {
-                    'success': True,
-                    'message': f'Successfully fetched {len(invoices)} portal invoices',
-                    'invoices': invoices,
-                    'statistics': statistics,
-                    'total_fetched': len(invoices)
+                    WHERE poi.purchase_order_id IN ({placeholders})
+                    ORDER BY poi.purchase_order_id, poi.id
+                    """, batch)
+                    for item in cursor.fetchall():
+                        items_by_invoice.setdefault(item['purchase_order_id'], []).append(dict(item))
+        
+        invoices = {}
+        for invoice_id, header in headers.items():
+            invoices[invoice_id] = {
+                'header': dict(header),
+                'items': items_by_invoice.get(invoice_id, []),
+                'summary': {
+                    'total_items': header['total_items'],
+                    'total_amount': float(header['total_amount']) if header['total_amount'] else 0.0,
+                    'total_gst': float(header['total_gst']) if header['total_gst'] else 0.0,
+                    'grand_total': float(header['total_amount'] or 0) + float(header['total_gst'] or 0)
                 }
-                
-    except Exception as e:
-        frappe.log_error(f"Error fetching portal invoices: {str(e)}")
-        return {
-            'success': False,
-            'message': f'Error fetching portal invoices: {str(e)}',
-            'invoices': [],
-            'statistics': {},
-            'total_fetched': 0
-        }
-
-@frappe.whitelist()
-def get_portal_invoice_detail(invoice_id):
-    """
-    Get detailed information for a specific portal invoice
-    
-    Args:
-        invoice_id (int): The invoice ID to fetch details for
+            }
+        
+        return {
+            'success': True,
+            'message': f'Fetched details of {len(invoices)} invoices',
+            'invoices': invoices,
+            'missing': [invoice_id for invoice_id in invoice_ids if invoice_id not in invoices]
+        }
         
-    Returns:
-        dict: Invoice details with all items
-    """
-    try:
-        with get_external_db_connection() as conn:
-            with conn.cursor(pymysql.cursors.DictCursor) as cursor:
-                # Get invoice header
-                header_query = """
-                SELECT 
-                    pr.*,
-                    COUNT(poi.id) as total_items,
-                    SUM(poi.total_amt) as total_amount,
-                    SUM(poi.gst_amt) as total_gst
-                FROM purchase_requisitions pr
-                LEFT JOIN purchase_order_items poi ON pr.id = poi.purchase_order_id
-                WHERE pr.id = %s AND pr.is_delete = 0
-                GROUP BY pr.id
-                """
-                
-                cursor.execute(header_query, (invoice_id,))
-                header = cursor.fetchone()
-                
-                if not header:
-                    return {
-                        'success': False,
-                        'message': 'Invoice not found',
-                        'invoice': None
-                    }
-                
-                # Get all items for this invoice
-                items_query = """
-                SELECT 
-                    poi.*,
-                    v.name as vendor_name,
-                    v.code as vendor_code,
-                    v.email as vendor_email,
-                    v.gstn as vendor_gstn
-                FROM purchase_order_items poi
-                LEFT JOIN vendors v ON poi.vendor_id = v.id
-                WHERE poi.purchase_order_id = %s
-                ORDER BY poi.id
-                """
-                
-                cursor.execute(items_query, (invoice_id,))
-                items = cursor.fetchall()
-                
-                # Format the response
-                invoice_detail = {
-                    'header': dict(header),
-                    'items': [dict(item) for item in items],
-                    'summary': {
-                        'total_items': header['total_items'],
-                        'total_amount': float(header['total_amount']) if header['total_amount'] else 0.0,
-                        'total_gst': float(header['total_gst']) if header['total_gst'] else 0.0,
-                        'grand_total': float(header['total_amount'] or 0) + float(header['total_gst'] or 0)
-                    }
-                }
-                
-                return {
-                    'success': True,
-                    'message': 'Invoice details fetched successfully',
-                    'invoice': invoice_detail
-                }
-                
     except Exception as e:
-        frappe.log_error(f"Error fetching invoice detail: {str(e)}")
+        frappe.log_error(f"Error fetching invoice details: {str(e)}")
         return {
             'success': False,
-            'message': f'Error fetching invoice detail: {str(e)}',
-            'invoice': None
+            'message': f'Error fetching invoice details: {str(e)}',
+            'invoices': {},
+            'missing': []
         }
 
 @frappe.whitelist()
@@ -1190,37 +1378,31 @@ def test_portal_connection():
         active_config = get_active_database_connection()
         frappe.logger().info(f"Portal Sync Tools using connection: {active_config['display_name']} ({active_config['name']})")
         
-        with get_external_db_connection() as conn:
-            with conn.cursor(pymysql.cursors.DictCursor) as cursor:
-                # Get database info for debugging
-                cursor.execute("SELECT DATABASE() as db_name, USER() as user_name")
-                db_info = cursor.fetchone()
-                
-                # Test basic queries
-                cursor.execute("SELECT COUNT(*) as total FROM purchase_requisitions WHERE is_delete = 0")
-                req_count = cursor.fetchone()['total']
-                
-                cursor.execute("SELECT COUNT(*) as total FROM purchase_order_items")
-                item_count = cursor.fetchone()['total']
-                
-                cursor.execute("SELECT COUNT(*) as total FROM vendors WHERE status = 'active'")
-                vendor_count = cursor.fetchone()['total']
-                
-                return {
-                    'success': True,
-                    'message': f'Successfully connected to {active_config["display_name"]} database: {db_info["db_name"]} as {db_info["user_name"]}',
-                    'statistics': {
-                        'purchase_requisitions': req_count,
-                        'purchase_order_items': item_count,
-                        'active_vendors': vendor_count
-                    },
-                    'connection_info': {
-                        'active_connection': active_config['display_name'],
-                        'database_name': db_info['db_name'],
-                        'username': db_info['user_name'],
-                        'connection_type': 'SSH Tunnel' if active_config['ssh_tunnel'] else 'Direct Connection'
-                    }
-                }
+        rows = run_portal_queries({
+            # Get database info for debugging
+            'db_info': "SELECT DATABASE() as db_name, USER() as user_name",
+            # Test basic queries
+            'req_count': "SELECT COUNT(*) as total FROM purchase_requisitions WHERE is_delete = 0",
+            'item_count': "SELECT COUNT(*) as total FROM purchase_order_items",
+            'vendor_count': "SELECT COUNT(*) as total FROM vendors WHERE status = 'active'"
+        })
+        db_info = rows['db_info'][0]
+        
+        return {
+            'success': True,
+            'message': f'Successfully connected to {active_config["display_name"]} database: {db_info["db_name"]} as {db_info["user_name"]}',
+            'statistics': {
+                'purchase_requisitions': rows['req_count'][0]['total'],
+                'purchase_order_items': rows['item_count'][0]['total'],
+                'active_vendors': rows['vendor_count'][0]['total']
+            },
+            'connection_info': {
+                'active_connection': active_config['display_name'],
+                'database_name': db_info['db_name'],
+                'username': db_info['user_name'],
+                'connection_type': 'SSH Tunnel' if active_config['ssh_tunnel'] else 'Direct Connection'
+            }
+        }
                 
     except Exception as e:
         return {
@@ -1242,7 +1424,7 @@ def sync_to_procureuat():
     return test_portal_connection()
 
 @frappe.whitelist()
-def batch_import_invoices(batch_size=50, total_limit=500, date_from=None, date_to=None, skip_duplicates=1, update_existing=0):
+def batch_import_invoices(batch_size=50, total_limit=500, date_from=None, date_to=None, skip_duplicates=1, update_existing=0, incremental=0, background=0, bulk=0):
     """
     Batch import invoices from portal to Purchase Invoice doctype
     
@@ -1253,96 +1435,68 @@ def batch_import_invoices(batch_size=50, total_limit=500, date_from=None, date_t
         date_to (str): End date filter
         skip_duplicates (bool): Skip existing invoices
         update_existing (bool): Update existing invoices
+        incremental (bool): Import only requisitions past the connection's sync cursor,
+            committing and advancing the cursor per batch (date filters are ignored)
+        background (bool): Queue a Portal Import Job that imports batch_size invoices
+            per background job instead of importing within the request
+        bulk (bool): Bulk mode - a savepoint per invoice, a commit every
+            portal_import_commit_every invoices and one summary Error Log for
+            the run instead of one per failed invoice
         
     Returns:
-        dict: Import results
+        dict: Import results, or the queued job when background is set
     """
     try:
-        # Get portal invoices
-        portal_data = get_recent_portal_invoices(
-            limit=total_limit,
-            date_from=date_from,
-            date_to=date_to
-        )
-        
-        if not portal_data['success']:
-            return portal_data
+        if cint(background) and not cint(incremental):
+            from o2o_erpnext.api.portal_import_jobs import start_portal_import_job
+            return start_portal_import_job(
+                total_limit=total_limit,
+                chunk_size=batch_size,
+                date_from=date_from,
+                date_to=date_to,
+                skip_duplicates=skip_duplicates,
+                update_existing=update_existing
+            )
         
-        invoices = portal_data['invoices']
-        imported_count = 0
-        skipped_count = 0
-        error_count = 0
-        detailed_errors = []
-        warnings = []
+        summary = {
+            'imported_count': 0,
+            'skipped_count': 0,
+            'error_count': 0,
+            'detailed_errors': [],
+            'warnings': []
+        }
         
-        for invoice in invoices:
-            try:
-                # Validate invoice data first
-                if not invoice.get('invoice_number'):
-                    error_count += 1
-                    detailed_errors.append(f"Invoice without number skipped")
-                    continue
-                    
-                invoice_number = invoice['invoice_number']
-                
-                # Check if invoice already exists
-                existing = frappe.get_all('Purchase Invoice', 
-                                        filters={'title': invoice_number},
-                                        limit=1)
-                
-                if existing:
-                    if skip_duplicates and not update_existing:
-                        skipped_count += 1
-                        continue
-                    elif update_existing:
-                        # Update existing invoice
-                        doc = frappe.get_doc('Purchase Invoice', existing[0]['name'])
-                        update_purchase_invoice_from_portal(doc, invoice)
-                        doc.save()
-                        imported_count += 1
-                    else:
-                        skipped_count += 1
-                        continue
-                else:
-                    # Create new invoice with comprehensive validation
-                    result = create_purchase_invoice_from_portal(invoice)
-                    
-                    if isinstance(result, dict):
-                        if result.get('success'):
-                            imported_count += 1
-                            if result.get('warnings'):
-                                warnings.extend([f"{invoice_number}: {w}" for w in result['warnings']])
-                        else:
-                            error_count += 1
-                            # Collect specific error messages
-                            if result.get('errors'):
-                                detailed_errors.extend([f"{invoice_number}: {e}" for e in result['errors']])
-                            elif result.get('message'):
-                                detailed_errors.append(f"{invoice_number}: {result['message']}")
-                            else:
-                                detailed_errors.append(f"{invoice_number}: Unknown error occurred")
-                    else:
-                        # Old format - assume success if doc returned
-                        if result:
-                            imported_count += 1
-                        else:
-                            error_count += 1
-                            detailed_errors.append(f"{invoice_number}: Failed to create invoice")
-                        
-            except Exception as e:
-                # Create concise error message to avoid title truncation
-                invoice_ref = invoice.get('invoice_number', 'Unknown')[:20]
-                error_msg = str(e)[:80] + "..." if len(str(e)) > 80 else str(e)
-                detailed_errors.append(f"{invoice_ref}: {error_msg}")
-                
-                frappe.log_error(
-                    message=f"Error importing invoice {invoice_ref}: {error_msg}",
-                    title=f"Import Error - {invoice_ref}"
-                )
-                error_count += 1
-                continue
+        if cint(incremental):
+            import_invoices_after_cursor(batch_size, total_limit, skip_duplicates, update_existing, summary, bulk)
+        else:
+            # Get portal invoices
+            portal_data = get_recent_portal_invoices(
+                limit=total_limit,
+                date_from=date_from,
+                date_to=date_to
+            )
+            
+            if not portal_data['success']:
+                return portal_data
+            
+            existing_invoices = ExistingInvoiceResolver.load(
+                titles=[invoice.get('invoice_number') for invoice in portal_data['invoices']]
+            )
+            entities = EntityResolver()
+            batch = ImportBatch('Portal Invoice Import', entities=entities) if cint(bulk) else None
+            for invoice in portal_data['invoices']:
+                import_portal_invoice(invoice, skip_duplicates, update_existing, summary, existing_invoices, entities, batch)
+            
+            if batch:
+                batch.close()
+            else:
+                frappe.db.commit()
         
-        frappe.db.commit()
+        imported_count = summary['imported_count']
+        skipped_count = summary['skipped_count']
+        error_count = summary['error_count']
+        detailed_errors = summary['detailed_errors']
+        warnings = summary['warnings']
         
         # Prepare result message
         result_message = f'Import completed. Imported: {imported_count}, Skipped: {skipped_count}, Errors: {error_count}'
@@ -1382,6 +1536,202 @@ def batch_import_invoices(batch_size=50, total_limit=500, date_from=None, date_t
             'error_count': 0
         }
 
+def import_invoices_after_cursor(batch_size, total_limit, skip_duplicates, update_existing, summary, bulk=0):
+    """
+    Import requisitions past the Invoice Import sync cursor, one committed batch at a time
+    
+    Args:
+        batch_size (int): Requisitions per batch
+        total_limit (int): Maximum requisitions for this run
+        skip_duplicates (bool): Skip existing invoices
+        update_existing (bool): Update existing invoices
+        summary (dict): Counters and messages, updated in place
+        bulk (bool): Savepoint per invoice and one summary Error Log for the run
+    """
+    from o2o_erpnext.sync.sync_cursor import (
+        advance_sync_cursor,
+        iter_requisitions_after_cursor,
+        locked_sync_cursor
+    )
+    
+    with locked_sync_cursor('Invoice Import') as sync_cursor:
+        entities = EntityResolver()
+        # Commits stay with the cursor advance below
+        batch = ImportBatch('Portal Invoice Import', commit_every=0, entities=entities) if cint(bulk) else None
+        batches = iter_requisitions_after_cursor(
+            sync_cursor,
+            PORTAL_INVOICE_COLUMNS,
+            conditions=["pr.is_delete = 0", "pr.status = 'active'"],
+            batch_size=batch_size,
+            limit=total_limit
+        )
+        
+        for requisitions in batches:
+            with get_external_db_connection(read_only=True) as conn:
+                with conn.cursor(pymysql.cursors.DictCursor) as cursor:
+                    items_by_requisition = fetch_requisition_items(
+                        cursor, [req['requisition_id'] for req in requisitions]
+                    )
+            
+            existing_invoices = ExistingInvoiceResolver.load(
+                titles=[req['order_code'] for req in requisitions]
+            )
+            failed_ids = []
+            for req in requisitions:
+                items = items_by_requisition.get(req['requisition_id'], [])
+                invoice = format_portal_invoice(req, summarize_requisition_items(items))
+                invoice['items'] = [format_portal_item(item) for item in items]
+                error_count = summary['error_count']
+                import_portal_invoice(invoice, skip_duplicates, update_existing, summary, existing_invoices, entities, batch)
+                if summary['error_count'] > error_count:
+                    failed_ids.append(req['sync_id'])
+            
+            # The cursor moves in the same transaction as the batch's invoices;
+            # failed requisitions stay in its retry list for the next run
+            advance_sync_cursor(sync_cursor, requisitions, failed_ids)
+            frappe.db.commit()
+        
+        if batch:
+            batch.close()
+
+def import_portal_invoice(invoice, skip_duplicates, update_existing, summary, existing_invoices, entities, batch=None):
+    """
+    Create or update the Purchase Invoice of one portal invoice
+    
+    In bulk mode the write runs inside a savepoint of the batch, which rolls
+    it back alone when it fails.
+    
+    Args:
+        invoice (dict): Invoice from get_recent_portal_invoices
+        skip_duplicates (bool): Skip existing invoices
+        update_existing (bool): Update existing invoices
+        summary (dict): Counters and messages, updated in place
+        existing_invoices (ExistingInvoiceResolver): Existing invoices of the batch
+        entities (EntityResolver): Master records preloaded for the batch
+        batch (ImportBatch): Bulk import batch (optional)
+    """
+    detailed_errors = summary['detailed_errors']
+    warnings = summary['warnings']
+    
+    try:
+        # Validate invoice data first
+        if not invoice.get('invoice_number'):
+            summary['error_count'] += 1
+            detailed_errors.append(f"Invoice without number skipped")
+            return
+            
+        invoice_number = invoice['invoice_number']
+        
+        # Check if invoice already exists (resolved for the whole batch up front)
+        existing = existing_invoices.by_title(invoice_number)
+        
+        if existing:
+            if skip_duplicates and not update_existing:
+                summary['skipped_count'] += 1
+                return
+            elif update_existing:
+                # Update existing invoice
+                if batch:
+                    result = batch.run(invoice_number, update_existing_purchase_invoice, existing, invoice)
+                    if not result.get('success'):
+                        summary['error_count'] += 1
+                        detailed_errors.append(f"{invoice_number}: {result.get('error') or result.get('message')}")
+                        return
+                else:
+                    update_existing_purchase_invoice(existing, invoice)
+                summary['imported_count'] += 1
+            else:
+                summary['skipped_count'] += 1
+                return
+        else:
+            # Create new invoice with comprehensive validation
+            if batch:
+                result = batch.run(
+                    invoice_number, create_purchase_invoice_from_portal, invoice, existing_invoices, entities, batch
+                )
+            else:
+                result = create_purchase_invoice_from_portal(invoice, existing_invoices, entities)
+            
+            if isinstance(result, dict):
+                if result.get('success'):
+                    summary['imported_count'] += 1
+                    existing_invoices.add(result.get('invoice_name'), title=invoice_number)
+                    if result.get('warnings'):
+                        warnings.extend([f"{invoice_number}: {w}" for w in result['warnings']])
+                else:
+                    summary['error_count'] += 1
+                    # Collect specific error messages
+                    if result.get('errors'):
+                        detailed_errors.extend([f"{invoice_number}: {e}" for e in result['errors']])
+                    elif result.get('message'):
+                        detailed_errors.append(f"{invoice_number}: {result['message']}")
+                    else:
+                        detailed_errors.append(f"{invoice_number}: Unknown error occurred")
+            else:
+                # Old format - assume success if doc returned
+                if result:
+                    summary['imported_count'] += 1
+                else:
+                    summary['error_count'] += 1
+                    detailed_errors.append(f"{invoice_number}: Failed to create invoice")
+                
+    except Exception as e:
+        # Create concise error message to avoid title truncation
+        invoice_ref = invoice.get('invoice_number', 'Unknown')[:20]
+        error_msg = str(e)[:80] + "..." if len(str(e)) > 80 else str(e)
+        detailed_errors.append(f"{invoice_ref}: {error_msg}")
+        
+        log_import_issue(batch, invoice_ref, 'error', error_msg,
+                         f"Import Error - {invoice_ref}", "Error importing invoice")
+        summary['error_count'] += 1
+
+def update_existing_purchase_invoice(name, invoice):
+    """Apply a portal invoice to its existing Purchase Invoice and save it"""
+    doc = frappe.get_doc('Purchase Invoice', name)
+    update_purchase_invoice_from_portal(doc, invoice)
+    doc.save()
+    return {'success': True, 'invoice_name': doc.name}
+
+def similar_invoice_lookups(value):
+    """
+    Id subqueries for invoice number suggestions, merged by UNION
+
+    Every lookup reads only the (is_delete, invoice_number) or (is_delete,
+    order_code) index (see config/portal_indexes.py):
+
+    - invoice_number and order_code starting with value,
+    - AGO2O numbers continuing with value, for a financial year such as '25-26/00',
+    - AGO2O numbers whose serial equals a numeric value such as '0046' or '46'.
+      The serial is compared within the AGO2O range of the index, latest year first.
+
+    Args:
+        value (str): Number as typed by the user
+
+    Returns:
+        tuple: (SQL selecting id, params)
+    """
+    value = str(value).strip()
+    lookups = [
+        "(SELECT id FROM purchase_requisitions WHERE is_delete = 0 AND invoice_number LIKE %s LIMIT 5)",
+        "(SELECT id FROM purchase_requisitions WHERE is_delete = 0 AND order_code LIKE %s LIMIT 5)"
+    ]
+    params = [like_prefix(value), like_prefix(value)]
+
+    if not value.upper().startswith('AGO2O'):
+        lookups.append(
+            "(SELECT id FROM purchase_requisitions WHERE is_delete = 0 AND invoice_number LIKE %s LIMIT 5)"
+        )
+        params.append(like_prefix(f'AGO2O/{value}'))
+
+    if value.isdigit():
+        lookups.append("""(SELECT id FROM purchase_requisitions
+            WHERE is_delete = 0 AND invoice_number LIKE %s
+            AND CAST(SUBSTRING_INDEX(invoice_number, '/', -1) AS UNSIGNED) = %s
+            ORDER BY invoice_number DESC LIMIT 5)""")
+        params.extend([like_prefix('AGO2O/'), int(value)])
+
+    return ' UNION '.join(lookups), params
+
 @frappe.whitelist()
 def fetch_single_invoice(invoice_number, create_if_not_exists=0, update_if_exists=0, show_details_only=1):
     """
@@ -1444,8 +1794,10 @@ def fetch_single_invoice(invoice_number, create_if_not_exists=0, update_if_exist
                     portal_invoice = cursor.fetchone()
                 
                 if not portal_invoice:
-                    # Enhanced search - try partial matching for invoice numbers
-                    cursor.execute("""
+                    # Enhanced search - numbers starting with the given one, and
+                    # AGO2O numbers whose financial year or serial part matches it
+                    matches, params = similar_invoice_lookups(invoice_number)
+                    cursor.execute(f"""
                         SELECT pr.*, 
                                e.name as entity_name,
                                se.name as subentity_name,
@@ -1453,16 +1805,15 @@ def fetch_single_invoice(invoice_number, create_if_not_exists=0, update_if_exist
                                SUM(poi.total_amt) as total_amount,
                                SUM(poi.gst_amt) as total_gst,
                                GROUP_CONCAT(DISTINCT v.name SEPARATOR ', ') as vendor_names
-                        FROM purchase_requisitions pr
+                        FROM ({matches}) matches
+                        JOIN purchase_requisitions pr ON pr.id = matches.id
                         LEFT JOIN entitys e ON pr.entity = e.id
                         LEFT JOIN subentitys se ON pr.subentity_id = se.id
                         LEFT JOIN purchase_order_items poi ON pr.id = poi.purchase_order_id
                         LEFT JOIN vendors v ON poi.vendor_id = v.id
-                        WHERE (pr.invoice_number LIKE %s OR pr.order_code LIKE %s) 
-                        AND pr.is_delete = 0
                         GROUP BY pr.id
                         LIMIT 5
-                    """, (f'%{invoice_number}%', f'%{invoice_number}%'))
+                    """, params)
                     
                     similar_invoices = cursor.fetchall()
                     
@@ -1697,17 +2048,27 @@ def import_multiple_invoices(invoice_ids):
         
         imported_count = 0
         error_count = 0
+        entities = EntityResolver()
+        
+        # Details of all selected invoices over one portal connection
+        details = get_portal_invoice_details_bulk(invoice_ids)
+        if not details['success']:
+            return {
+                'success': False,
+                'message': details['message'],
+                'imported_count': 0,
+                'error_count': len(invoice_ids)
+            }
         
         for invoice_id in invoice_ids:
             try:
-                # Get invoice detail from portal
-                detail_result = get_portal_invoice_detail(invoice_id)
-                if detail_result['success']:
-                    invoice_data = detail_result['invoice']['header']
+                invoice_detail = details['invoices'].get(cint(invoice_id))
+                if invoice_detail:
+                    invoice_data = invoice_detail['header']
                     
                     # Format and create invoice
                     formatted_invoice = format_portal_invoice_data(invoice_data)
-                    doc = create_purchase_invoice_from_portal(formatted_invoice)
+                    doc = create_purchase_invoice_from_portal(formatted_invoice, entities=entities)
                     
                     if doc:
                         imported_count += 1
@@ -1759,22 +2120,39 @@ def import_multiple_portal_invoices(invoice_ids):
         failed_count = 0
         failures = []
         
+        # Resolve already imported invoices for the whole list in one query
+        existing_invoices = ExistingInvoiceResolver.load(portal_ids=invoice_ids)
+        entities = EntityResolver()
+        
+        # Details of the invoices still to import, over one portal connection
+        details = get_portal_invoice_details_bulk(
+            [invoice_id for invoice_id in invoice_ids if not existing_invoices.by_portal_id(invoice_id)]
+        )
+        if not details['success']:
+            return {
+                'success': False,
+                'imported_count': 0,
+                'skipped_count': 0,
+                'failed_count': len(invoice_ids),
+                'failures': [details['message']],
+                'message': f"Import failed: {details['message']}"
+            }
+        
         for invoice_id in invoice_ids:
             try:
                 # Check if already imported
-                existing = frappe.db.exists("Purchase Invoice", {"custom_portal_invoice_id": invoice_id})
+                existing = existing_invoices.by_portal_id(invoice_id)
                 if existing:
                     skipped_count += 1
                     continue
                 
-                # Get invoice detail from portal
-                detail_result = get_portal_invoice_detail(invoice_id)
-                if detail_result.get('success'):
-                    invoice_data = detail_result['invoice']['header']
+                invoice_detail = details['invoices'].get(cint(invoice_id))
+                if invoice_detail:
+                    invoice_data = invoice_detail['header']
                     
                     # Format and create invoice
                     formatted_invoice = format_portal_invoice_data(invoice_data)
-                    doc = create_purchase_invoice_from_portal(formatted_invoice)
+                    doc = create_purchase_invoice_from_portal(formatted_invoice, existing_invoices, entities)
                     
                     if doc:
                         imported_count += 1
@@ -1783,7 +2161,7 @@ def import_multiple_portal_invoices(invoice_ids):
                         failures.append(f"Invoice ID {invoice_id}: Failed to create document")
                 else:
                     failed_count += 1
-                    failures.append(f"Invoice ID {invoice_id}: {detail_result.get('message', 'Unknown error')}")
+                    failures.append(f"Invoice ID {invoice_id}: Invoice not found")
                     
             except Exception as e:
                 failed_count += 1
@@ -1833,11 +2211,102 @@ def format_portal_invoice_data(portal_invoice):
         'vendor_names': portal_invoice.get('vendor_names', 'No Vendors')
     }
 
-def create_purchase_invoice_from_portal(invoice_data):
-    """Create a new Purchase Invoice from portal data with comprehensive validation"""
+def log_import_issue(batch, invoice_number, level, detail, title, prefix):
+    """
+    Report an import error or warning: to the batch summary in bulk mode,
+    otherwise as its own Error Log
+
+    Args:
+        batch (ImportBatch): Bulk import batch, or None
+        invoice_number (str): Invoice the issue is about
+        level (str): 'error' or 'warning'
+        detail (str): Issue description
+        title (str): Error Log title outside bulk mode
+        prefix (str): Error Log message prefix outside bulk mode
+    """
+    if batch:
+        batch.log(invoice_number, level, detail)
+    else:
+        frappe.log_error(message=f"{prefix} {invoice_number}: {detail}", title=title)
+
+def build_purchase_invoice_from_portal(invoice_data, invoice_number, supplier, item_code, batch=None):
+    """
+    Build an unsaved Purchase Invoice from a portal invoice and resolved masters
+    
+    Args:
+        invoice_data (dict): Formatted portal invoice
+        invoice_number (str): Invoice number, truncated to fit the title
+        supplier (str): Supplier name
+        item_code (str): Item code of the invoice line
+        batch (ImportBatch): Bulk import batch collecting the log messages (optional)
+        
+    Returns:
+        Document: New Purchase Invoice
+    """
+    doc = frappe.new_doc('Purchase Invoice')
+    doc.title = invoice_number
+    doc.supplier = supplier
+    doc.posting_date = invoice_data.get('posting_date') or frappe.utils.today()
+    # Keep the requisition date as posting date; validate would reset it to today
+    doc.set_posting_time = 1 if invoice_data.get('posting_date') else 0
+    doc.due_date = invoice_data.get('due_date') or frappe.utils.add_days(doc.posting_date, 30)
+    
+    # Add custom fields for portal reference (with error handling)
+    try:
+        if hasattr(doc, 'custom_portal_invoice_id'):
+            doc.custom_portal_invoice_id = invoice_data.get('invoice_id', '')
+        if hasattr(doc, 'custom_portal_order_name'):
+            order_name = invoice_data.get('order_name', '')[:140] if invoice_data.get('order_name') else ''
+            doc.custom_portal_order_name = order_name
+        if hasattr(doc, 'custom_customer_name'):
+            customer_name = invoice_data.get('customer_name', '')[:140] if invoice_data.get('customer_name') else ''
+            doc.custom_customer_name = customer_name
+        if hasattr(doc, 'custom_branch'):
+            branch = invoice_data.get('branch', '')[:140] if invoice_data.get('branch') else ''
+            doc.custom_branch = branch
+        if hasattr(doc, 'custom_sub_branch'):
+            sub_branch = invoice_data.get('sub_branch', '')[:140] if invoice_data.get('sub_branch') else ''
+            doc.custom_sub_branch = sub_branch
+    except Exception as e:
+        # If custom fields fail, log but continue
+        log_import_issue(batch, invoice_number, 'warning', str(e),
+                         "Custom Field Error", "Custom field setting failed for invoice")
+    
+    doc.append('items', {
+        'item_code': item_code,
+        'qty': max(1, invoice_data.get('total_items', 1)),
+        'rate': max(0, invoice_data.get('total_amount', 0)),
+        'amount': max(0, invoice_data.get('total_amount', 0))
+    })
+    
+    # Set remarks if available
+    if invoice_data.get('remark'):
+        remarks = str(invoice_data['remark'])[:140] if len(str(invoice_data['remark'])) > 140 else str(invoice_data['remark'])
+        doc.remarks = remarks
+    
+    return doc
+
+def create_purchase_invoice_from_portal(invoice_data, existing_invoices=None, entities=None, batch=None):
+    """
+    Create a new Purchase Invoice from portal data with comprehensive validation
+    
+    In bulk mode (batch given) validation errors and warnings go to the batch
+    summary log instead of one Error Log each, and the invoice is inserted as
+    submitted in one pass rather than saved and then submitted. The caller's
+    ImportBatch holds the savepoint and commits.
+    
+    Args:
+        invoice_data (dict): Formatted portal invoice
+        existing_invoices (ExistingInvoiceResolver): Batch-resolved existing invoices (optional)
+        entities (EntityResolver): Batch-preloaded master records (optional)
+        batch (ImportBatch): Bulk import batch (optional)
+    """
     try:
+        if entities is None:
+            entities = EntityResolver(preload=False)
+        
         # First, validate all prerequisites
-        validation = validate_invoice_prerequisites(invoice_data)
+        validation = validate_invoice_prerequisites(invoice_data, existing_invoices, entities)
         
         if not validation['success']:
             # Return detailed error information
@@ -1850,111 +2319,74 @@ def create_purchase_invoice_from_portal(invoice_data):
             }
             
             # Log the validation errors
-            frappe.log_error(
-                message=f"Invoice validation failed for {invoice_data.get('invoice_number', 'Unknown')}: " + 
-                        "; ".join(validation['errors']),
-                title="Invoice Validation Failed"
-            )
+            log_import_issue(batch, invoice_data.get('invoice_number', 'Unknown'), 'error',
+                             "; ".join(validation['errors']),
+                             "Invoice Validation Failed", "Invoice validation failed for")
             
             return error_details
         
         # Log warnings if any
         if validation['warnings']:
-            frappe.log_error(
-                message=f"Invoice validation warnings for {invoice_data.get('invoice_number', 'Unknown')}: " + 
-                        "; ".join(validation['warnings']),
-                title="Invoice Import Warnings"
-            )
-        
-        # Proceed with invoice creation
-        doc = frappe.new_doc('Purchase Invoice')
+            log_import_issue(batch, invoice_data.get('invoice_number', 'Unknown'), 'warning',
+                             "; ".join(validation['warnings']),
+                             "Invoice Import Warnings", "Invoice validation warnings for")
         
         # Set basic fields with validation
         invoice_number = invoice_data.get('invoice_number', '')
         if len(invoice_number) > 140:
             invoice_number = invoice_number[:137] + "..."
         
-        doc.title = invoice_number
-        
         # Get or create supplier (this should work now since we validated)
-        supplier_result = get_or_create_supplier(invoice_data.get('vendor_names', 'Portal Vendor'))
+        supplier_result = get_or_create_supplier(invoice_data.get('vendor_names', 'Portal Vendor'), entities)
         if isinstance(supplier_result, dict) and not supplier_result.get('success'):
             return supplier_result  # Return error details
         
-        doc.supplier = supplier_result if isinstance(supplier_result, str) else supplier_result.get('supplier_name')
-        doc.posting_date = frappe.utils.today()
-        doc.due_date = invoice_data.get('due_date') or frappe.utils.add_days(frappe.utils.today(), 30)
-        
-        # Add custom fields for portal reference (with error handling)
-        try:
-            if hasattr(doc, 'custom_portal_invoice_id'):
-                doc.custom_portal_invoice_id = invoice_data.get('invoice_id', '')
-            if hasattr(doc, 'custom_portal_order_name'):
-                order_name = invoice_data.get('order_name', '')[:140] if invoice_data.get('order_name') else ''
-                doc.custom_portal_order_name = order_name
-            if hasattr(doc, 'custom_customer_name'):
-                customer_name = invoice_data.get('customer_name', '')[:140] if invoice_data.get('customer_name') else ''
-                doc.custom_customer_name = customer_name
-            if hasattr(doc, 'custom_branch'):
-                branch = invoice_data.get('branch', '')[:140] if invoice_data.get('branch') else ''
-                doc.custom_branch = branch
-            if hasattr(doc, 'custom_sub_branch'):
-                sub_branch = invoice_data.get('sub_branch', '')[:140] if invoice_data.get('sub_branch') else ''
-                doc.custom_sub_branch = sub_branch
-        except Exception as e:
-            # If custom fields fail, log but continue
-            frappe.log_error(
-                message=f"Custom field setting failed for invoice {invoice_number}: {str(e)}",
-                title="Custom Field Error"
-            )
+        supplier = supplier_result if isinstance(supplier_result, str) else supplier_result.get('supplier_name')
         
         # Add a basic item (you may need to customize this based on your item structure)
-        item_result = get_or_create_item('Portal Import Item')
+        item_result = get_or_create_item('Portal Import Item', entities)
         if isinstance(item_result, dict) and not item_result.get('success'):
             return item_result  # Return error details
         
         item_code = item_result if isinstance(item_result, str) else item_result.get('item_code')
         
-        doc.append('items', {
-            'item_code': item_code,
-            'qty': max(1, invoice_data.get('total_items', 1)),
-            'rate': max(0, invoice_data.get('total_amount', 0)),
-            'amount': max(0, invoice_data.get('total_amount', 0))
-        })
-        
-        # Set remarks if available
-        if invoice_data.get('remark'):
-            remarks = str(invoice_data['remark'])[:140] if len(str(invoice_data['remark'])) > 140 else str(invoice_data['remark'])
-            doc.remarks = remarks
-        
-        doc.save()
+        doc = build_purchase_invoice_from_portal(invoice_data, invoice_number, supplier, item_code, batch)
+        submit_error = None
         
-        # Only submit if save was successful and no validation errors
-        if doc.docstatus == 0:  # Draft status
+        if batch:
+            # Insert as submitted in one pass; on failure fall back to a draft
+            frappe.db.savepoint('portal_invoice_submit')
             try:
                 doc.submit()
-                return {
-                    'success': True,
-                    'message': f'Purchase Invoice {invoice_number} created and submitted successfully',
-                    'invoice_name': doc.name,
-                    'warnings': validation['warnings']
-                }
-            except Exception as submit_error:
-                # If submission fails, keep as draft
-                frappe.log_error(
-                    message=f"Failed to submit invoice {invoice_number}: {str(submit_error)}",
-                    title="Invoice Submission Failed"
-                )
-                return {
-                    'success': True,
-                    'message': f'Purchase Invoice {invoice_number} created as draft (submission failed)',
-                    'invoice_name': doc.name,
-                    'warnings': validation['warnings'] + [f"Submission failed: {str(submit_error)}"]
-                }
+            except Exception as e:
+                frappe.db.rollback(save_point='portal_invoice_submit')
+                submit_error = e
+                doc = build_purchase_invoice_from_portal(invoice_data, invoice_number, supplier, item_code, batch)
+                doc.save()
+        else:
+            doc.save()
+            
+            # Only submit if save was successful and no validation errors
+            if doc.docstatus == 0:  # Draft status
+                try:
+                    doc.submit()
+                except Exception as e:
+                    submit_error = e
+        
+        if submit_error:
+            # If submission fails, keep as draft
+            log_import_issue(batch, invoice_number, 'warning', f"Submission failed: {str(submit_error)}",
+                             "Invoice Submission Failed", "Failed to submit invoice")
+            return {
+                'success': True,
+                'message': f'Purchase Invoice {invoice_number} created as draft (submission failed)',
+                'invoice_name': doc.name,
+                'warnings': validation['warnings'] + [f"Submission failed: {str(submit_error)}"]
+            }
         
         return {
             'success': True,
-            'message': f'Purchase Invoice {invoice_number} created successfully',
+            'message': f'Purchase Invoice {invoice_number} created and submitted successfully',
             'invoice_name': doc.name,
             'warnings': validation['warnings']
         }
@@ -1964,10 +2396,8 @@ def create_purchase_invoice_from_portal(invoice_data):
         invoice_ref = invoice_data.get('invoice_number', 'Unknown')[:20]
         error_msg = str(e)
         
-        frappe.log_error(
-            message=f"Error creating Purchase Invoice for {invoice_ref}: {error_msg}",
-            title=f"PI Creation Error - {invoice_ref}"
-        )
+        log_import_issue(batch, invoice_ref, 'error', error_msg,
+                         f"PI Creation Error - {invoice_ref}", "Error creating Purchase Invoice for")
         
         return {
             'success': False,
@@ -1997,9 +2427,12 @@ def update_purchase_invoice_from_portal(doc, invoice_data):
             title="Purchase Invoice Update Error"
         )
 
-def get_or_create_supplier(vendor_names):
+def get_or_create_supplier(vendor_names, entities=None):
     """Get or create supplier from vendor names with detailed validation"""
     try:
+        if entities is None:
+            entities = EntityResolver(preload=False)
+        
         # Validate input
         if not vendor_names or vendor_names.strip() in ['', 'No Vendors', 'None']:
             return {
@@ -2015,24 +2448,26 @@ def get_or_create_supplier(vendor_names):
         if len(supplier_name) > 140:
             supplier_name = supplier_name[:137] + "..."
         
-        # Check if supplier exists
-        if frappe.db.exists('Supplier', supplier_name):
-            return supplier_name
+        # Check if supplier exists; Link fields need its name, not its label
+        existing_supplier = entities.resolve('Supplier', supplier_name)
+        if existing_supplier:
+            return existing_supplier
         
         # Create new supplier with minimal required fields only
         supplier = frappe.new_doc('Supplier')
         supplier.supplier_name = supplier_name
         
         # Check if supplier group exists
-        supplier_groups = frappe.get_all('Supplier Group', limit=1)
-        if supplier_groups:
-            supplier.supplier_group = supplier_groups[0].name
+        supplier_group = entities.first('Supplier Group')
+        if supplier_group:
+            supplier.supplier_group = supplier_group
         else:
             # Create default supplier group if none exists
             try:
                 default_group = frappe.new_doc('Supplier Group')
                 default_group.supplier_group_name = 'All Supplier Groups'
                 default_group.save()
+                entities.add('Supplier Group', default_group.name)
                 supplier.supplier_group = default_group.name
             except Exception:
                 return {
@@ -2069,6 +2504,7 @@ def get_or_create_supplier(vendor_names):
         
         try:
             supplier.save()
+            entities.add('Supplier', supplier.name, supplier.supplier_name)
             return supplier.name
         except Exception as save_error:
             return {
@@ -2105,24 +2541,28 @@ def get_or_create_supplier(vendor_names):
             'details': error_msg
         }
 
-def get_or_create_item(item_name='Portal Import Item'):
+def get_or_create_item(item_name='Portal Import Item', entities=None):
     """Get or create a default item for portal imports with detailed validation"""
     try:
+        if entities is None:
+            entities = EntityResolver(preload=False)
+        
         # Truncate item name if too long
         if len(item_name) > 140:
             item_name = item_name[:137] + "..."
             
-        if frappe.db.exists('Item', item_name):
-            return item_name
+        existing_item = entities.resolve('Item', item_name)
+        if existing_item:
+            return existing_item
         
         item = frappe.new_doc('Item')
         item.item_code = item_name
         item.item_name = item_name
         
         # Check if item group exists
-        item_groups = frappe.get_all('Item Group', limit=1)
-        if item_groups:
-            item.item_group = item_groups[0].name
+        item_group = entities.first('Item Group')
+        if item_group:
+            item.item_group = item_group
         else:
             return {
                 'success': False,
@@ -2137,6 +2577,7 @@ def get_or_create_item(item_name='Portal Import Item'):
         
         try:
             item.save()
+            entities.add('Item', item.name, item.item_name)
             return item.name
         except Exception as save_error:
             return {
@@ -2171,7 +2612,7 @@ def get_or_create_item(item_name='Portal Import Item'):
         }
 
 @frappe.whitelist()
-def get_recent_portal_invoices_with_progress(limit=500, chunk_size=100, status_filter=None, date_from=None, date_to=None):
+def get_recent_portal_invoices_with_progress(limit=500, chunk_size=100, status_filter=None, date_from=None, date_to=None, stale_ok=1, cursor=None, count_mode='cached'):
     """
     Fetch recent portal invoices with progress tracking
     Process data in chunks to provide better progress feedback
@@ -2182,89 +2623,72 @@ def get_recent_portal_invoices_with_progress(limit=500, chunk_size=100, status_f
         status_filter (str): Filter by status (optional)
         date_from (str): Start date filter (optional)
         date_to (str): End date filter (optional)
+        stale_ok (bool): Accept cached statistics past their TTL while they refresh in the background
+        cursor (str): next_cursor of the previous page; pages by (created_at, id)
+        count_mode (str): 'exact', 'cached' (default) or 'estimate', see portal_pagination
         
     Returns:
         dict: Success status and invoice data with progress info
     """
+    from o2o_erpnext.config.portal_pagination import (
+        count_requisitions,
+        decode_page_cursor,
+        encode_page_cursor,
+        keyset_condition
+    )
+    
     try:
-        with get_external_db_connection() as conn:
+        conditions = ["pr.is_delete = 0", "pr.status = 'active'"]
+        params = []
+        
+        # Add filters
+        if status_filter and status_filter != 'active':
+            conditions.append("pr.status = %s")
+            params.append(status_filter)
+        
+        if date_from:
+            conditions.append("DATE(pr.created_at) >= %s")
+            params.append(date_from)
+        
+        if date_to:
+            conditions.append("DATE(pr.created_at) <= %s")
+            params.append(date_to)
+        
+        # Count of the whole filtered listing, independent of the page
+        count = count_requisitions(conditions, params, count_mode=count_mode)
+        total_count = count['total']
+        
+        page_conditions = list(conditions)
+        page_params = list(params)
+        if cursor:
+            condition, condition_params = keyset_condition(decode_page_cursor(cursor))
+            page_conditions.append(condition)
+            page_params.extend(condition_params)
+        
+        limit = int(limit)
+        page_params.append(limit + 1)
+        
+        with get_external_db_connection(read_only=True) as conn:
             with conn.cursor(pymysql.cursors.DictCursor) as cursor:
-                # First, get the count for progress calculation
-                count_query = """
-                SELECT COUNT(*) as total_count
-                FROM purchase_requisitions pr
-                WHERE pr.is_delete = 0 
-                AND pr.status = 'active'
-                """
-                
-                count_params = []
-                if status_filter and status_filter != 'active':
-                    count_query += " AND pr.status = %s"
-                    count_params.append(status_filter)
-                
-                if date_from:
-                    count_query += " AND DATE(pr.created_at) >= %s"
-                    count_params.append(date_from)
-                
-                if date_to:
-                    count_query += " AND DATE(pr.created_at) <= %s"
-                    count_params.append(date_to)
-                
-                cursor.execute(count_query, count_params)
-                total_count = cursor.fetchone()['total_count']
-                
-                # Adjust limit if needed
-                actual_limit = min(int(limit), total_count)
-                
                 # Main query to get requisitions in chunks
-                main_query = """
-                SELECT 
-                    pr.id as requisition_id,
-                    pr.order_name,
-                    pr.entity,
-                    pr.subentity_id,
-                    pr.delivery_date,
-                    pr.validity_date,
-                    pr.order_code,
-                    pr.address,
-                    pr.remark,
-                    pr.acknowledgement,
-                    pr.order_status,
-                    pr.status as requisition_status,
-                    pr.created_at as requisition_date,
-                    pr.created_by,
-                    pr.invoice_number,
-                    pr.invoice_generated,
-                    pr.invoice_generated_at
+                main_query = f"""
+                SELECT {PORTAL_INVOICE_COLUMNS}
                 FROM purchase_requisitions pr
-                WHERE pr.is_delete = 0 
-                AND pr.status = 'active'
-                """
-                
-                params = []
-                
-                # Add filters
-                if status_filter and status_filter != 'active':
-                    main_query += " AND pr.status = %s"
-                    params.append(status_filter)
-                
-                if date_from:
-                    main_query += " AND DATE(pr.created_at) >= %s"
-                    params.append(date_from)
-                
-                if date_to:
-                    main_query += " AND DATE(pr.created_at) <= %s"
-                    params.append(date_to)
-                
-                main_query += """
-                ORDER BY pr.created_at DESC
+                WHERE {' AND '.join(page_conditions)}
+                ORDER BY pr.created_at DESC, pr.id DESC
                 LIMIT %s
                 """
-                params.append(actual_limit)
                 
-                cursor.execute(main_query, params)
+                cursor.execute(main_query, page_params)
                 requisitions = cursor.fetchall()
                 
+                # One extra row tells whether another page exists
+                has_more = len(requisitions) > limit
+                requisitions = requisitions[:limit]
+                next_cursor = encode_page_cursor(
+                    requisitions[-1], created_field='requisition_date', id_field='requisition_id'
+                ) if has_more else None
+                
                 # Process invoices in chunks for better progress tracking
                 invoices = []
                 chunk_size = int(chunk_size)
@@ -2273,91 +2697,29 @@ def get_recent_portal_invoices_with_progress(limit=500, chunk_size=100, status_f
                 for i in range(0, total_requisitions, chunk_size):
                     chunk = requisitions[i:i + chunk_size]
                     
-                    # Process each chunk
+                    # One grouped totals query per chunk instead of one per requisition
+                    totals_by_requisition = fetch_requisition_totals(
+                        cursor, [req['requisition_id'] for req in chunk]
+                    )
+                    
                     for req in chunk:
-                        # Get totals for this requisition
-                        totals_query = """
-                        SELECT 
-                            COUNT(poi.id) as total_items,
-                            SUM(poi.total_amt) as total_amount,
-                            SUM(poi.gst_amt) as total_gst,
-                            GROUP_CONCAT(DISTINCT v.name SEPARATOR ', ') as vendor_names,
-                            GROUP_CONCAT(DISTINCT v.code SEPARATOR ', ') as vendor_codes
-                        FROM purchase_order_items poi
-                        LEFT JOIN vendors v ON poi.vendor_id = v.id
-                        WHERE poi.purchase_order_id = %s
-                        """
-                        
-                        cursor.execute(totals_query, (req['requisition_id'],))
-                        totals = cursor.fetchone()
-                        
-                        # Create invoice object
-                        invoice = {
-                            'invoice_id': req['requisition_id'],
-                            'invoice_number': req['order_code'],
-                            'order_name': req['order_name'],
-                            'customer_name': req['entity'],
-                            'customer_id': req['subentity_id'],
-                            'created_date': safe_date_format(req['requisition_date']),
-                            'due_date': safe_date_format(req['delivery_date'], '%Y-%m-%d'),
-                            'validity_date': safe_date_format(req['validity_date'], '%Y-%m-%d'),
-                            'address': req['address'] or '',
-                            'remark': req['remark'] or '',
-                            'acknowledgement': req['acknowledgement'],
-                            'order_status': req['order_status'],
-                            'status': req['requisition_status'],
-                            'created_by': req['created_by'],
-                            'portal_invoice_number': req['invoice_number'] or '',
-                            'invoice_generated': bool(req['invoice_generated']),
-                            'invoice_generated_at': safe_date_format(req['invoice_generated_at']),
-                            'total_items': totals['total_items'] or 0,
-                            'total_amount': float(totals['total_amount']) if totals['total_amount'] else 0.0,
-                            'total_gst': float(totals['total_gst']) if totals['total_gst'] else 0.0,
-                            'grand_total': float(totals['total_amount'] or 0) + float(totals['total_gst'] or 0),
-                            'vendor_names': totals['vendor_names'] or 'No Vendors',
-                            'vendor_codes': totals['vendor_codes'] or ''
-                        }
-                        
-                        invoices.append(invoice)
+                        invoices.append(format_portal_invoice(req, totals_by_requisition.get(req['requisition_id'])))
                     
                     # Add a small delay for very large datasets to prevent timeouts
                     if len(chunk) == chunk_size and i + chunk_size < total_requisitions:
                         import time
                         time.sleep(0.01)  # 10ms delay between chunks
                 
-                # Get comprehensive statistics
-                stats_query = """
-                SELECT 
-                    COUNT(DISTINCT pr.id) as total_invoices,
-                    COUNT(DISTINCT poi.vendor_id) as total_vendors,
-                    SUM(poi.total_amt) as total_value,
-                    SUM(poi.gst_amt) as total_gst_value,
-                    AVG(poi.total_amt) as avg_invoice_value,
-                    MIN(pr.created_at) as oldest_invoice,
-                    MAX(pr.created_at) as newest_invoice
-                FROM purchase_requisitions pr
-                LEFT JOIN purchase_order_items poi ON pr.id = poi.purchase_order_id
-                WHERE pr.is_delete = 0 AND pr.status = 'active'
-                """
-                
-                cursor.execute(stats_query)
-                stats = cursor.fetchone()
-                
-                statistics = {
-                    'total_invoices': stats['total_invoices'] or 0,
-                    'total_vendors': stats['total_vendors'] or 0,
-                    'total_value': float(stats['total_value']) if stats['total_value'] else 0.0,
-                    'total_gst_value': float(stats['total_gst_value']) if stats['total_gst_value'] else 0.0,
-                    'avg_invoice_value': float(stats['avg_invoice_value']) if stats['avg_invoice_value'] else 0.0,
-                    'oldest_invoice': safe_date_format(stats['oldest_invoice'], '%Y-%m-%d'),
-                    'newest_invoice': safe_date_format(stats['newest_invoice'], '%Y-%m-%d'),
+                # Cached statistics, incrementally refreshed instead of a full-table scan
+                statistics = get_portal_statistics(stale_ok=stale_ok)
+                statistics.update({
                     'fetched_count': len(invoices),
                     'processing_info': {
                         'total_processed': len(invoices),
                         'chunk_size': chunk_size,
                         'chunks_processed': (len(invoices) + chunk_size - 1) // chunk_size
                     }
-                }
+                })
                 
                 return {
                     'success': True,
@@ -2367,8 +2729,11 @@ def get_recent_portal_invoices_with_progress(limit=500, chunk_size=100, status_f
                     'total_fetched': len(invoices),
                     'progress_info': {
                         'total_available': total_count,
+                        'total_is_approximate': count['approximate'],
                         'requested_limit': limit,
                         'actual_fetched': len(invoices),
+                        'has_more': has_more,
+                        'next_cursor': next_cursor,
                         'processing_time': 'Optimized with chunked processing'
                     }
                 }
@@ -2406,47 +2771,31 @@ def batch_import_ago2o_invoices(latest_only=False):
             'skipped_invoices': []
         }
         
-        # 1. Get AGO2O invoices from remote database
-        with get_external_db_connection() as conn:
-            with conn.cursor(pymysql.cursors.DictCursor) as cursor:
-                if latest_only:
-                    # Only get AGO2O/25-26 series (current financial year invoices)
-                    cursor.execute('''
-                        SELECT pr.*, v.name as vendor_name, v.email as vendor_email, v.address as vendor_address
-                        FROM purchase_requisitions pr
-                        LEFT JOIN vendors v ON pr.vendor_created = v.id
-                        WHERE pr.invoice_number LIKE '%AGO2O/25-26%'
-                        AND pr.is_delete = 0 
-                        ORDER BY pr.invoice_series ASC, pr.id ASC
-                    ''')
-                else:
-                    # Get all AGO2O invoices
-                    cursor.execute('''
-                        SELECT pr.*, v.name as vendor_name, v.email as vendor_email, v.address as vendor_address
-                        FROM purchase_requisitions pr
-                        LEFT JOIN vendors v ON pr.vendor_created = v.id
-                        WHERE pr.invoice_number LIKE '%AGO2O%'
-                        AND pr.is_delete = 0 
-                        ORDER BY pr.invoice_series ASC, pr.id ASC
-                    ''')
-                
-                remote_invoices = cursor.fetchall()
-        
-        # 2. Group invoices by invoice_number to handle duplicates
-        invoices_grouped = {}
-        for invoice in remote_invoices:
-            inv_num = invoice['invoice_number']
-            if inv_num not in invoices_grouped:
-                invoices_grouped[inv_num] = invoice
-        
-        # 3. Process each grouped invoice
-        for invoice_number, invoice_data in invoices_grouped.items():
+        # 1. Stream AGO2O invoices from remote database
+        # Only AGO2O/25-26 series (current financial year invoices) or all AGO2O
+        # invoices, as a prefix range scan on (is_delete, invoice_number)
+        invoice_prefix = 'AGO2O/25-26/' if latest_only else 'AGO2O/'
+        remote_invoices = stream_portal_query('''
+            SELECT pr.*, v.name as vendor_name, v.email as vendor_email, v.address as vendor_address
+            FROM purchase_requisitions pr
+            LEFT JOIN vendors v ON pr.vendor_created = v.id
+            WHERE pr.is_delete = 0 
+            AND pr.invoice_number LIKE %s
+            ORDER BY pr.invoice_series ASC, pr.id ASC
+        ''', (like_prefix(invoice_prefix),))
+        
+        # 2. Keep the first row per invoice_number to handle duplicates
+        invoices_grouped = unique_by_invoice_number(remote_invoices)
+        
+        # 3. Process each grouped invoice, resolving existing ones per chunk
+        entities = EntityResolver()
+        for invoice_number, invoice_data, existing_invoices in resolve_existing_in_chunks(invoices_grouped):
             result['total_processed'] += 1
             header = invoice_data
             
             try:
                 # Check if invoice already exists in ERPNext
-                existing = frappe.db.get_value("Purchase Invoice", {"title": invoice_number})
+                existing = existing_invoices.by_title(invoice_number)
                 if existing:
                     result['skipped_invoices'].append({
                         'invoice_number': invoice_number,
@@ -2470,7 +2819,7 @@ def batch_import_ago2o_invoices(latest_only=False):
                     'amount': header.get('total_amount', 0)
                 }
                 
-                validation_result = validate_invoice_prerequisites(validation_data)
+                validation_result = validate_invoice_prerequisites(validation_data, existing_invoices, entities)
                 
                 if not validation_result['success']:
                     # Collect detailed validation errors
@@ -2492,8 +2841,10 @@ def batch_import_ago2o_invoices(latest_only=False):
                 doc.title = invoice_number
                 doc.bill_no = header['order_code']
                 doc.bill_date = safe_date_format(header['created_at'], '%Y-%m-%d')
-                doc.posting_date = doc.bill_date
-                doc.due_date = doc.bill_date
+                # Requisition date as posting date, kept through validate (see PORTAL_INVOICE_DATE_SQL)
+                doc.posting_date = portal_invoice_date(header) or doc.bill_date
+                doc.set_posting_time = 1
+                doc.due_date = doc.posting_date
                 doc.company = "Ascra Technologies Pvt. Ltd."
                 doc.currency = "INR"
                 doc.is_return = 0
@@ -2527,6 +2878,7 @@ def batch_import_ago2o_invoices(latest_only=False):
                 # Insert and submit
                 doc.insert(ignore_permissions=True)
                 frappe.db.commit()
+                existing_invoices.add(doc.name, title=invoice_number)
                 
                 result['successful_imports'] += 1
                 result['imported_invoices'].append({
@@ -0,0 +1,149 @@
+"""
+Portal Import Batch Module
+Bulk mode for portal invoice imports: a savepoint per invoice, a commit every
+N invoices and one summary log per batch instead of an Error Log row per
+invoice
+
+Usage:
+    batch = ImportBatch('Portal Invoice Import', entities=entities)
+    for invoice in invoices:
+        result = batch.run(invoice_number, create_invoice, invoice)
+    batch.close()
+"""
+
+import frappe
+
+from frappe.utils import cint
+
+# Import batch defaults - each can be overridden in site_config.json
+DEFAULT_IMPORT_BATCH_SETTINGS = {
+    'portal_import_commit_every': 100  # Invoices per commit in bulk mode
+}
+
+# Messages kept in the summary log, the counts cover all of them
+MAX_SUMMARY_MESSAGES = 500
+
+
+def get_import_batch_settings():
+    """
+    Get import batch settings from site config, falling back to defaults
+
+    Returns:
+        dict: Import batch settings
+    """
+    conf = frappe.conf or {}
+    return {key: conf.get(key, default) for key, default in DEFAULT_IMPORT_BATCH_SETTINGS.items()}
+
+
+class ImportBatch:
+    """
+    Transaction and log handling of one bulk import
+
+    Each invoice runs inside its own savepoint, so a failing invoice is rolled
+    back alone while the rest of the batch is kept. Work is committed every
+    commit_every invoices (0 leaves committing to the caller). Validation
+    errors, warnings and failures are collected in memory and written as one
+    Error Log when the batch is closed.
+    """
+
+    def __init__(self, title, commit_every=None, entities=None):
+        """
+        Args:
+            title (str): Summary log title
+            commit_every (int): Invoices per commit, defaults to portal_import_commit_every
+            entities (EntityResolver): Resolver to reset when an invoice is rolled back,
+                as masters created inside the savepoint are gone
+        """
+        self.title = title
+        self.commit_every = cint(get_import_batch_settings()['portal_import_commit_every']
+                                 if commit_every is None else commit_every)
+        self.entities = entities
+        self.counts = {'succeeded': 0, 'failed': 0, 'errors': 0, 'warnings': 0}
+        self.messages = []
+        self.sequence = 0
+        self.uncommitted = 0
+
+    def log(self, invoice_number, level, message):
+        """
+        Record a message for the summary log
+
+        Args:
+            invoice_number (str): Invoice the message is about
+            level (str): 'error' or 'warning'
+            message (str): Message
+        """
+        self.counts['errors' if level == 'error' else 'warnings'] += 1
+        if len(self.messages) < MAX_SUMMARY_MESSAGES:
+            self.messages.append(f"[{level}] {invoice_number}: {message}")
+
+    def run(self, invoice_number, fn, *args, **kwargs):
+        """
+        Run fn inside a savepoint, rolling it back when it raises or returns
+        a result with success False
+
+        Args:
+            invoice_number (str): Invoice being imported, for the log
+            fn (callable): Import function, returning a result dict
+
+        Returns:
+            dict: Result of fn, or a failure result when it raised
+        """
+        self.sequence += 1
+        savepoint = f"portal_import_{self.sequence}"
+        frappe.db.savepoint(savepoint)
+
+        try:
+            result = fn(*args, **kwargs)
+        except Exception as e:
+            result = {
+                'success': False,
+                'message': f'Failed to import {invoice_number}',
+                'error': str(e),
+                'invoice_number': invoice_number
+            }
+            self.log(invoice_number, 'error', str(e))
+
+        if isinstance(result, dict) and not result.get('success'):
+            frappe.db.rollback(save_point=savepoint)
+            if self.entities:
+                self.entities.invalidate()
+            self.counts['failed'] += 1
+        else:
+            frappe.db.release_savepoint(savepoint)
+            self.counts['succeeded'] += 1
+
+        self.uncommitted += 1
+        if self.commit_every and self.uncommitted >= self.commit_every:
+            self.commit()
+
+        return result
+
+    def commit(self):
+        """Commit the invoices imported since the last commit"""
+        frappe.db.commit()
+        self.uncommitted = 0
+
+    def close(self, commit=True):
+        """
+        Write the summary log and, unless commit is False, commit the rest of the batch
+
+        Returns:
+            dict: Batch counters
+        """
+        summary = (
+            f"{self.counts['succeeded']} imported, {self.counts['failed']} failed, "
+            f"{self.counts['errors']} errors, {self.counts['warnings']} warnings"
+        )
+        if self.messages:
+            hidden = self.counts['errors'] + self.counts['warnings'] - len(self.messages)
+            frappe.log_error(
+                message=summary + "\n\n" + "\n".join(self.messages) +
+                        (f"\n... and {hidden} more" if hidden > 0 else ""),
+                title=f"{self.title}: {summary}"[:140]
+            )
+        else:
+            frappe.logger().info(f"{self.title}: {summary}")
+
+        if commit:
+            self.commit()
+        return dict(self.counts)
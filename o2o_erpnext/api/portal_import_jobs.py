@@ -0,0 +1,530 @@
+"""
+Portal Import Jobs Module
+Background, chunked and resumable import of portal invoices into Purchase Invoices
+
+A job records its candidate invoices in the Portal Import Job document, split
+into chunks. Every chunk is a separate RQ job on the long queue, so chunks run
+in parallel on the available workers. A chunk commits its invoices together
+with their outcome rows, which makes the committed state the resume point:
+resuming an interrupted job re-enqueues only chunks that still have Pending
+invoices. A chunk whose portal fetch fails marks its invoices Retry; the job
+ends Failed once nothing else is pending, and a resume retries those chunks.
+"""
+
+import frappe
+import pymysql.cursors
+
+from frappe import _
+from frappe.utils import cint, now_datetime
+
+from o2o_erpnext.api.php_portal_invoices import (
+    PORTAL_INVOICE_COLUMNS,
+    fetch_requisition_items,
+    format_portal_invoice,
+    format_portal_item,
+    import_portal_invoice,
+    summarize_requisition_items
+)
+from o2o_erpnext.api.portal_import_batch import ImportBatch
+from o2o_erpnext.api.portal_import_resolver import (
+    RESOLVER_BATCH_SIZE,
+    EntityResolver,
+    ExistingInvoiceResolver
+)
+from o2o_erpnext.config.external_db_updated import (
+    get_active_database_connection,
+    get_external_db_connection
+)
+
+# Portal import job defaults - each can be overridden in site_config.json
+DEFAULT_IMPORT_JOB_SETTINGS = {
+    'portal_import_chunk_size': 50,      # Invoices imported and committed by one RQ job
+    'portal_import_chunk_timeout': 1500  # Seconds before RQ kills a chunk job
+}
+
+PROGRESS_EVENT = 'portal_import_job_progress'
+
+# Job statuses only a resume may leave
+TERMINAL_STATUSES = ('Completed', 'Completed with Errors', 'Failed')
+
+
+def get_import_job_settings():
+    """
+    Get portal import job settings from site config, falling back to defaults
+
+    Returns:
+        dict: Import job settings
+    """
+    conf = frappe.conf or {}
+    return {key: conf.get(key, default) for key, default in DEFAULT_IMPORT_JOB_SETTINGS.items()}
+
+
+@frappe.whitelist()
+def start_portal_import_job(total_limit=500, chunk_size=None, date_from=None, date_to=None, skip_duplicates=1, update_existing=0):
+    """
+    Queue a background import of recent portal invoices
+
+    Args:
+        total_limit (int): Maximum total invoices to import
+        chunk_size (int): Invoices per background job, defaults to portal_import_chunk_size
+        date_from (str): Start date filter
+        date_to (str): End date filter
+        skip_duplicates (bool): Skip existing invoices
+        update_existing (bool): Update existing invoices
+
+    Returns:
+        dict: Success status and the Portal Import Job name
+    """
+    # The job is inserted with ignore_permissions, so check what it will create
+    if not frappe.has_permission("Purchase Invoice", "create"):
+        frappe.throw(_("You don't have permission to create Purchase Invoices"), frappe.PermissionError)
+
+    try:
+        chunk_size = max(cint(chunk_size) or cint(get_import_job_settings()['portal_import_chunk_size']), 1)
+        candidates = fetch_import_candidates(total_limit, date_from, date_to)
+
+        job = frappe.get_doc({
+            'doctype': 'Portal Import Job',
+            'status': 'Queued',
+            'database_connection': get_active_database_connection().get('name'),
+            'date_from': date_from or None,
+            'date_to': date_to or None,
+            'total_limit': cint(total_limit),
+            'chunk_size': chunk_size,
+            'skip_duplicates': cint(skip_duplicates),
+            'update_existing': cint(update_existing),
+            'total_invoices': len(candidates),
+            'chunks_total': (len(candidates) + chunk_size - 1) // chunk_size,
+            'invoices': [
+                {
+                    'portal_invoice_id': candidate['id'],
+                    'invoice_number': candidate['order_code'],
+                    'chunk': index // chunk_size,
+                    'status': 'Pending'
+                }
+                for index, candidate in enumerate(candidates)
+            ]
+        })
+        # Database Connection is only a record of where the candidates came from
+        if job.database_connection and not frappe.db.exists('Database Connection', job.database_connection):
+            job.database_connection = None
+        job.insert(ignore_permissions=True)
+        frappe.db.commit()
+
+        if not candidates:
+            update_job_progress(job.name)
+            return {
+                'success': True,
+                'job': job.name,
+                'message': 'No portal invoices match the filters'
+            }
+
+        enqueue_pending_chunks(job.name)
+        return {
+            'success': True,
+            'job': job.name,
+            'total_invoices': job.total_invoices,
+            'chunks': job.chunks_total,
+            'message': f'Import of {job.total_invoices} invoices queued as {job.name} ({job.chunks_total} chunks)'
+        }
+
+    except Exception as e:
+        frappe.log_error(
+            message=f"Error starting portal import job: {str(e)}",
+            title="Portal Import Job Failed"
+        )
+        return {
+            'success': False,
+            'message': f'Could not start import job: {str(e)}'
+        }
+
+
+@frappe.whitelist()
+def resume_portal_import_job(job_name):
+    """
+    Re-enqueue the chunks of a job that still have Pending or Retry invoices
+
+    Invoices committed by earlier runs keep their outcome and are not imported again.
+
+    Args:
+        job_name (str): Portal Import Job
+
+    Returns:
+        dict: Success status and the number of chunks queued
+    """
+    frappe.only_for("System Manager")
+    if not frappe.db.exists('Portal Import Job', job_name):
+        return {
+            'success': False,
+            'message': f'Portal Import Job {job_name} not found'
+        }
+
+    # Chunks whose portal fetch failed become Pending again
+    frappe.db.sql("""
+        UPDATE `tabPortal Import Job Invoice`
+        SET status = 'Pending'
+        WHERE parent = %s AND parenttype = 'Portal Import Job' AND status = 'Retry'
+    """, job_name)
+
+    if not frappe.db.exists('Portal Import Job Invoice',
+                            {'parent': job_name, 'parenttype': 'Portal Import Job', 'status': 'Pending'}):
+        update_job_progress(job_name)
+        return {
+            'success': True,
+            'chunks': 0,
+            'message': f'{job_name} has no pending invoices'
+        }
+
+    # Queued before the chunks are, so a fast chunk cannot see the old terminal status
+    frappe.db.set_value('Portal Import Job', job_name, {
+        'status': 'Queued',
+        'error_message': None,
+        'completed_at': None
+    })
+    frappe.db.commit()
+
+    chunks = enqueue_pending_chunks(job_name)
+    return {
+        'success': True,
+        'chunks': len(chunks),
+        'message': f'{job_name}: {len(chunks)} chunks queued'
+    }
+
+
+@frappe.whitelist()
+def get_portal_import_job_status(job_name):
+    """
+    Get the progress of an import job
+
+    Args:
+        job_name (str): Portal Import Job
+
+    Returns:
+        dict: Progress counters, see get_job_progress()
+    """
+    if not frappe.db.exists('Portal Import Job', job_name):
+        return {
+            'success': False,
+            'message': f'Portal Import Job {job_name} not found'
+        }
+
+    progress = get_job_progress(job_name)
+    progress['success'] = True
+    return progress
+
+
+def fetch_import_candidates(total_limit, date_from=None, date_to=None):
+    """
+    Select the requisitions an import job will process, newest first
+
+    Only ids and numbers are read here; chunks fetch the full rows when they run.
+
+    Args:
+        total_limit (int): Maximum candidates
+        date_from (str): Start date filter
+        date_to (str): End date filter
+
+    Returns:
+        list: Rows with id and order_code
+    """
+    query = """
+        SELECT pr.id, pr.order_code
+        FROM purchase_requisitions pr
+        WHERE pr.is_delete = 0
+        AND pr.status = 'active'
+    """
+    params = []
+
+    if date_from:
+        query += " AND DATE(pr.created_at) >= %s"
+        params.append(date_from)
+
+    if date_to:
+        query += " AND DATE(pr.created_at) <= %s"
+        params.append(date_to)
+
+    query += " ORDER BY pr.created_at DESC LIMIT %s"
+    params.append(cint(total_limit))
+
+    with get_external_db_connection(read_only=True) as conn:
+        with conn.cursor(pymysql.cursors.DictCursor) as cursor:
+            cursor.execute(query, params)
+            return cursor.fetchall()
+
+
+def enqueue_pending_chunks(job_name):
+    """
+    Enqueue one long-queue RQ job per chunk that has Pending invoices
+
+    Chunks already waiting in the queue are not enqueued twice.
+
+    Args:
+        job_name (str): Portal Import Job
+
+    Returns:
+        list: Chunk numbers enqueued
+    """
+    chunks = sorted(set(frappe.get_all(
+        'Portal Import Job Invoice',
+        filters={'parent': job_name, 'parenttype': 'Portal Import Job', 'status': 'Pending'},
+        pluck='chunk'
+    )))
+
+    timeout = cint(get_import_job_settings()['portal_import_chunk_timeout'])
+    for chunk in chunks:
+        frappe.enqueue(
+            'o2o_erpnext.api.portal_import_jobs.run_import_chunk',
+            queue='long',
+            timeout=timeout,
+            job_id=f"o2o_portal_import:{job_name}:{chunk}",
+            deduplicate=True,
+            job_name=job_name,
+            chunk=chunk
+        )
+
+    return chunks
+
+
+def run_import_chunk(job_name, chunk):
+    """
+    Import the Pending invoices of one chunk and commit them with their outcomes.
+    Runs as an RQ job, see enqueue_pending_chunks().
+
+    Args:
+        job_name (str): Portal Import Job
+        chunk (int): Chunk number
+    """
+    job = frappe.db.get_value(
+        'Portal Import Job',
+        job_name,
+        ['name', 'status', 'skip_duplicates', 'update_existing', 'started_at'],
+        as_dict=True
+    )
+    if not job:
+        return
+
+    rows = frappe.get_all(
+        'Portal Import Job Invoice',
+        filters={'parent': job_name, 'parenttype': 'Portal Import Job', 'chunk': chunk, 'status': 'Pending'},
+        fields=['name', 'portal_invoice_id', 'invoice_number'],
+        order_by='idx asc'
+    )
+    if not rows:
+        update_job_progress(job_name)
+        return
+
+    if job.status == 'Queued':
+        frappe.db.set_value('Portal Import Job', job_name, {
+            'status': 'Running',
+            'started_at': job.started_at or now_datetime()
+        }, update_modified=False)
+        frappe.db.commit()
+
+    try:
+        invoices = fetch_chunk_invoices([row.portal_invoice_id for row in rows])
+    except Exception as e:
+        # Nothing was imported; the chunk's rows carry the error until a resume retries them
+        frappe.log_error(
+            message=f"Error fetching chunk {chunk} of {job_name}: {str(e)}",
+            title="Portal Import Chunk Failed"
+        )
+        for row in rows:
+            set_invoice_outcome(row.name, 'Retry', message=f'Chunk {chunk}: {str(e)}')
+        update_job_progress(job_name)
+        return
+
+    existing_invoices = ExistingInvoiceResolver.load(
+        titles=[invoice['invoice_number'] for invoice in invoices.values()]
+    )
+    entities = EntityResolver()
+    # Savepoint per invoice; the chunk is committed as a whole below
+    batch = ImportBatch(f'Portal Import Job {job_name} chunk {chunk}', commit_every=0, entities=entities)
+
+    for row in rows:
+        invoice = invoices.get(row.portal_invoice_id)
+        if not invoice:
+            set_invoice_outcome(row.name, 'Failed', message='Invoice is no longer active in the portal')
+            continue
+
+        outcome = {
+            'imported_count': 0,
+            'skipped_count': 0,
+            'error_count': 0,
+            'detailed_errors': [],
+            'warnings': []
+        }
+        import_portal_invoice(
+            invoice,
+            cint(job.skip_duplicates),
+            cint(job.update_existing),
+            outcome,
+            existing_invoices,
+            entities,
+            batch
+        )
+
+        if outcome['imported_count']:
+            status = 'Imported'
+        elif outcome['skipped_count']:
+            status = 'Skipped'
+        else:
+            status = 'Failed'
+
+        set_invoice_outcome(
+            row.name,
+            status,
+            purchase_invoice=existing_invoices.by_title(invoice['invoice_number']),
+            message="\n".join(outcome['detailed_errors'] + outcome['warnings'])
+        )
+
+    # Invoices, their outcome rows and the chunk's summary log are committed together
+    batch.close()
+    update_job_progress(job_name)
+
+
+def fetch_chunk_invoices(portal_ids):
+    """
+    Fetch the full portal invoices of a chunk
+
+    Args:
+        portal_ids (list): purchase_requisitions ids
+
+    Returns:
+        dict: Invoice (as returned by get_recent_portal_invoices) by requisition id
+    """
+    invoices = {}
+    with get_external_db_connection(read_only=True) as conn:
+        with conn.cursor(pymysql.cursors.DictCursor) as cursor:
+            for i in range(0, len(portal_ids), RESOLVER_BATCH_SIZE):
+                batch = portal_ids[i:i + RESOLVER_BATCH_SIZE]
+                placeholders = ', '.join(['%s'] * len(batch))
+                cursor.execute(f"""
+                    SELECT {PORTAL_INVOICE_COLUMNS}
+                    FROM purchase_requisitions pr
+                    WHERE pr.id IN ({placeholders})
+                    AND pr.is_delete = 0
+                    AND pr.status = 'active'
+                """, batch)
+                requisitions = cursor.fetchall()
+
+                items_by_requisition = fetch_requisition_items(
+                    cursor, [req['requisition_id'] for req in requisitions]
+                )
+                for req in requisitions:
+                    items = items_by_requisition.get(req['requisition_id'], [])
+                    invoice = format_portal_invoice(req, summarize_requisition_items(items))
+                    invoice['items'] = [format_portal_item(item) for item in items]
+                    invoices[req['requisition_id']] = invoice
+
+    return invoices
+
+
+def set_invoice_outcome(row_name, status, purchase_invoice=None, message=None):
+    """Record the outcome of one invoice in its job row"""
+    frappe.db.set_value('Portal Import Job Invoice', row_name, {
+        'status': status,
+        'purchase_invoice': purchase_invoice,
+        'message': (message or '')[:1000]
+    }, update_modified=False)
+
+
+def get_job_progress(job_name):
+    """
+    Count the outcomes of a job's invoices
+
+    Args:
+        job_name (str): Portal Import Job
+
+    Returns:
+        dict: job, status, total_invoices, chunks_total, chunks_completed,
+            imported_count, skipped_count, error_count, pending_count and retry_count
+    """
+    counts = dict(frappe.db.sql("""
+        SELECT status, COUNT(*)
+        FROM `tabPortal Import Job Invoice`
+        WHERE parent = %s AND parenttype = 'Portal Import Job'
+        GROUP BY status
+    """, job_name))
+
+    pending_chunks = frappe.db.sql("""
+        SELECT COUNT(DISTINCT chunk)
+        FROM `tabPortal Import Job Invoice`
+        WHERE parent = %s AND parenttype = 'Portal Import Job' AND status IN ('Pending', 'Retry')
+    """, job_name)[0][0]
+
+    job = frappe.db.get_value(
+        'Portal Import Job', job_name, ['status', 'total_invoices', 'chunks_total'], as_dict=True
+    )
+    return {
+        'job': job_name,
+        'status': job.status,
+        'total_invoices': job.total_invoices,
+        'chunks_total': job.chunks_total,
+        'chunks_completed': job.chunks_total - pending_chunks,
+        'imported_count': counts.get('Imported', 0),
+        'skipped_count': counts.get('Skipped', 0),
+        'error_count': counts.get('Failed', 0),
+        'pending_count': counts.get('Pending', 0),
+        'retry_count': counts.get('Retry', 0)
+    }
+
+
+def update_job_progress(job_name):
+    """
+    Recompute the job counters from its invoice rows, finish the job when
+    nothing is pending and publish the progress.
+
+    The status is derived from the rows: Failed when chunks are left to retry,
+    otherwise Completed (with Errors). A finished job keeps its status until
+    resume_portal_import_job() queues it again.
+
+    Chunks finish concurrently, so the job row is locked first; the counters
+    are then read after every earlier chunk has committed.
+
+    Args:
+        job_name (str): Portal Import Job
+    """
+    status = frappe.db.get_value('Portal Import Job', job_name, 'status', for_update=True)
+    progress = get_job_progress(job_name)
+
+    values = {
+        'chunks_completed': progress['chunks_completed'],
+        'imported_count': progress['imported_count'],
+        'skipped_count': progress['skipped_count'],
+        'error_count': progress['error_count']
+    }
+    if not progress['pending_count'] and status not in TERMINAL_STATUSES:
+        if progress['retry_count']:
+            values['status'] = 'Failed'
+            values['error_message'] = frappe.db.get_value(
+                'Portal Import Job Invoice',
+                {'parent': job_name, 'parenttype': 'Portal Import Job', 'status': 'Retry'},
+                'message'
+            )
+        elif progress['error_count']:
+            values['status'] = 'Completed with Errors'
+        else:
+            values['status'] = 'Completed'
+        values['completed_at'] = now_datetime()
+
+    frappe.db.set_value('Portal Import Job', job_name, values)
+    frappe.db.commit()
+    publish_job_progress(job_name)
+
+
+def publish_job_progress(job_name):
+    """
+    Push the job's progress to the user who started it
+
+    Args:
+        job_name (str): Portal Import Job
+    """
+    progress = get_job_progress(job_name)
+    done = progress['total_invoices'] - progress['pending_count']
+    progress['percent'] = round(done * 100 / progress['total_invoices'], 1) if progress['total_invoices'] else 100
+
+    frappe.publish_realtime(
+        PROGRESS_EVENT,
+        progress,
+        user=frappe.db.get_value('Portal Import Job', job_name, 'owner')
+    )
@@ -0,0 +1,212 @@
+"""
+Portal Import Resolver Module
+Set-based lookups for portal imports, so that a batch of N invoices costs a
+handful of IN queries instead of N point lookups
+"""
+
+import frappe
+
+# Values per IN (...) list
+RESOLVER_BATCH_SIZE = 1000
+
+
+class ExistingInvoiceResolver:
+    """
+    Existing Purchase Invoices of an import batch, keyed by title (portal
+    invoice number) and by custom_portal_invoice_id
+
+    Usage:
+        existing = ExistingInvoiceResolver.load(titles=numbers, portal_ids=ids)
+        if existing.by_title(number): ...
+        existing.add(title=number, name=doc.name)  # after creating one
+    """
+
+    def __init__(self):
+        self.titles = {}
+        self.portal_ids = {}
+
+    @classmethod
+    def load(cls, titles=(), portal_ids=()):
+        """
+        Resolve which of the candidates already exist with one IN query per 1000 candidates
+
+        Args:
+            titles (iterable): Purchase Invoice titles (portal invoice numbers)
+            portal_ids (iterable): Portal invoice ids stored in custom_portal_invoice_id
+
+        Returns:
+            ExistingInvoiceResolver: Resolver holding the matches
+        """
+        resolver = cls()
+        titles = list({str(title) for title in titles if title})
+        portal_ids = list({str(portal_id) for portal_id in portal_ids if portal_id not in (None, '')})
+
+        # The custom field is optional on older sites
+        if portal_ids and not frappe.db.has_column('Purchase Invoice', 'custom_portal_invoice_id'):
+            portal_ids = []
+
+        fields = ['name', 'title']
+        if portal_ids:
+            fields.append('custom_portal_invoice_id')
+
+        # Titles and portal ids go into the same OR query, chunk by chunk
+        for i in range(0, max(len(titles), len(portal_ids)), RESOLVER_BATCH_SIZE):
+            or_filters = {}
+            if titles[i:i + RESOLVER_BATCH_SIZE]:
+                or_filters['title'] = ['in', titles[i:i + RESOLVER_BATCH_SIZE]]
+            if portal_ids[i:i + RESOLVER_BATCH_SIZE]:
+                or_filters['custom_portal_invoice_id'] = ['in', portal_ids[i:i + RESOLVER_BATCH_SIZE]]
+
+            for row in frappe.get_all('Purchase Invoice', or_filters=or_filters, fields=fields):
+                resolver.add(title=row.title, portal_id=row.get('custom_portal_invoice_id'), name=row.name)
+
+        return resolver
+
+    def add(self, name, title=None, portal_id=None):
+        """Record an invoice, e.g. one created earlier in the same batch"""
+        if title:
+            self.titles.setdefault(str(title), name)
+        if portal_id not in (None, ''):
+            self.portal_ids.setdefault(str(portal_id), name)
+
+    def by_title(self, title):
+        """
+        Returns:
+            str: Name of the first Purchase Invoice with this title, or None
+        """
+        return self.titles.get(str(title)) if title else None
+
+    def by_portal_id(self, portal_id):
+        """
+        Returns:
+            str: Name of the Purchase Invoice imported from this portal id, or None
+        """
+        return self.portal_ids.get(str(portal_id)) if portal_id not in (None, '') else None
+
+
+class EntityResolver:
+    """
+    Master records looked up while validating and creating imported invoices
+
+    With preload (batch imports) each doctype's names and labels are read
+    once, on first use, and every later check is set membership. Without
+    preload (single invoice) each value is looked up once and memoized.
+    Records created during the batch are added with add(); invalidate()
+    drops a doctype so it is reloaded on next use. Values are compared
+    case-insensitively and without trailing spaces, like the database
+    collation the point lookups rely on.
+
+    Usage:
+        entities = EntityResolver()
+        if entities.exists('Supplier', supplier_name): ...
+        supplier = entities.resolve('Supplier', supplier_name)  # document name for Link fields
+    """
+
+    # Field compared by resolve() and exists(), besides the document name
+    LABEL_FIELDS = {
+        'Customer': 'customer_name',
+        'Supplier': 'supplier_name',
+        'Company': 'company_name',
+        'Cost Center': 'cost_center_name',
+        'Department': 'department_name',
+        'Item': 'item_name',
+        'Supplier Group': 'supplier_group_name',
+        'Item Group': 'item_group_name'
+    }
+
+    def __init__(self, preload=True):
+        self.preload = preload
+        self._names = {}
+        self._resolved = {}
+        self._memo = {}
+
+    def _load(self, doctype):
+        if doctype not in self._names:
+            label_field = self.LABEL_FIELDS[doctype]
+            rows = frappe.get_all(doctype, fields=['name', label_field])
+            self._names[doctype] = [row.name for row in rows]
+            # Document names win over labels that happen to equal another record's name
+            resolved = {self._key(row.get(label_field)): row.name for row in rows if row.get(label_field)}
+            resolved.update((self._key(row.name), row.name) for row in rows)
+            self._resolved[doctype] = resolved
+        return self._resolved[doctype]
+
+    @staticmethod
+    def _key(value):
+        """Lookup key matching the database's case-insensitive, PAD SPACE comparison"""
+        return str(value).rstrip().casefold()
+
+    def resolve(self, doctype, value):
+        """
+        Document name of the record with this name or label
+
+        Args:
+            doctype (str): One of LABEL_FIELDS
+            value (str): Document name or label field value
+
+        Returns:
+            str: Document name, or None when not found
+        """
+        if not value:
+            return None
+
+        if self.preload:
+            return self._load(doctype).get(self._key(value))
+
+        key = (doctype, self._key(value))
+        if key not in self._memo:
+            self._memo[key] = (
+                frappe.db.exists(doctype, value)
+                or frappe.db.get_value(doctype, {self.LABEL_FIELDS[doctype]: value}, 'name')
+            )
+        return self._memo[key]
+
+    def exists(self, doctype, value):
+        """
+        Check whether a record with this name or label exists
+
+        Args:
+            doctype (str): One of LABEL_FIELDS
+            value (str): Document name or label field value
+
+        Returns:
+            bool: True when found
+        """
+        return bool(self.resolve(doctype, value))
+
+    def first(self, doctype):
+        """
+        Returns:
+            str: First record of the doctype in its default sort order, or None
+        """
+        if self.preload:
+            self._load(doctype)
+            return self._names[doctype][0] if self._names[doctype] else None
+
+        key = (doctype, None)
+        if key not in self._memo:
+            names = frappe.get_all(doctype, limit=1, pluck='name')
+            self._memo[key] = names[0] if names else None
+        return self._memo[key]
+
+    def add(self, doctype, name, label=None):
+        """Record a document created during the batch"""
+        if self.preload and doctype in self._names:
+            self._names[doctype].append(name)
+            self._resolved[doctype].setdefault(self._key(name), name)
+            if label:
+                self._resolved[doctype].setdefault(self._key(label), name)
+        else:
+            for value in (name, label):
+                if value:
+                    self._memo[(doctype, self._key(value))] = name
+            self._memo.setdefault((doctype, None), name)
+
+    def invalidate(self, doctype=None):
+        """Forget a doctype, or everything, so it is read again on next use"""
+        if doctype:
+            self._names.pop(doctype, None)
+            self._resolved.pop(doctype, None)
+            self._memo = {key: value for key, value in self._memo.items() if key[0] != doctype}
+        else:
+            self._names, self._resolved, self._memo = {}, {}, {}
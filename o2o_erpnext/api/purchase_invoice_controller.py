@@ -5,6 +5,90 @@ import json
 from frappe import _
 from frappe.model.document import Document
 
+def find_remote_duplicates(cursor, invoices):
+    """
+    Find portal requisitions clashing with Purchase Invoices, in one query
+
+    Both lookups (order_code = ERPNext invoice name, invoice_number = supplier
+    invoice number) go out as one UNION, each side served by its portal index.
+
+    Args:
+        cursor: Portal cursor (DictCursor)
+        invoices (list): (invoice_name, supplier_invoice) pairs
+
+    Returns:
+        dict: {invoice_name: {'order_code': row or None, 'invoice_number': row or None}}
+    """
+    order_codes = [name for name, supplier_invoice in invoices]
+    invoice_numbers = [supplier_invoice for name, supplier_invoice in invoices if supplier_invoice]
+
+    query = """
+        SELECT 'order_code' as match_type, id, order_code, invoice_number, order_name, created_at
+        FROM purchase_requisitions
+        WHERE is_delete = 0 AND order_code IN ({order_codes})
+    """.format(order_codes=', '.join(['%s'] * len(order_codes)))
+    params = list(order_codes)
+    if invoice_numbers:
+        query += """
+        UNION ALL
+        SELECT 'invoice_number' as match_type, id, order_code, invoice_number, order_name, created_at
+        FROM purchase_requisitions
+        WHERE is_delete = 0 AND invoice_number IN ({invoice_numbers})
+        """.format(invoice_numbers=', '.join(['%s'] * len(invoice_numbers)))
+        params += invoice_numbers
+    query += " ORDER BY id"
+
+    cursor.execute(query, params)
+    matches = {}
+    for row in cursor.fetchall():
+        key = row['order_code'] if row['match_type'] == 'order_code' else row['invoice_number']
+        matches.setdefault((row['match_type'], key), row)
+
+    return {
+        name: {
+            'order_code': matches.get(('order_code', name)),
+            'invoice_number': matches.get(('invoice_number', supplier_invoice)) if supplier_invoice else None
+        }
+        for name, supplier_invoice in invoices
+    }
+
+
+def get_remote_duplicate_check(doc):
+    """
+    Remote duplicate check of a Purchase Invoice, memoized on doc.flags
+
+    The check is hooked on validate and on_submit; a submit runs both, so the
+    result is kept for the invoice name and supplier invoice it was made for.
+    A connectivity failure is memoized too, so the warning shows once.
+
+    Returns:
+        dict: order_code and invoice_number matches, or error
+    """
+    key = (doc.name, doc.bill_no)
+    cached = doc.flags.remote_duplicate_check
+    if cached and cached['key'] == key:
+        return cached['result']
+
+    try:
+        # Import here to avoid circular imports
+        from o2o_erpnext.config.external_db_updated import get_external_db_connection
+        import pymysql.cursors
+
+        frappe.logger().info(f"🔍 Checking remote duplicates for Invoice: {doc.name}, Supplier Invoice: {doc.bill_no}")
+
+        # Primary, not the replica: a lagging replica would miss a row pushed
+        # seconds ago. Fail fast while the portal is down instead of holding up the submit
+        with get_external_db_connection(fast_fail=True) as conn:
+            with conn.cursor(pymysql.cursors.DictCursor) as cursor:
+                result = find_remote_duplicates(cursor, [key])[doc.name]
+    except Exception as e:
+        frappe.logger().error(f"❌ Remote duplicate check failed for {doc.name}: {str(e)}")
+        result = {'error': str(e)}
+
+    doc.flags.remote_duplicate_check = {'key': key, 'result': result}
+    return result
+
+
 def validate_remote_duplicate_on_submit(doc, method=None):
     """
     Validate Purchase Invoice against remote database duplicates before submission
@@ -14,113 +98,134 @@ def validate_remote_duplicate_on_submit(doc, method=None):
 
     Args:
         doc: Purchase Invoice document being submitted
-        method: Hook method (on_submit)
+        method: Hook method (validate / on_submit)
     """
     # Only validate on submission (docstatus = 1)
     if doc.docstatus != 1:
         return
-        
+
+    first_run = not doc.flags.remote_duplicate_check
+    check = get_remote_duplicate_check(doc)
+
+    invoice_name = doc.name  # ERPNext invoice number (e.g., CINV-24-00001)
+    supplier_invoice = doc.bill_no  # Supplier invoice number
+
+    if check.get('error'):
+        # Don't block submission for database connectivity issues
+        if first_run:
+            frappe.msgprint(
+                _(f"⚠️ <strong>Warning:</strong> Could not verify duplicates in portal database.<br><br>"
+                  f"<strong>Error:</strong> {check['error']}<br><br>"
+                  f"<em>Invoice submission will proceed, but please manually verify no duplicates exist in the portal.</em>"),
+                title=_("🔗 Portal Connection Warning"),
+                indicator="orange"
+            )
+        return
+
+    order_code_duplicate = check['order_code']
+    invoice_number_duplicate = check['invoice_number']
+
+    if not (order_code_duplicate or invoice_number_duplicate):
+        if first_run:
+            frappe.logger().info(f"✅ No duplicates found for {invoice_name} - submission allowed")
+        return
+
+    # If any duplicates found, block submission
+    error_messages = []
+
+    if order_code_duplicate:
+        dup = order_code_duplicate
+        created_date = dup['created_at'].strftime('%Y-%m-%d %H:%M') if dup['created_at'] else 'Unknown'
+        error_messages.append(
+            f"📋 <strong>ERPNext Invoice Number</strong> '{invoice_name}' already exists in portal<br>"
+            f"&nbsp;&nbsp;&nbsp;&nbsp;Portal ID: {dup['id']}<br>"
+            f"&nbsp;&nbsp;&nbsp;&nbsp;Order Name: {dup['order_name'] or 'N/A'}<br>"
+            f"&nbsp;&nbsp;&nbsp;&nbsp;Created: {created_date}"
+        )
+
+    if invoice_number_duplicate:
+        dup = invoice_number_duplicate
+        created_date = dup['created_at'].strftime('%Y-%m-%d %H:%M') if dup['created_at'] else 'Unknown'
+        error_messages.append(
+            f"🧾 <strong>Supplier Invoice Number</strong> '{supplier_invoice}' already exists in portal<br>"
+            f"&nbsp;&nbsp;&nbsp;&nbsp;Portal ID: {dup['id']}<br>"
+            f"&nbsp;&nbsp;&nbsp;&nbsp;Order Code: {dup['order_code'] or 'N/A'}<br>"
+            f"&nbsp;&nbsp;&nbsp;&nbsp;Created: {created_date}"
+        )
+
+    # Create user-friendly error message
+    main_message = (
+        f"🚫 <strong>Duplicate Invoice Detected!</strong><br><br>"
+        f"Cannot submit Purchase Invoice because duplicate record(s) found in portal:<br><br>"
+        f"{'<br><br>'.join(error_messages)}<br><br>"
+        f"<strong>🔧 How to Fix:</strong><br>"
+        f"1. Change the Invoice ID (currently: <code>{invoice_name}</code>)<br>"
+        f"2. Or update the Supplier Invoice Number (currently: <code>{supplier_invoice or 'Not Set'}</code>)<br>"
+        f"3. Then try submitting again<br><br>"
+        f"<em>This validation ensures no duplicate invoices are created in the portal system.</em>"
+    )
+
+    frappe.throw(
+        _(main_message),
+        title=_("🔍 Duplicate Check Failed"),
+        exc=frappe.DuplicateEntryError
+    )
+
+
+@frappe.whitelist()
+def check_remote_duplicates(names):
+    """
+    Check many Purchase Invoices for portal duplicates in one round trip
+
+    Used by the list view to flag invoices that would fail the submit check.
+    The flags are advisory, so the read replica is fine here; the submit
+    check itself reads the primary.
+
+    Args:
+        names (list|str): Purchase Invoice names (list or JSON list)
+
+    Returns:
+        dict: success, and duplicates by invoice name (only invoices with a match)
+    """
+    if isinstance(names, str):
+        names = json.loads(names)
+    if not names:
+        return {'success': True, 'duplicates': {}}
+
+    # Only invoices the user can read
+    invoices = frappe.get_list(
+        'Purchase Invoice',
+        filters={'name': ['in', names]},
+        fields=['name', 'bill_no'],
+        limit_page_length=0
+    )
+
     try:
-        # Import here to avoid circular imports
         from o2o_erpnext.config.external_db_updated import get_external_db_connection
-        
-        # Get Purchase Invoice details for checking
-        invoice_name = doc.name  # ERPNext invoice number (e.g., CINV-24-00001)
-        supplier_invoice = doc.bill_no  # Supplier invoice number
-        
-        frappe.logger().info(f"🔍 Checking remote duplicates for Invoice: {invoice_name}, Supplier Invoice: {supplier_invoice}")
-        
-        with get_external_db_connection() as conn:
-            with conn.cursor() as cursor:
-                # Check for duplicates by order_code (ERPNext invoice number)
-                cursor.execute("""
-                    SELECT id, order_code, invoice_number, order_name, created_at 
-                    FROM purchase_requisitions 
-                    WHERE order_code = %s AND is_delete = 0
-                    LIMIT 1
-                """, (invoice_name,))
-                
-                order_code_duplicate = cursor.fetchone()
-                
-                # Check for duplicates by invoice_number (supplier invoice number)
-                invoice_number_duplicate = None
-                if supplier_invoice:
-                    cursor.execute("""
-                        SELECT id, order_code, invoice_number, order_name, created_at 
-                        FROM purchase_requisitions 
-                        WHERE invoice_number = %s AND is_delete = 0
-                        LIMIT 1
-                    """, (supplier_invoice,))
-                    
-                    invoice_number_duplicate = cursor.fetchone()
-                
-                # If any duplicates found, block submission
-                if order_code_duplicate or invoice_number_duplicate:
-                    error_messages = []
-                    
-                    if order_code_duplicate:
-                        dup = order_code_duplicate
-                        created_date = dup['created_at'].strftime('%Y-%m-%d %H:%M') if dup['created_at'] else 'Unknown'
-                        error_messages.append(
-                            f"📋 <strong>ERPNext Invoice Number</strong> '{invoice_name}' already exists in portal<br>"
-                            f"&nbsp;&nbsp;&nbsp;&nbsp;Portal ID: {dup['id']}<br>"
-                            f"&nbsp;&nbsp;&nbsp;&nbsp;Order Name: {dup['order_name'] or 'N/A'}<br>"
-                            f"&nbsp;&nbsp;&nbsp;&nbsp;Created: {created_date}"
-                        )
-                    
-                    if invoice_number_duplicate:
-                        dup = invoice_number_duplicate
-                        created_date = dup['created_at'].strftime('%Y-%m-%d %H:%M') if dup['created_at'] else 'Unknown'
-                        error_messages.append(
-                            f"🧾 <strong>Supplier Invoice Number</strong> '{supplier_invoice}' already exists in portal<br>"
-                            f"&nbsp;&nbsp;&nbsp;&nbsp;Portal ID: {dup['id']}<br>"
-                            f"&nbsp;&nbsp;&nbsp;&nbsp;Order Code: {dup['order_code'] or 'N/A'}<br>"
-                            f"&nbsp;&nbsp;&nbsp;&nbsp;Created: {created_date}"
-                        )
-                    
-                    # Create user-friendly error message
-                    main_message = (
-                        f"🚫 <strong>Duplicate Invoice Detected!</strong><br><br>"
-                        f"Cannot submit Purchase Invoice because duplicate record(s) found in portal:<br><br>"
-                        f"{'<br><br>'.join(error_messages)}<br><br>"
-                        f"<strong>🔧 How to Fix:</strong><br>"
-                        f"1. Change the Invoice ID (currently: <code>{invoice_name}</code>)<br>"
-                        f"2. Or update the Supplier Invoice Number (currently: <code>{supplier_invoice or 'Not Set'}</code>)<br>"
-                        f"3. Then try submitting again<br><br>"
-                        f"<em>This validation ensures no duplicate invoices are created in the portal system.</em>"
-                    )
-                    
-                    frappe.throw(
-                        _(main_message),
-                        title=_("🔍 Duplicate Check Failed"),
-                        exc=frappe.DuplicateEntryError
-                    )
-                
-                else:
-                    # No duplicates found - log success
-                    frappe.logger().info(f"✅ No duplicates found for {invoice_name} - submission allowed")
-    
+        import pymysql.cursors
+
+        duplicates = {}
+        with get_external_db_connection(read_only=True, fast_fail=True) as conn:
+            with conn.cursor(pymysql.cursors.DictCursor) as cursor:
+                for start in range(0, len(invoices), 500):
+                    batch = [(inv.name, inv.bill_no) for inv in invoices[start:start + 500]]
+                    for name, matches in find_remote_duplicates(cursor, batch).items():
+                        if matches['order_code'] or matches['invoice_number']:
+                            duplicates[name] = {
+                                match_type: {'portal_id': row['id'], 'order_code': row['order_code'],
+                                             'invoice_number': row['invoice_number']}
+                                for match_type, row in matches.items() if row
+                            }
+
+        return {'success': True, 'duplicates': duplicates}
+
     except Exception as e:
-        # Log the error but don't block submission for database connectivity issues
-        error_msg = str(e)
-        frappe.logger().error(f"❌ Remote duplicate check failed for {doc.name}: {error_msg}")
-        
-        # Only block if it's a duplicate error we threw intentionally
-        if isinstance(e, frappe.DuplicateEntryError):
-            raise e
-        
-        # For other errors (connectivity, etc.), show warning but allow submission
-        frappe.msgprint(
-            _(f"⚠️ <strong>Warning:</strong> Could not verify duplicates in portal database.<br><br>"
-              f"<strong>Error:</strong> {error_msg}<br><br>"
-              f"<em>Invoice submission will proceed, but please manually verify no duplicates exist in the portal.</em>"),
-            title=_("🔗 Portal Connection Warning"),
-            indicator="orange"
-        )
+        frappe.logger().error(f"Bulk remote duplicate check failed: {str(e)}")
+        return {'success': False, 'message': str(e), 'duplicates': {}}
 
 def create_remote_invoice_on_submit(doc, method=None):
     """
-    Create invoice in remote ProcureUAT database on Purchase Invoice submit
+    Queue creation of the invoice in remote ProcureUAT database on Purchase Invoice submit
     
     Args:
         doc: Purchase Invoice document
@@ -139,54 +244,17 @@ def create_remote_invoice_on_submit(doc, method=None):
         )
         return
     
-    try:
-        frappe.logger().info(f"🚀 Creating remote invoice for {doc.name}")
-        
-        # Import here to avoid circular imports
-        from o2o_erpnext.api.remote_invoice_creator import create_remote_invoice
-        
-        # Create remote invoice
-        success, remote_invoice_code, message = create_remote_invoice(doc)
-        
-        if success:
-            # Update ERPNext document with remote details
-            doc.custom_portal_sync_id = remote_invoice_code
-            doc.custom_sync_status = "Synced"
-            doc.save(ignore_permissions=True)
-            
-            frappe.msgprint(
-                _(f"✅ <strong>Invoice Created Successfully!</strong><br><br>"
-                  f"<strong>Remote Invoice Code:</strong> {remote_invoice_code}<br>"
-                  f"<strong>Message:</strong> {message}<br><br>"
-                  f"<em>Invoice has been created in the portal database.</em>"),
-                title=_("🎉 Portal Sync Success"),
-                indicator="green"
-            )
-            
-        else:
-            # Log error but don't block submission
-            doc.custom_sync_status = "Failed"
-            doc.save(ignore_permissions=True)
-            
-            frappe.msgprint(
-                _(f"⚠️ <strong>Warning:</strong> Invoice submitted successfully but portal sync failed.<br><br>"
-                  f"<strong>Error:</strong> {message}<br><br>"
-                  f"<em>Please contact administrator to manually sync this invoice.</em>"),
-                title=_("🔗 Portal Sync Warning"),
-                indicator="orange"
-            )
-            
-    except Exception as e:
-        error_msg = str(e)
-        frappe.logger().error(f"❌ Remote invoice creation failed for {doc.name}: {error_msg}")
-        
-        # Don't block submission for sync errors
+    # Queue the push in the submit transaction; the outbox dispatcher creates
+    # the remote invoice once the submit has committed
+    from o2o_erpnext.sync.portal_outbox import enqueue_portal_push
+    
+    if enqueue_portal_push(doc, 'Create Remote Invoice'):
+        frappe.db.set_value('Purchase Invoice', doc.name, 'custom_sync_status', 'Pending', update_modified=False)
         frappe.msgprint(
-            _(f"⚠️ <strong>Warning:</strong> Invoice submitted but portal creation failed.<br><br>"
-              f"<strong>Error:</strong> {error_msg}<br><br>"
-              f"<em>Invoice submission completed. Please retry sync manually.</em>"),
-            title=_("🔗 Portal Creation Failed"),
-            indicator="red"
+            _("🔄 Invoice queued for creation in the portal. The sync status updates once it has been sent."),
+            title=_("🔗 Portal Sync Queued"),
+            indicator="blue",
+            alert=True
         )
     
     @staticmethod
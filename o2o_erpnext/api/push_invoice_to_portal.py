@@ -4,6 +4,7 @@ from frappe import _
 from datetime import datetime
 import pymysql.cursors
 from o2o_erpnext.config.external_db_updated import get_external_db_connection
+from o2o_erpnext.sync.portal_push import PortalPushPipeline
 
 @frappe.whitelist()
 def push_purchase_invoice_to_portal(invoice_name, force_update=False):
@@ -70,12 +71,14 @@ def push_purchase_invoice_to_portal(invoice_name, force_update=False):
             'invoice_name': invoice_name
         }
 
-def validate_invoice_for_push(invoice_doc):
+def validate_invoice_for_push(invoice_doc, entity_check=None):
     """
     Validate if the invoice can be pushed to portal
     
     Args:
         invoice_doc: Purchase Invoice document
+        entity_check (dict): Entity/subentity check already made for a batch,
+            instead of querying the portal (optional)
         
     Returns:
         dict: Validation result
@@ -97,10 +100,11 @@ def validate_invoice_for_push(invoice_doc):
             errors.append('Invoice must be submitted before pushing to portal')
         
         # Check entity/subentity exist in portal
-        entity_check = validate_entity_subentity_in_portal(
-            invoice_doc.get('entity'), 
-            invoice_doc.get('subentity_id')
-        )
+        if entity_check is None:
+            entity_check = validate_entity_subentity_in_portal(
+                invoice_doc.get('entity'), 
+                invoice_doc.get('subentity_id')
+            )
         if not entity_check['valid']:
             errors.append(f'Entity/Subentity validation failed: {entity_check["message"]}')
         
@@ -434,7 +438,7 @@ def update_invoice_in_portal(portal_id, portal_data):
         frappe.logger().error(f"Error updating portal: {str(e)}")
         raise
 
-def update_invoice_sync_status(invoice_doc, portal_id, operation):
+def update_invoice_sync_status(invoice_doc, portal_id, operation, commit=True):
     """
     Update ERPNext invoice with portal sync information
     
@@ -442,6 +446,7 @@ def update_invoice_sync_status(invoice_doc, portal_id, operation):
         invoice_doc: Purchase Invoice document
         portal_id: Portal record ID
         operation: Operation performed (created/updated)
+        commit (bool): Commit right away (batched pushes commit per chunk)
     """
     try:
         # Add custom fields if they don't exist
@@ -456,7 +461,8 @@ def update_invoice_sync_status(invoice_doc, portal_id, operation):
             'portal_sync_operation': operation
         })
         
-        frappe.db.commit()
+        if commit:
+            frappe.db.commit()
         
     except Exception as e:
         frappe.logger().error(f"Error updating sync status: {str(e)}")
@@ -523,18 +529,9 @@ def push_multiple_invoices(invoice_names, force_update=False):
         if isinstance(invoice_names, str):
             invoice_names = [name.strip() for name in invoice_names.split(',')]
         
-        results = []
-        success_count = 0
-        failed_count = 0
-        
-        for invoice_name in invoice_names:
-            result = push_purchase_invoice_to_portal(invoice_name, force_update)
-            results.append(result)
-            
-            if result['success']:
-                success_count += 1
-            else:
-                failed_count += 1
+        results = PortalInvoicePushPipeline(force_update=force_update).run(invoice_names)
+        success_count = sum(1 for result in results if result['success'])
+        failed_count = len(results) - success_count
         
         return {
             'success': True,
@@ -550,4 +547,55 @@ def push_multiple_invoices(invoice_names, force_update=False):
             'success': False,
             'message': f'Batch operation failed: {str(e)}',
             'results': []
-        }
\ No newline at end of file
+        }
+
+class PortalInvoicePushPipeline(PortalPushPipeline):
+    """
+    Batched push_purchase_invoice_to_portal: invoices are matched by invoice
+    number, rows carry the ERPNext name in order_name, and the entity and
+    subentity checks are made once per chunk
+    """
+    
+    key_column = 'order_name'
+    
+    def prepare_chunk(self, docs, cursor):
+        entity_ids = list({doc.get('entity') for doc in docs if doc.get('entity')})
+        subentity_ids = list({doc.get('subentity_id') for doc in docs if doc.get('subentity_id')})
+        
+        self.entities, self.subentities = {}, {}
+        if entity_ids:
+            cursor.execute(
+                f"SELECT id, name FROM entitys WHERE id IN ({', '.join(['%s'] * len(entity_ids))})",
+                entity_ids
+            )
+            self.entities = {str(row['id']): row for row in cursor.fetchall()}
+        if subentity_ids:
+            cursor.execute(
+                f"SELECT id, entity_id, name FROM subentitys WHERE id IN ({', '.join(['%s'] * len(subentity_ids))})",
+                subentity_ids
+            )
+            self.subentities = {str(row['id']): row for row in cursor.fetchall()}
+    
+    def validate(self, doc):
+        entity_id, subentity_id = doc.get('entity'), doc.get('subentity_id')
+        entity = self.entities.get(str(entity_id))
+        subentity = self.subentities.get(str(subentity_id))
+        
+        if not entity:
+            entity_check = {'valid': False, 'message': f'Entity ID {entity_id} not found in portal'}
+        elif not subentity or str(subentity['entity_id']) != str(entity_id):
+            entity_check = {'valid': False, 'message': f'Subentity ID {subentity_id} not found for entity {entity_id}'}
+        else:
+            entity_check = {'valid': True, 'message': f'Entity: {entity["name"]}, Subentity: {subentity["name"]}'}
+        
+        validation = validate_invoice_for_push(doc, entity_check)
+        return None if validation['valid'] else validation['message']
+    
+    def match_keys(self, doc):
+        return [('invoice_number', doc.get('portal_invoice_number') or doc.get('title'))]
+    
+    def transform(self, doc):
+        return transform_invoice_to_portal_format(doc)
+    
+    def mark_synced(self, doc, portal_id, operation):
+        update_invoice_sync_status(doc, portal_id, operation, commit=False)
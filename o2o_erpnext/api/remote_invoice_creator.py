@@ -3,87 +3,33 @@ import json
 from datetime import datetime
 from frappe import _
 from o2o_erpnext.config.external_db_updated import get_external_db_connection
+from o2o_erpnext.api.invoice_number_allocator import allocate_invoice_number
+from o2o_erpnext.sync.portal_push import PortalPushPipeline
 
 class RemoteInvoiceCreator:
     """Handles creation of invoices in ProcureUAT database"""
     
-    def get_next_invoice_code(self, prefix='AGO2O', financial_year='25-26'):
+    def get_next_invoice_code(self, prefix='AGO2O', financial_year='25-26', fast_fail=False):
         """
-        Generate next invoice code atomically using existing ProcureUAT structure
+        Generate next invoice code from the portal invoice_counter
+        
+        Numbers come from a block leased by this worker (see
+        api/invoice_number_allocator.py), so most calls need no portal round trip.
         
         Args:
             prefix (str): Invoice prefix (default: 'AGO2O')
             financial_year (str): Financial year (default: '25-26')
+            fast_fail (bool): Honour the portal circuit breaker (naming inside a user request)
         
         Returns:
             str: Next invoice code (e.g., 'AGO2O/25-26/0046')
         """
         try:
-            with get_external_db_connection() as conn:
-                # IMPORTANT: Set autocommit=True to ensure counter changes are immediately committed
-                conn.autocommit(True)
-                
-                with conn.cursor() as cursor:
-                    # Use invoice_counter table (single counter system)
-                    # Check if counter table exists, create if not
-                    cursor.execute("""
-                        CREATE TABLE IF NOT EXISTS invoice_counter (
-                            id INT PRIMARY KEY AUTO_INCREMENT,
-                            prefix VARCHAR(20) NOT NULL DEFAULT 'AGO2O',
-                            financial_year VARCHAR(10) NOT NULL,
-                            last_number INT NOT NULL DEFAULT 0,
-                            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
-                            UNIQUE KEY unique_prefix_year (prefix, financial_year)
-                        )
-                    """)
-                    
-                    # Initialize counter if not exists
-                    cursor.execute("""
-                        INSERT IGNORE INTO invoice_counter (prefix, financial_year, last_number)
-                        SELECT %s, %s, COALESCE(MAX(CAST(SUBSTRING_INDEX(invoice_number, '/', -1) AS UNSIGNED)), 0)
-                        FROM purchase_requisitions 
-                        WHERE invoice_number LIKE %s
-                    """, (prefix, financial_year, f"{prefix}/{financial_year}/%"))
-                    
-                    # Atomic increment using MySQL session variable  
-                    print(f"🔥 DEBUG: About to increment invoice_counter for {prefix}/{financial_year}")
-                    cursor.execute("""
-                        UPDATE invoice_counter 
-                        SET last_number = (@cur_value := last_number + 1) 
-                        WHERE prefix = %s AND financial_year = %s
-                    """, (prefix, financial_year))
-                    print(f"🔥 DEBUG: Counter increment executed, affected rows: {cursor.rowcount}")
-                    
-                    if cursor.rowcount == 0:
-                        # Initialize if somehow missed
-                        cursor.execute("""
-                            INSERT INTO invoice_counter (prefix, financial_year, last_number)
-                            VALUES (%s, %s, 1)
-                        """, (prefix, financial_year))
-                        next_number = 1
-                    else:
-                        # Get the incremented value from session variable
-                        cursor.execute("SELECT @cur_value as invoice_num")
-                        result = cursor.fetchone()
-                        
-                        if not result or not result['invoice_num']:
-                            raise Exception("Failed to generate invoice number")
-                        
-                        next_number = int(result['invoice_num'])
-                    
-                    invoice_code = f"{prefix}/{financial_year}/{next_number:04d}"
-                    
-                    frappe.logger().info(f"Generated invoice code: {invoice_code}")
-                    print(f"🔥 DEBUG: Generated final invoice code: {invoice_code}")
-                    print(f"🔥 DEBUG: Counter should now be permanently at: {next_number}")
-                    
-                    # Verify the counter was actually updated
-                    cursor.execute("SELECT last_number FROM invoice_counter WHERE prefix = %s AND financial_year = %s", (prefix, financial_year))
-                    verify_result = cursor.fetchone()
-                    print(f"🔥 DEBUG: Verification - invoice_counter is now at: {verify_result['last_number'] if verify_result else 'NOT FOUND'}")
-                    
-                    return invoice_code
+            next_number = allocate_invoice_number(prefix, financial_year, fast_fail=fast_fail)
+            invoice_code = f"{prefix}/{financial_year}/{next_number:04d}"
+            
+            frappe.logger().info(f"Generated invoice code: {invoice_code}")
+            return invoice_code
                     
         except Exception as e:
             frappe.logger().error(f"Error generating invoice code: {str(e)}")
@@ -185,12 +131,13 @@ class RemoteInvoiceCreator:
         except Exception:
             return 18  # Default fallback
     
-    def create_remote_invoice(self, purchase_invoice):
+    def create_remote_invoice(self, purchase_invoice, fast_fail=False):
         """
         Create invoice in ProcureUAT database
         
         Args:
             purchase_invoice: ERPNext Purchase Invoice document
+            fast_fail (bool): Honour the portal circuit breaker (called on submit)
         
         Returns:
             tuple: (success: bool, remote_invoice_code: str, message: str)
@@ -204,7 +151,7 @@ class RemoteInvoiceCreator:
             mapped_data, remote_invoice_code = self.map_erpnext_to_procure_data(purchase_invoice)
             
             # Insert into remote database
-            with get_external_db_connection() as conn:
+            with get_external_db_connection(fast_fail=fast_fail) as conn:
                 with conn.cursor() as cursor:
                     # Build insert query
                     columns = list(mapped_data.keys())
@@ -262,18 +209,19 @@ class RemoteInvoiceCreator:
             frappe.logger().error(f"Failed to update sync status: {str(e)}")
 
 # Utility functions for API endpoints
-def create_remote_invoice(purchase_invoice):
+def create_remote_invoice(purchase_invoice, fast_fail=False):
     """
     Main function to create remote invoice
     
     Args:
         purchase_invoice: ERPNext Purchase Invoice document
+        fast_fail (bool): Honour the portal circuit breaker (called on submit)
     
     Returns:
         tuple: (success: bool, invoice_code: str, message: str)
     """
     creator = RemoteInvoiceCreator()
-    return creator.create_remote_invoice(purchase_invoice)
+    return creator.create_remote_invoice(purchase_invoice, fast_fail=fast_fail)
 
 @frappe.whitelist()
 def sync_purchase_invoice_to_remote(purchase_invoice_name):
@@ -345,18 +293,8 @@ def batch_sync_invoices(invoice_names):
         if isinstance(invoice_names, str):
             invoice_names = json.loads(invoice_names)
         
-        results = []
-        success_count = 0
-        
-        for invoice_name in invoice_names:
-            result = sync_purchase_invoice_to_remote(invoice_name)
-            results.append({
-                'invoice_name': invoice_name,
-                **result
-            })
-            
-            if result['success']:
-                success_count += 1
+        results = RemoteInvoicePushPipeline().run(invoice_names)
+        success_count = sum(1 for result in results if result['success'])
         
         return {
             'success': True,
@@ -374,6 +312,57 @@ def batch_sync_invoices(invoice_names):
             'message': str(e)
         }
 
+class RemoteInvoicePushPipeline(PortalPushPipeline):
+    """
+    Batched sync_purchase_invoice_to_remote. A portal row whose order_code is
+    already the invoice name means an earlier push went through, so the
+    invoice is marked Synced instead of being inserted twice.
+    """
+    
+    key_column = 'order_code'
+    
+    def __init__(self, chunk_size=None):
+        super().__init__(chunk_size=chunk_size)
+        self.creator = RemoteInvoiceCreator()
+    
+    def skip(self, doc):
+        if not frappe.has_permission("Purchase Invoice", "write", doc.name):
+            return self.result(doc.name, False, None, 'Insufficient permissions to sync this invoice')
+        if doc.docstatus != 1:
+            return self.result(doc.name, False, None, 'Only submitted invoices can be synced to portal')
+        if doc.get('custom_portal_sync_id'):
+            return self.result(doc.name, True, doc.custom_portal_sync_id, "Already synced")
+        return None
+    
+    def transform(self, doc):
+        return self.creator.map_erpnext_to_procure_data(doc)[0]
+    
+    def mark_synced(self, doc, portal_id, operation):
+        frappe.db.set_value("Purchase Invoice", doc.name, {
+            'custom_portal_sync_id': doc.name,
+            'custom_sync_status': "Synced"
+        })
+    
+    def pushed_result(self, doc, portal_id, operation):
+        return self.result(doc.name, True, doc.name, f"Created with remote ID: {portal_id}")
+    
+    def duplicate_result(self, doc, match):
+        self.mark_synced(doc, match['portal_id'], 'created')
+        return self.result(doc.name, True, doc.name, f"Already in portal with remote ID: {match['portal_id']}")
+    
+    def failed_result(self, invoice_name, message):
+        frappe.db.set_value("Purchase Invoice", invoice_name, 'custom_sync_status', "Failed")
+        return self.result(invoice_name, False, None, f"Failed to create remote invoice: {message}")
+    
+    @staticmethod
+    def result(invoice_name, success, remote_invoice_code, message):
+        return {
+            'invoice_name': invoice_name,
+            'success': success,
+            'remote_invoice_code': remote_invoice_code,
+            'message': message
+        }
+
 @frappe.whitelist()
 def get_invoice_sync_status(purchase_invoice_name):
     """
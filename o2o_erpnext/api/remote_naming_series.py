@@ -3,7 +3,7 @@
 import frappe
 from frappe import _
 from frappe.model.naming import make_autoname
-from o2o_erpnext.config.external_db_updated import get_external_db_connection
+from o2o_erpnext.api.invoice_number_allocator import allocate_invoice_number
 
 def get_next_invoice_number_from_remote(prefix='AGO2O', financial_year='25-26'):
     """
@@ -18,58 +18,12 @@ def get_next_invoice_number_from_remote(prefix='AGO2O', financial_year='25-26'):
         str: Next invoice number (e.g., 'AGO2O/25-26/012')
     """
     try:
-        with get_external_db_connection() as conn:
-            with conn.cursor() as cursor:
-                # Use invoice_counter table (single counter system)
-                # Check if counter table exists, create if not
-                cursor.execute("""
-                    CREATE TABLE IF NOT EXISTS invoice_counter (
-                        id INT PRIMARY KEY AUTO_INCREMENT,
-                        prefix VARCHAR(20) NOT NULL DEFAULT 'AGO2O',
-                        financial_year VARCHAR(10) NOT NULL,
-                        last_number INT NOT NULL DEFAULT 0,
-                        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                        updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
-                        UNIQUE KEY unique_prefix_year (prefix, financial_year)
-                    )
-                """)
-                
-                # Initialize counter if not exists
-                cursor.execute("""
-                    INSERT IGNORE INTO invoice_counter (prefix, financial_year, last_number)
-                    SELECT %s, %s, COALESCE(MAX(CAST(SUBSTRING_INDEX(invoice_number, '/', -1) AS UNSIGNED)), 0)
-                    FROM purchase_requisitions 
-                    WHERE invoice_number LIKE %s
-                """, (prefix, financial_year, f"{prefix}/{financial_year}/%"))
-                
-                # Atomic increment using MySQL session variable
-                cursor.execute("""
-                    UPDATE invoice_counter 
-                    SET last_number = (@cur_value := last_number) + 1 
-                    WHERE prefix = %s AND financial_year = %s
-                """, (prefix, financial_year))
-                
-                if cursor.rowcount == 0:
-                    # Initialize if somehow missed
-                    cursor.execute("""
-                        INSERT INTO invoice_counter (prefix, financial_year, last_number)
-                        VALUES (%s, %s, 1)
-                    """, (prefix, financial_year))
-                    next_number = 1
-                else:
-                    # Get the incremented value
-                    cursor.execute("SELECT @cur_value as invoice_num")
-                    result = cursor.fetchone()
-                    
-                    if not result or not result['invoice_num']:
-                        raise Exception("Failed to generate invoice number")
-                    
-                    next_number = int(result['invoice_num'])
-                
-                invoice_number = f"{prefix}/{financial_year}/{next_number:03d}"
-                
-                frappe.logger().info(f"Generated invoice number from remote counter: {invoice_number}")
-                return invoice_number
+        # Served from a block leased by this worker (see api/invoice_number_allocator.py)
+        next_number = allocate_invoice_number(prefix, financial_year)
+        invoice_number = f"{prefix}/{financial_year}/{next_number:03d}"
+        
+        frappe.logger().info(f"Generated invoice number from remote counter: {invoice_number}")
+        return invoice_number
                 
     except Exception as e:
         frappe.logger().error(f"Error generating invoice number from remote: {str(e)}")
@@ -0,0 +1,94 @@
+# Copyright (c) 2026, Ascratech LLP and Contributors
+# See license.txt
+
+import frappe
+from frappe.tests.utils import FrappeTestCase
+
+from o2o_erpnext.api.invoice_reconciliation import InvoiceReconciler, _bucket_levels
+
+PREFIX = "RECTEST/25-26/"
+
+
+class SiteDBCursor:
+	"""Portal cursor stand-in running the portal queries on the site database"""
+
+	def execute(self, query, params=None):
+		self.rows = frappe.db.sql(query, params, as_dict=True)
+
+	def fetchall(self):
+		return self.rows
+
+
+class TestInvoiceReconciliation(FrappeTestCase):
+	def setUp(self):
+		# Portal tables as temporary tables, so the portal SQL runs unchanged
+		frappe.db.sql("""
+			CREATE TEMPORARY TABLE purchase_requisitions (
+				id INT PRIMARY KEY,
+				invoice_number VARCHAR(140),
+				is_delete INT NOT NULL DEFAULT 0,
+				requisition_at DATETIME NULL,
+				created_at DATETIME NULL
+			)
+		""")
+		frappe.db.sql("""
+			CREATE TEMPORARY TABLE purchase_order_items (
+				purchase_order_id INT,
+				total_amt DECIMAL(18, 2)
+			)
+		""")
+
+	def tearDown(self):
+		# Roll back the seeded rows first: DDL after writes would commit them
+		frappe.db.rollback()
+		frappe.db.sql("DROP TEMPORARY TABLE IF EXISTS purchase_requisitions")
+		frappe.db.sql("DROP TEMPORARY TABLE IF EXISTS purchase_order_items")
+
+	def seed_portal(self, serial, day, created_at=None):
+		frappe.db.sql(
+			"INSERT INTO purchase_requisitions (id, invoice_number, requisition_at, created_at) VALUES (%s, %s, %s, %s)",
+			(serial, f"{PREFIX}{serial:04d}", day, created_at or day),
+		)
+
+	def seed_erpnext(self, serial, posting_date, grand_total=0):
+		frappe.db.sql(
+			"""INSERT INTO `tabPurchase Invoice` (name, title, docstatus, posting_date, grand_total)
+			VALUES (%s, %s, 1, %s, %s)""",
+			(f"RECTEST-PINV-{serial}", f"{PREFIX}{serial:04d}", posting_date, grand_total),
+		)
+
+	def reconcile(self, bucket_by="series"):
+		return InvoiceReconciler(SiteDBCursor(), PREFIX, _bucket_levels(bucket_by), 0).run()
+
+	def test_matching_sides_need_no_rows(self):
+		for serial in (1, 2, 3, 150):
+			self.seed_portal(serial, "2025-05-02")
+			self.seed_erpnext(serial, "2025-05-02")
+
+		for bucket_by in ("series", "day"):
+			result = self.reconcile(bucket_by)
+			self.assertTrue(result["in_sync"], bucket_by)
+			self.assertEqual(result["summary"]["rows_compared"], 0)
+
+	def test_missing_invoice_drills_into_its_block_only(self):
+		for serial in (1, 2, 3):
+			self.seed_portal(serial, "2025-05-02")
+			self.seed_erpnext(serial, "2025-05-02")
+		self.seed_portal(150, "2025-05-03")
+
+		result = self.reconcile()
+
+		self.assertFalse(result["in_sync"])
+		self.assertEqual([row["invoice_number"] for row in result["missing_in_erpnext"]], [f"{PREFIX}0150"])
+		self.assertEqual(result["extra_in_erpnext"], [])
+		# Only block 100-199 is fetched row by row
+		self.assertEqual(result["summary"]["rows_compared"], 1)
+
+	def test_day_buckets_use_requisition_date_and_posting_date(self):
+		# Pushed invoice: created on the portal later than its posting date
+		self.seed_portal(7, "2025-05-02", created_at="2025-05-20 10:00:00")
+		self.seed_erpnext(7, "2025-05-02")
+
+		result = self.reconcile("day")
+
+		self.assertTrue(result["in_sync"])
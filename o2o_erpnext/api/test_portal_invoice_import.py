@@ -0,0 +1,52 @@
+# Copyright (c) 2026, Ascratech LLP and Contributors
+# See license.txt
+
+import frappe
+from frappe.tests.utils import FrappeTestCase
+from frappe.utils import add_days, getdate, today
+
+from o2o_erpnext.api.php_portal_invoices import create_purchase_invoice_from_portal
+
+SUPPLIER = "_Test Portal Import Supplier"
+CUSTOMER = "_Test Portal Import Customer"
+
+
+class TestPortalInvoiceImport(FrappeTestCase):
+	def setUp(self):
+		if not frappe.db.exists("Supplier", SUPPLIER):
+			frappe.get_doc(
+				{"doctype": "Supplier", "supplier_name": SUPPLIER, "supplier_group": "All Supplier Groups"}
+			).insert(ignore_permissions=True)
+		if not frappe.db.exists("Customer", CUSTOMER):
+			frappe.get_doc(
+				{
+					"doctype": "Customer",
+					"customer_name": CUSTOMER,
+					"customer_group": "All Customer Groups",
+					"territory": "All Territories",
+				}
+			).insert(ignore_permissions=True)
+
+	def tearDown(self):
+		frappe.db.rollback()
+
+	def test_import_keeps_requisition_date_as_posting_date(self):
+		requisition_date = add_days(today(), -3)
+
+		result = create_purchase_invoice_from_portal(
+			{
+				"invoice_number": "PDTEST/25-26/0001",
+				"customer_name": CUSTOMER,
+				"vendor_names": SUPPLIER,
+				"amount": 100,
+				"total_amount": 100,
+				"total_items": 1,
+				"posting_date": requisition_date,
+			}
+		)
+
+		self.assertTrue(result["success"], result)
+		self.assertEqual(
+			frappe.db.get_value("Purchase Invoice", result["invoice_name"], "posting_date"),
+			getdate(requisition_date),
+		)
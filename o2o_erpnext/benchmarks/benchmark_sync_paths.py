@@ -0,0 +1,126 @@
+"""
+Benchmarks for the portal sync paths against the synthetic ProcureUAT stand-in
+
+Needs pytest-benchmark (installed with the app's dev-dependencies) and a
+scratch site - the import and sync benchmarks create Purchase Invoices.
+
+Run from frappe-bench/sites:
+    O2O_BENCH_SITE=<site> pytest ../apps/o2o_erpnext/o2o_erpnext/benchmarks/benchmark_sync_paths.py
+
+Environment:
+    O2O_BENCH_SITE     Site to run against (required)
+    O2O_BENCH_SCALES   Comma separated requisition counts, default 1000,10000,100000
+    O2O_BENCH_ROUNDS   Rounds for the read-only benchmarks, default 5
+    O2O_BENCH_BACKFILL Invoices imported by the bulk import benchmark, default 1000
+
+The file is deliberately not named test_*.py so that bench run-tests does not
+pick it up.
+"""
+
+import os
+
+import pytest
+
+import frappe
+
+from o2o_erpnext.benchmarks.portal_standin import (
+    build_standin,
+    get_standin_settings,
+    use_standin_connection
+)
+
+SCALES = [int(scale) for scale in os.environ.get('O2O_BENCH_SCALES', '1000,10000,100000').split(',') if scale.strip()]
+ROUNDS = int(os.environ.get('O2O_BENCH_ROUNDS', 5))
+
+# Write paths touch at most this many invoices per run so that the larger
+# scales measure query cost rather than document creation
+WRITE_BATCH = 50
+
+# Invoices imported by the bulk backfill benchmark; compare its time per
+# invoice with test_batch_import_invoices
+BACKFILL_BATCH = int(os.environ.get('O2O_BENCH_BACKFILL', 1000))
+
+
+@pytest.fixture(scope='session')
+def site():
+    site = os.environ.get('O2O_BENCH_SITE')
+    if not site:
+        pytest.skip('O2O_BENCH_SITE is not set')
+
+    frappe.init(site=site, sites_path=os.environ.get('O2O_BENCH_SITES_PATH', '.'))
+    frappe.connect()
+    frappe.set_user('Administrator')
+    yield site
+    frappe.destroy()
+
+
+@pytest.fixture(scope='session', params=SCALES, ids=lambda scale: f"{scale // 1000}k")
+def standin(request, site):
+    settings = get_standin_settings()
+    build_standin(requisitions=request.param, settings=settings)
+    with use_standin_connection(settings):
+        yield request.param
+
+
+def _assert_success(result):
+    assert result.get('success'), result.get('message')
+
+
+def test_get_recent_portal_invoices(benchmark, standin):
+    from o2o_erpnext.api.php_portal_invoices import get_recent_portal_invoices
+
+    result = benchmark.pedantic(get_recent_portal_invoices, kwargs={'limit': 500}, rounds=ROUNDS)
+    _assert_success(result)
+
+
+def test_batch_import_invoices(benchmark, standin):
+    from o2o_erpnext.api.php_portal_invoices import batch_import_invoices
+
+    result = benchmark.pedantic(
+        batch_import_invoices,
+        kwargs={'batch_size': WRITE_BATCH, 'total_limit': WRITE_BATCH, 'skip_duplicates': 1},
+        rounds=1,
+        iterations=1
+    )
+    _assert_success(result)
+
+
+def test_batch_import_invoices_bulk(benchmark, standin):
+    from o2o_erpnext.api.php_portal_invoices import batch_import_invoices
+
+    result = benchmark.pedantic(
+        batch_import_invoices,
+        kwargs={'total_limit': BACKFILL_BATCH, 'skip_duplicates': 1, 'bulk': 1},
+        rounds=1,
+        iterations=1
+    )
+    _assert_success(result)
+
+
+def test_sync_orders_from_procureuat(benchmark, standin):
+    from o2o_erpnext.sync.external_to_erpnext_updated import sync_orders_from_procureuat
+
+    result = benchmark.pedantic(sync_orders_from_procureuat, kwargs={'limit': WRITE_BATCH}, rounds=1, iterations=1)
+    assert 'total' in result, result.get('message')
+
+
+def test_push_multiple_invoices(benchmark, standin):
+    from o2o_erpnext.api.push_invoice_to_portal import push_multiple_invoices
+
+    invoice_names = frappe.get_all(
+        'Purchase Invoice',
+        filters={'docstatus': 1},
+        order_by='creation desc',
+        limit=WRITE_BATCH,
+        pluck='name'
+    )
+    if not invoice_names:
+        pytest.skip('No submitted Purchase Invoices to push')
+
+    result = benchmark.pedantic(
+        push_multiple_invoices,
+        kwargs={'invoice_names': invoice_names, 'force_update': True},
+        rounds=1,
+        iterations=1
+    )
+    _assert_success(result)
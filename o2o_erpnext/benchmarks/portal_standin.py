@@ -0,0 +1,419 @@
+"""
+ProcureUAT Stand-in Module
+Builds a synthetic copy of the portal database from the definitive schemas in
+field_mappings_sql_based, so that sync paths can be benchmarked at realistic
+scale without touching the real portal
+
+The stand-in lives in its own MariaDB/MySQL schema (the portal queries use
+FIND_IN_SET, GROUP_CONCAT and friends, so SQLite is not an option).
+
+Usage:
+    bench --site <site> execute o2o_erpnext.benchmarks.portal_standin.build_standin --kwargs "{'requisitions': 10000}"
+"""
+
+import frappe
+import pymysql
+import random
+
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+
+from o2o_erpnext.config.field_mappings_sql_based import (
+    PURCHASE_REQUISITIONS_SCHEMA,
+    PURCHASE_ORDER_ITEMS_SCHEMA,
+    VENDORS_SCHEMA
+)
+
+# Lookup tables joined by the portal queries but not covered by the SQL dump analysis
+ENTITYS_SCHEMA = {
+    'id': 'int(11) AUTO_INCREMENT PRIMARY KEY',
+    'name': 'varchar(255) NOT NULL',
+    'code': 'varchar(150) NOT NULL',
+    'address': 'text NOT NULL',
+    'created_at': 'datetime',
+}
+
+SUBENTITYS_SCHEMA = {
+    'id': 'int(11) AUTO_INCREMENT PRIMARY KEY',
+    'entity_id': 'int(11) NOT NULL',
+    'name': 'varchar(255) NOT NULL',
+    'created_at': 'datetime',
+}
+
+STANDIN_TABLES = {
+    'entitys': ENTITYS_SCHEMA,
+    'subentitys': SUBENTITYS_SCHEMA,
+    'vendors': VENDORS_SCHEMA,
+    'purchase_requisitions': PURCHASE_REQUISITIONS_SCHEMA,
+    'purchase_order_items': PURCHASE_ORDER_ITEMS_SCHEMA,
+}
+
+STANDIN_META_TABLE = '_o2o_standin_meta'
+
+# Stand-in defaults - override with a "portal_standin" dict in site_config.json
+DEFAULT_STANDIN_SETTINGS = {
+    'host': 'localhost',
+    'port': 3306,
+    'user': 'root',
+    'password': None,
+    'database': 'o2o_portal_standin',
+}
+
+STANDIN_CONNECTION_NAME = 'Portal Benchmark Stand-in'
+
+
+def get_standin_settings():
+    """
+    Get stand-in server settings from site config, falling back to the site's
+    own database server
+
+    Returns:
+        dict: host, port, user, password, database
+    """
+    conf = frappe.conf or {}
+    settings = dict(DEFAULT_STANDIN_SETTINGS)
+    settings['host'] = conf.get('db_host') or settings['host']
+    settings['port'] = int(conf.get('db_port') or settings['port'])
+    settings['password'] = conf.get('root_password')
+    settings.update(conf.get('portal_standin') or {})
+    return settings
+
+
+def _connect(settings, database=None):
+    return pymysql.connect(
+        host=settings['host'],
+        port=int(settings['port']),
+        user=settings['user'],
+        password=settings['password'] or '',
+        database=database,
+        charset='utf8mb4',
+        autocommit=False
+    )
+
+
+def get_table_ddl(table, schema):
+    """
+    Build CREATE TABLE from a schema dict
+
+    Args:
+        table (str): Table name
+        schema (dict): Column name -> column definition
+
+    Returns:
+        str: DDL statement
+    """
+    columns = ',\n    '.join(f"`{column}` {definition}" for column, definition in schema.items())
+    return f"CREATE TABLE `{table}` (\n    {columns}\n) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4"
+
+
+def _filler_value(definition):
+    """Value for columns the generator has no specific rule for"""
+    definition = definition.lower()
+    if 'not null' not in definition:
+        return None
+    if definition.startswith(('int', 'bigint', 'tinyint', 'float')):
+        return 0
+    if definition.startswith('datetime'):
+        return datetime(2025, 1, 1)
+    return ''
+
+
+class StandinGenerator:
+    """Deterministic row generator for the stand-in tables"""
+
+    def __init__(self, requisitions, vendors=50, entities=20, subentities_per_entity=3,
+                 max_items=5, seed=42):
+        self.requisitions = requisitions
+        self.vendors = vendors
+        self.entities = entities
+        self.subentities_per_entity = subentities_per_entity
+        self.max_items = max_items
+        self.rng = random.Random(seed)
+        self.start = datetime(2024, 4, 1)
+        self.span_seconds = int((datetime(2026, 3, 31) - self.start).total_seconds())
+
+    def _row(self, schema, values):
+        return tuple(
+            values[column] if column in values else _filler_value(definition)
+            for column, definition in schema.items()
+            if column != 'id' or 'id' in values
+        )
+
+    def columns(self, schema, with_id=True):
+        return [column for column in schema if column != 'id' or with_id]
+
+    def entity_rows(self):
+        for entity_id in range(1, self.entities + 1):
+            yield self._row(ENTITYS_SCHEMA, {
+                'id': entity_id,
+                'name': f"Standin Entity {entity_id}",
+                'code': f"ENT{entity_id:03d}",
+                'address': f"{entity_id} Benchmark Road",
+                'created_at': self.start,
+            })
+
+    def subentity_rows(self):
+        subentity_id = 0
+        for entity_id in range(1, self.entities + 1):
+            for _ in range(self.subentities_per_entity):
+                subentity_id += 1
+                yield self._row(SUBENTITYS_SCHEMA, {
+                    'id': subentity_id,
+                    'entity_id': entity_id,
+                    'name': f"Standin Branch {subentity_id}",
+                    'created_at': self.start,
+                })
+
+    def vendor_rows(self):
+        for vendor_id in range(1, self.vendors + 1):
+            yield self._row(VENDORS_SCHEMA, {
+                'id': vendor_id,
+                'name': f"Standin Vendor {vendor_id}",
+                'code': f"VEN{vendor_id:04d}",
+                'email': f"vendor{vendor_id}@standin.invalid",
+                'gstn': f"27AAAAA{vendor_id:04d}A1Z5",
+                'contact_number': 9000000000 + vendor_id,
+                'status': 'active',
+                'last_sign_in_at': self.start,
+                'created_at': self.start,
+                'updated_at': self.start,
+            })
+
+    def requisition_and_item_rows(self):
+        """
+        Yield (requisition row, item rows) pairs
+
+        Invoice numbers follow the real AGO2O/<FY>/<series> layout, about 2% of
+        rows are soft-deleted and a few share an invoice number, matching the
+        duplicates seen in the portal dump.
+        """
+        rng = self.rng
+        item_id = 0
+        for requisition_id in range(1, self.requisitions + 1):
+            created_at = self.start + timedelta(seconds=rng.randrange(self.span_seconds))
+            fy_start = created_at.year if created_at.month >= 4 else created_at.year - 1
+            series = requisition_id
+            if requisition_id > 10 and rng.random() < 0.005:
+                series = requisition_id - rng.randrange(1, 10)
+
+            entity_id = rng.randint(1, self.entities)
+            first_subentity = (entity_id - 1) * self.subentities_per_entity + 1
+            vendor_id = rng.randint(1, self.vendors)
+
+            requisition = self._row(PURCHASE_REQUISITIONS_SCHEMA, {
+                'id': requisition_id,
+                'entity': str(entity_id),
+                'subentity_id': str(first_subentity + rng.randrange(self.subentities_per_entity)),
+                'order_name': f"Standin Order {requisition_id}",
+                'order_code': f"ORD{requisition_id:08d}",
+                'address': f"{entity_id} Benchmark Road",
+                'remark': '',
+                'order_status': rng.choice((1, 2, 2, 2, 3)),
+                'is_delete': 1 if rng.random() < 0.02 else 0,
+                'status': rng.choice(('pending', 'approved', 'approved', 'completed')),
+                'requisition_at': created_at,
+                'invoice_series': series,
+                'invoice_number': f"AGO2O/{str(fy_start)[2:]}-{str(fy_start + 1)[2:]}/{series:04d}",
+                'invoice_generated': 1,
+                'invoice_generated_at': created_at,
+                'is_visible_header': 1,
+                'created_at': created_at,
+                'vendor_created': vendor_id,
+                'updated_at': created_at + timedelta(hours=rng.randrange(0, 72)),
+                'gst_percentage': '18',
+            })
+
+            items = []
+            for _ in range(rng.randint(1, self.max_items)):
+                item_id += 1
+                quantity = rng.randint(1, 50)
+                rate = round(rng.uniform(10, 5000), 2)
+                cost = round(quantity * rate, 2)
+                gst = round(cost * 0.18, 2)
+                items.append(self._row(PURCHASE_ORDER_ITEMS_SCHEMA, {
+                    'id': item_id,
+                    'purchase_order_id': requisition_id,
+                    'category_id': rng.randint(1, 20),
+                    'subcategory_id': rng.randint(1, 100),
+                    'product_id': rng.randint(1, 2000),
+                    'vendor_id': vendor_id,
+                    'quantity': quantity,
+                    'unit_rate': str(rate),
+                    'uom': 'Nos',
+                    'gst_id': 18,
+                    'total_amt': cost + gst,
+                    'gst_amt': gst,
+                    'cost': cost,
+                    'status': 'active',
+                    'created_at': created_at,
+                    'updated_at': created_at,
+                }))
+
+            yield requisition, items
+
+
+def _insert_rows(cursor, table, columns, rows):
+    placeholders = ', '.join(['%s'] * len(columns))
+    column_list = ', '.join(f"`{column}`" for column in columns)
+    cursor.executemany(f"INSERT INTO `{table}` ({column_list}) VALUES ({placeholders})", rows)
+
+
+def get_standin_scale(settings=None):
+    """
+    Get the number of requisitions the stand-in was last built with
+
+    Returns:
+        int: Requisition count, or 0 when the stand-in does not exist
+    """
+    settings = settings or get_standin_settings()
+    try:
+        conn = _connect(settings, settings['database'])
+    except pymysql.err.OperationalError:
+        return 0
+
+    try:
+        with conn.cursor() as cursor:
+            cursor.execute(f"SELECT requisitions FROM `{STANDIN_META_TABLE}` LIMIT 1")
+            row = cursor.fetchone()
+            return row[0] if row else 0
+    except pymysql.err.ProgrammingError:
+        return 0
+    finally:
+        conn.close()
+
+
+def build_standin(requisitions=1000, vendors=50, entities=20, seed=42, chunk_size=2000, force=False, settings=None):
+    """
+    (Re)create the stand-in schema and fill it with synthetic data
+
+    Rebuilding is skipped when the stand-in already holds the requested scale.
+
+    Args:
+        requisitions (int): Number of purchase_requisitions rows
+        vendors (int): Number of vendors rows
+        entities (int): Number of entitys rows
+        seed (int): Random seed, same seed gives the same data
+        chunk_size (int): Rows per executemany batch
+        force (bool): Rebuild even when the scale already matches
+        settings (dict): Stand-in server settings, defaults to get_standin_settings()
+
+    Returns:
+        dict: Build summary
+    """
+    requisitions = int(requisitions)
+    chunk_size = int(chunk_size)
+    settings = settings or get_standin_settings()
+
+    if not force and get_standin_scale(settings) == requisitions:
+        return {'success': True, 'message': f'Stand-in already holds {requisitions} requisitions', 'rebuilt': False}
+
+    database = settings['database']
+    started = datetime.now()
+
+    conn = _connect(settings)
+    try:
+        with conn.cursor() as cursor:
+            cursor.execute(f"DROP DATABASE IF EXISTS `{database}`")
+            cursor.execute(f"CREATE DATABASE `{database}` CHARACTER SET utf8mb4 COLLATE utf8mb4_unicode_ci")
+            cursor.execute(f"USE `{database}`")
+
+            for table, schema in STANDIN_TABLES.items():
+                cursor.execute(get_table_ddl(table, schema))
+            cursor.execute(f"CREATE TABLE `{STANDIN_META_TABLE}` (requisitions int NOT NULL, seed int NOT NULL, built_at datetime NOT NULL)")
+
+            generator = StandinGenerator(int(requisitions), vendors=int(vendors), entities=int(entities), seed=int(seed))
+            _insert_rows(cursor, 'entitys', generator.columns(ENTITYS_SCHEMA), list(generator.entity_rows()))
+            _insert_rows(cursor, 'subentitys', generator.columns(SUBENTITYS_SCHEMA), list(generator.subentity_rows()))
+            _insert_rows(cursor, 'vendors', generator.columns(VENDORS_SCHEMA), list(generator.vendor_rows()))
+
+            requisition_columns = generator.columns(PURCHASE_REQUISITIONS_SCHEMA)
+            item_columns = generator.columns(PURCHASE_ORDER_ITEMS_SCHEMA)
+            requisition_batch, item_batch = [], []
+            item_count = 0
+
+            for requisition, items in generator.requisition_and_item_rows():
+                requisition_batch.append(requisition)
+                item_batch.extend(items)
+                item_count += len(items)
+
+                if len(requisition_batch) >= chunk_size:
+                    _insert_rows(cursor, 'purchase_requisitions', requisition_columns, requisition_batch)
+                    _insert_rows(cursor, 'purchase_order_items', item_columns, item_batch)
+                    conn.commit()
+                    requisition_batch, item_batch = [], []
+
+            if requisition_batch:
+                _insert_rows(cursor, 'purchase_requisitions', requisition_columns, requisition_batch)
+                _insert_rows(cursor, 'purchase_order_items', item_columns, item_batch)
+
+            cursor.execute(f"INSERT INTO `{STANDIN_META_TABLE}` VALUES (%s, %s, NOW())", (requisitions, int(seed)))
+            conn.commit()
+
+    finally:
+        conn.close()
+
+    elapsed = (datetime.now() - started).total_seconds()
+    message = f"Built stand-in {database}: {requisitions} requisitions, {item_count} items in {elapsed:.1f}s"
+    frappe.logger().info(message)
+
+    return {
+        'success': True,
+        'message': message,
+        'rebuilt': True,
+        'requisitions': requisitions,
+        'items': item_count,
+        'elapsed_seconds': elapsed
+    }
+
+
+@contextmanager
+def use_standin_connection(settings=None):
+    """
+    Temporarily make the stand-in the active Database Connection
+
+    Every other connection is deactivated for the duration and restored on exit,
+    so all portal code paths resolve to the stand-in through the normal lookup.
+
+    Args:
+        settings (dict): Stand-in server settings, defaults to get_standin_settings()
+    """
+    from o2o_erpnext.config.external_db_updated import clear_active_connection_cache
+
+    settings = settings or get_standin_settings()
+    previously_active = frappe.get_all('Database Connection', filters={'is_active': 1}, pluck='name')
+
+    if frappe.db.exists('Database Connection', STANDIN_CONNECTION_NAME):
+        doc = frappe.get_doc('Database Connection', STANDIN_CONNECTION_NAME)
+    else:
+        doc = frappe.new_doc('Database Connection')
+        doc.connection_name = STANDIN_CONNECTION_NAME
+
+    doc.update({
+        'display_name': STANDIN_CONNECTION_NAME,
+        'database_type': 'MySQL',
+        'environment': 'Testing',
+        'host': settings['host'],
+        'port': int(settings['port']),
+        'database_name': settings['database'],
+        'username': settings['user'],
+        'password': settings['password'] or '',
+        'ssh_tunnel': 0,
+        'use_read_replica': 0,
+        'is_active': 1
+    })
+
+    for name in previously_active:
+        if name != STANDIN_CONNECTION_NAME:
+            frappe.db.set_value('Database Connection', name, 'is_active', 0)
+    doc.save(ignore_permissions=True)
+    frappe.db.commit()
+    clear_active_connection_cache()
+
+    try:
+        yield doc
+    finally:
+        frappe.db.set_value('Database Connection', STANDIN_CONNECTION_NAME, 'is_active', 0)
+        for name in previously_active:
+            frappe.db.set_value('Database Connection', name, 'is_active', 1)
+        frappe.db.commit()
+        clear_active_connection_cache()
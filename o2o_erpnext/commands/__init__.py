@@ -1 +1,5 @@
-# Commands module
\ No newline at end of file
+# Commands module
+from o2o_erpnext.commands.portal_indexes import commands as portal_index_commands
+from o2o_erpnext.commands.invoice_counter import commands as invoice_counter_commands
+
+commands = portal_index_commands + invoice_counter_commands
@@ -0,0 +1,81 @@
+"""
+Invoice Counter Maintenance Command for O2O ERPNext
+"""
+
+import json
+
+import click
+import frappe
+from frappe.commands import pass_context
+
+
+@click.command('o2o-invoice-counter')
+@click.option('--prefix', default='AGO2O', help='Invoice prefix')
+@click.option('--financial-year', default=None, help='Financial year such as 25-26 (default: current)')
+@click.option('--bootstrap', is_flag=True, default=False, help='Create the counter tables and the series counter when missing')
+@click.option('--resync', is_flag=True, default=False, help='Raise the counter to the highest number used in ERPNext or the portal')
+@click.option('--reclaim', is_flag=True, default=False, help='Return unused numbers of expired leases to the gap pool')
+@click.option('--check-naming', is_flag=True, default=False, help='Check that Purchase Invoice naming goes through the remote counter')
+@pass_context
+def invoice_counter(context, prefix='AGO2O', financial_year=None, bootstrap=False, resync=False,
+                    reclaim=False, check_naming=False):
+    """Inspect and maintain the portal invoice number counter"""
+    from o2o_erpnext.api.invoice_number_allocator import (
+        bootstrap_invoice_counter,
+        get_invoice_counter_status,
+        reclaim_invoice_number_gaps,
+        resync_invoice_counter
+    )
+    from o2o_erpnext.api.remote_naming_series import get_current_financial_year
+
+    for site in context.sites:
+        frappe.init(site=site)
+        frappe.connect()
+        try:
+            series_year = financial_year or get_current_financial_year()
+            click.echo(f"Invoice counter {prefix}/{series_year} for site: {site}")
+
+            if bootstrap:
+                last_number = bootstrap_invoice_counter(prefix, series_year)
+                click.echo(f"Bootstrapped, counter at {last_number}")
+
+            if resync:
+                result = resync_invoice_counter(prefix, series_year)
+                click.echo(f"Counter {result['before']} -> {result['after']} (highest used: {result['max_used']})")
+
+            if reclaim:
+                result = reclaim_invoice_number_gaps()
+                click.echo(f"Reclaimed {result['numbers']} numbers from {result['leases']} expired leases")
+
+            if check_naming:
+                click.echo(json.dumps(check_purchase_invoice_naming(), indent=2, default=str))
+
+            status = get_invoice_counter_status(prefix, series_year)
+            click.echo(json.dumps(status, indent=2, default=str))
+            if status['bootstrapped'] and not status['in_sync']:
+                click.echo(f"Counter is behind the highest used number {status['max_used']}; run with --resync")
+        finally:
+            frappe.destroy()
+
+
+def check_purchase_invoice_naming():
+    """
+    Whether Purchase Invoice autoname uses the remote counter
+
+    Returns:
+        dict: Controller in use and naming checks
+    """
+    from frappe.model.base_document import get_controller
+
+    controller = get_controller('Purchase Invoice')
+    naming_series = frappe.get_meta('Purchase Invoice').get_field('naming_series')
+
+    return {
+        'override': (frappe.get_hooks('override_doctype_class') or {}).get('Purchase Invoice'),
+        'controller': f"{controller.__module__}.{controller.__name__}",
+        'uses_remote_counter': controller.__module__ == 'o2o_erpnext.overrides.purchase_invoice',
+        'naming_series_field': naming_series.options if naming_series else None
+    }
+
+
+commands = [invoice_counter]
@@ -0,0 +1,45 @@
+"""
+Portal Index Migration Command for O2O ERPNext
+"""
+
+import json
+
+import click
+import frappe
+from frappe.commands import pass_context
+
+
+@click.command('o2o-portal-indexes')
+@click.option('--dry-run', is_flag=True, default=False, help='Print the statements without running them')
+@click.option('--explain', is_flag=True, default=False, help='Print EXPLAIN of the invoice number lookups before and after')
+@pass_context
+def portal_indexes(context, dry_run=False, explain=False):
+    """Add the invoice number indexes to the portal database"""
+    from o2o_erpnext.config.portal_indexes import apply_portal_indexes, explain_portal_lookups
+
+    for site in context.sites:
+        frappe.init(site=site)
+        frappe.connect()
+        try:
+            click.echo(f"Portal indexes for site: {site}")
+
+            if explain:
+                click.echo("EXPLAIN before:")
+                click.echo(json.dumps(explain_portal_lookups(), indent=2, default=str))
+
+            result = apply_portal_indexes(dry_run=dry_run)
+            for statement in result['statements']:
+                click.echo(f"{'Would run' if dry_run else 'Ran'}: {statement}")
+            if result['backfilled']:
+                click.echo(f"Backfilled updated_at on {result['backfilled']} requisitions")
+            for index_name in result['existing']:
+                click.echo(f"Already present: {index_name}")
+
+            if explain and not dry_run:
+                click.echo("EXPLAIN after:")
+                click.echo(json.dumps(explain_portal_lookups(), indent=2, default=str))
+        finally:
+            frappe.destroy()
+
+
+commands = [portal_indexes]
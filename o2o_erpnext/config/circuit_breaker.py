@@ -0,0 +1,191 @@
+"""
+Portal Circuit Breaker Module
+Shared circuit breaker for portal database calls, stored in the site cache so
+that every gunicorn worker trips together
+
+States:
+    closed    - calls go through, connectivity failures are counted
+    open      - calls fail fast until the reset timeout has passed
+    half_open - one worker is allowed to probe; success closes, failure reopens
+"""
+
+import frappe
+import pymysql
+import time
+
+from sshtunnel import BaseSSHTunnelForwarderError
+
+from o2o_erpnext.config.connection_pool import PortalPoolExhausted
+
+# Breaker defaults - each can be overridden in site_config.json
+DEFAULT_BREAKER_SETTINGS = {
+    'portal_breaker_failure_threshold': 3,  # Consecutive connectivity failures before opening
+    'portal_breaker_reset_timeout': 30,     # Seconds the circuit stays open before a probe
+    'portal_fast_fail_timeout': 2           # Seconds budget for portal calls on the submit path
+}
+
+BREAKER_CACHE_KEY = 'o2o_portal_circuit_breaker'
+PROBE_CACHE_KEY = 'o2o_portal_circuit_breaker_probe'
+
+# MySQL client errors that mean the server or tunnel is unreachable
+CONNECTIVITY_ERROR_CODES = {
+    1040,  # Too many connections
+    2003,  # Can't connect to MySQL server
+    2006,  # MySQL server has gone away
+    2013,  # Lost connection to MySQL server during query
+    2055   # Lost connection to MySQL server at '%s'
+}
+
+STATE_CLOSED = 'closed'
+STATE_OPEN = 'open'
+STATE_HALF_OPEN = 'half_open'
+
+
+class PortalCircuitOpen(Exception):
+    """Raised instead of calling the portal while the circuit is open"""
+
+
+def get_breaker_settings():
+    """
+    Get circuit breaker settings from site config, falling back to defaults
+
+    Returns:
+        dict: Breaker settings
+    """
+    conf = frappe.conf or {}
+    return {key: conf.get(key, default) for key, default in DEFAULT_BREAKER_SETTINGS.items()}
+
+
+def get_fast_fail_timeout():
+    """
+    Get the time budget for portal calls made inside a user request
+
+    Returns:
+        float: Seconds
+    """
+    return float(get_breaker_settings()['portal_fast_fail_timeout'])
+
+
+def is_connectivity_error(error):
+    """
+    Check whether an exception means the portal could not be reached
+
+    Query errors (syntax, duplicates, lock waits) do not count against the breaker.
+
+    Args:
+        error (Exception): Raised exception
+
+    Returns:
+        bool: True for connection/tunnel level failures
+    """
+    if isinstance(error, (pymysql.err.InterfaceError, PortalPoolExhausted,
+                          BaseSSHTunnelForwarderError, OSError)):
+        return True
+
+    if isinstance(error, pymysql.err.OperationalError):
+        return bool(error.args) and error.args[0] in CONNECTIVITY_ERROR_CODES
+
+    return False
+
+
+def _get_state():
+    return frappe.cache().get_value(BREAKER_CACHE_KEY) or {
+        'state': STATE_CLOSED,
+        'failures': 0,
+        'opened_at': None,
+        'last_error': None
+    }
+
+
+def _set_state(state):
+    frappe.cache().set_value(BREAKER_CACHE_KEY, state)
+
+
+def before_call():
+    """
+    Check the circuit before a fast-fail portal call
+
+    Raises:
+        PortalCircuitOpen: When the circuit is open, or half-open and another worker is probing
+    """
+    state = _get_state()
+    if state['state'] == STATE_CLOSED:
+        return
+
+    settings = get_breaker_settings()
+    reset_timeout = settings['portal_breaker_reset_timeout']
+    elapsed = time.time() - (state['opened_at'] or 0)
+
+    if elapsed < reset_timeout:
+        raise PortalCircuitOpen(
+            f"Portal unavailable (circuit open, retry in {int(reset_timeout - elapsed)}s): "
+            f"{state.get('last_error') or 'repeated connection failures'}"
+        )
+
+    # Half-open: only one worker across the site gets to probe
+    cache = frappe.cache()
+    if not cache.set(cache.make_key(PROBE_CACHE_KEY), 1, nx=True, ex=int(reset_timeout)):
+        raise PortalCircuitOpen("Portal unavailable (circuit half-open, probe in progress)")
+
+    if state['state'] != STATE_HALF_OPEN:
+        state['state'] = STATE_HALF_OPEN
+        _set_state(state)
+        frappe.logger().info("Portal circuit half-open, probing")
+
+
+def record_success():
+    """Close the circuit after a successful portal call"""
+    state = _get_state()
+    if state['state'] == STATE_CLOSED and not state['failures']:
+        return
+
+    if state['state'] != STATE_CLOSED:
+        frappe.logger().info("Portal circuit closed, portal reachable again")
+
+    _set_state({'state': STATE_CLOSED, 'failures': 0, 'opened_at': None, 'last_error': None})
+    frappe.cache().delete_value(PROBE_CACHE_KEY)
+
+
+def record_failure(error):
+    """
+    Count a portal call failure, opening the circuit on connectivity failures
+
+    Args:
+        error (Exception): Raised exception
+    """
+    if not is_connectivity_error(error):
+        return
+
+    settings = get_breaker_settings()
+    state = _get_state()
+    state['failures'] = (state['failures'] or 0) + 1
+    state['last_error'] = str(error)[:200]
+
+    if state['state'] == STATE_HALF_OPEN or state['failures'] >= settings['portal_breaker_failure_threshold']:
+        if state['state'] != STATE_OPEN:
+            frappe.logger().error(
+                f"Portal circuit opened after {state['failures']} failure(s): {state['last_error']}"
+            )
+        state['state'] = STATE_OPEN
+        state['opened_at'] = time.time()
+        frappe.cache().delete_value(PROBE_CACHE_KEY)
+
+    _set_state(state)
+
+
+def get_breaker_status():
+    """
+    Get the current circuit breaker state
+
+    Returns:
+        dict: State, failure count, opened_at and last error
+    """
+    status = dict(_get_state())
+    status['settings'] = get_breaker_settings()
+    return status
+
+
+def reset_breaker():
+    """Force the circuit closed"""
+    frappe.cache().delete_value(BREAKER_CACHE_KEY)
+    frappe.cache().delete_value(PROBE_CACHE_KEY)
@@ -0,0 +1,354 @@
+"""
+Portal Connection Pool Module
+Keeps warm pymysql connections to the portal database, one pool per Database Connection
+SSH tunnels are shared through SSHTunnelManager's global registry
+"""
+
+import frappe
+import pymysql
+import threading
+import time
+
+from o2o_erpnext.config.ssh_tunnel_manager import SSHTunnelManager
+
+# Pool defaults - each can be overridden in site_config.json
+DEFAULT_POOL_SETTINGS = {
+    'portal_pool_max_size': 5,          # Max open connections per Database Connection
+    'portal_pool_max_idle': 300,        # Seconds an idle connection is kept before eviction
+    'portal_pool_ping_interval': 30,    # Idle seconds after which a liveness ping is sent
+    'portal_pool_acquire_timeout': 10,  # Seconds to wait for a free connection
+    'portal_connect_timeout': 30,
+    'portal_read_timeout': 30,
+    'portal_write_timeout': 30
+}
+
+# Global registry of pools keyed by Database Connection name
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+class PortalPoolExhausted(Exception):
+    """Raised when no pooled connection becomes free within the acquire timeout"""
+
+
+def get_pool_settings():
+    """
+    Get pool settings from site config, falling back to defaults
+
+    Returns:
+        dict: Pool settings
+    """
+    conf = frappe.conf or {}
+    return {key: conf.get(key, default) for key, default in DEFAULT_POOL_SETTINGS.items()}
+
+
+class PooledConnection:
+    """A pymysql connection plus the bookkeeping the pool needs"""
+
+    def __init__(self, connection, local_port=None, tunnel_reused=False):
+        self.connection = connection
+        self.local_port = local_port
+        self.tunnel_reused = tunnel_reused
+        self.reused = False
+        self.created_at = time.monotonic()
+        self.last_used = self.created_at
+
+
+class PortalConnectionPool:
+    """Bounded LIFO pool of connections for a single Database Connection"""
+
+    def __init__(self, connection_name, fingerprint):
+        self.connection_name = connection_name
+        self.fingerprint = fingerprint
+        self.closed = False
+        self._idle = []
+        self._in_use = 0
+        self._cond = threading.Condition()
+
+    def acquire(self, config, timeout=None):
+        """
+        Borrow a connection, reusing an idle one when it is still alive
+
+        Args:
+            config (dict): Resolved Database Connection configuration
+            timeout (float): Fast-fail budget - caps the wait for a free connection, the
+                tunnel start, connect time and this borrow's read/write timeouts
+
+        Returns:
+            PooledConnection: Borrowed connection, must be given back with release()
+        """
+        settings = get_pool_settings()
+        if timeout:
+            for key in ('portal_pool_acquire_timeout', 'portal_connect_timeout',
+                        'portal_read_timeout', 'portal_write_timeout'):
+                settings[key] = min(settings[key], timeout)
+
+        local_port, tunnel_reused = None, False
+        if config['ssh_tunnel']:
+            local_port, tunnel_reused = SSHTunnelManager.ensure_tunnel(config, timeout=timeout)
+
+        deadline = time.monotonic() + settings['portal_pool_acquire_timeout']
+        stale = []
+
+        with self._cond:
+            while True:
+                stale.extend(self._evict_expired(settings['portal_pool_max_idle']))
+
+                if self._idle:
+                    pooled = self._idle.pop()
+                    break
+
+                if self._in_use < settings['portal_pool_max_size']:
+                    pooled = None
+                    break
+
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise PortalPoolExhausted(
+                        f"No free portal connection for {self.connection_name} "
+                        f"after {settings['portal_pool_acquire_timeout']}s"
+                    )
+                self._cond.wait(remaining)
+
+            self._in_use += 1
+
+        for old in stale:
+            _close_quietly(old)
+
+        try:
+            if pooled:
+                # Applied before the liveness ping so the ping honours the budget too
+                _set_io_timeouts(pooled.connection, settings)
+
+            if pooled and self._is_alive(pooled, local_port, settings['portal_pool_ping_interval']):
+                pooled.reused = True
+                pooled.tunnel_reused = tunnel_reused
+                return pooled
+
+            if pooled:
+                _close_quietly(pooled)
+
+            connection = _connect(config, local_port, settings)
+            frappe.logger().info(
+                f"Opened pooled portal connection for {config['display_name']} ({self.connection_name})"
+            )
+            return PooledConnection(connection, local_port, tunnel_reused)
+
+        except Exception:
+            with self._cond:
+                self._in_use -= 1
+                self._cond.notify()
+            raise
+
+    def release(self, pooled, discard=False):
+        """
+        Give a borrowed connection back to the pool
+
+        Args:
+            pooled (PooledConnection): Connection returned by acquire()
+            discard (bool): Close the connection instead of keeping it
+        """
+        settings = get_pool_settings()
+        if not discard:
+            try:
+                # Undo a fast-fail borrow's shorter timeouts before anything else is sent
+                _set_io_timeouts(pooled.connection, settings)
+                # End any open transaction so the next borrower gets a fresh snapshot,
+                # and undo per-call session changes such as conn.autocommit(True)
+                pooled.connection.rollback()
+                if pooled.connection.get_autocommit():
+                    pooled.connection.autocommit(False)
+            except Exception:
+                discard = True
+
+        with self._cond:
+            self._in_use -= 1
+            keep = (not discard and not self.closed
+                    and len(self._idle) < settings['portal_pool_max_size'])
+            if keep:
+                pooled.last_used = time.monotonic()
+                self._idle.append(pooled)
+            self._cond.notify()
+
+        if not keep:
+            _close_quietly(pooled)
+
+    def close(self):
+        """Close all idle connections; borrowed ones are closed when released"""
+        with self._cond:
+            self.closed = True
+            idle, self._idle = self._idle, []
+            self._cond.notify_all()
+
+        for pooled in idle:
+            _close_quietly(pooled)
+
+    def get_status(self):
+        """
+        Get current pool occupancy
+
+        Returns:
+            dict: Idle and in-use connection counts
+        """
+        with self._cond:
+            return {
+                'connection_name': self.connection_name,
+                'idle': len(self._idle),
+                'in_use': self._in_use,
+                'closed': self.closed
+            }
+
+    def _evict_expired(self, max_idle):
+        """Remove idle connections past max_idle (caller holds the lock)"""
+        now = time.monotonic()
+        expired = [p for p in self._idle if now - p.last_used > max_idle]
+        if expired:
+            self._idle = [p for p in self._idle if now - p.last_used <= max_idle]
+        return expired
+
+    def _is_alive(self, pooled, local_port, ping_interval):
+        """Cheap liveness check - tunnel port must match and a ping is sent only after idling"""
+        if pooled.local_port != local_port:
+            # Tunnel was restarted on a different port since this connection was opened
+            return False
+
+        if time.monotonic() - pooled.last_used < ping_interval:
+            return True
+
+        try:
+            pooled.connection.ping(reconnect=False)
+            return True
+        except Exception:
+            return False
+
+
+def _connect(config, local_port, settings):
+    """Open a new pymysql connection for the given config"""
+    conn_params = {
+        'user': config['username'],
+        'password': config['password'],
+        'database': config['database_name'],
+        'charset': 'utf8mb4',
+        'cursorclass': pymysql.cursors.DictCursor,
+        'connect_timeout': settings['portal_connect_timeout'],
+        'read_timeout': settings['portal_read_timeout'],
+        'write_timeout': settings['portal_write_timeout'],
+        'autocommit': False
+    }
+
+    if config['ssh_tunnel']:
+        conn_params['host'] = '127.0.0.1'
+        conn_params['port'] = local_port
+    else:
+        conn_params['host'] = config['host']
+        conn_params['port'] = config['port']
+
+        # Add SSL parameters if required
+        if config.get('ssl_required'):
+            conn_params['ssl'] = {'ssl_disabled': False}
+        else:
+            conn_params['ssl_disabled'] = True
+
+    return pymysql.connect(**conn_params)
+
+
+def _set_io_timeouts(connection, settings):
+    """Set the socket read/write timeouts pymysql applies on every packet of this connection"""
+    connection._read_timeout = settings['portal_read_timeout']
+    connection._write_timeout = settings['portal_write_timeout']
+
+
+def _close_quietly(pooled):
+    try:
+        pooled.connection.close()
+    except Exception:
+        pass
+
+
+def _config_fingerprint(config):
+    """Connection settings that invalidate pooled connections when changed"""
+    keys = ('host', 'port', 'database_name', 'username', 'password', 'ssh_tunnel',
+            'ssh_host', 'ssh_port', 'ssh_username', 'ssh_key_file', 'ssl_required',
+            'tunnel_remote_host', 'tunnel_remote_port')
+    return tuple(config.get(key) for key in keys)
+
+
+def get_pool(config):
+    """
+    Get the pool for a resolved config, replacing it if the connection settings changed
+
+    Args:
+        config (dict): Resolved Database Connection configuration
+
+    Returns:
+        PortalConnectionPool: Pool for config['name']
+    """
+    connection_name = config['name']
+    fingerprint = _config_fingerprint(config)
+    replaced = None
+
+    with _pools_lock:
+        pool = _pools.get(connection_name)
+        if pool and pool.fingerprint != fingerprint:
+            replaced = pool
+            pool = None
+        if not pool:
+            pool = PortalConnectionPool(connection_name, fingerprint)
+            _pools[connection_name] = pool
+
+    if replaced:
+        replaced.close()
+
+    return pool
+
+
+def acquire_connection(config, timeout=None):
+    """
+    Borrow a pooled connection for a resolved config
+
+    Args:
+        config (dict): Resolved Database Connection configuration
+        timeout (float): Optional fast-fail budget, see PortalConnectionPool.acquire()
+
+    Returns:
+        tuple: (PortalConnectionPool, PooledConnection)
+    """
+    pool = get_pool(config)
+    return pool, pool.acquire(config, timeout=timeout)
+
+
+def close_pool(connection_name):
+    """
+    Close and forget the pool for a Database Connection
+
+    Args:
+        connection_name (str): Name of the Database Connection
+    """
+    with _pools_lock:
+        pool = _pools.pop(connection_name, None)
+
+    if pool:
+        pool.close()
+
+
+def close_all_pools():
+    """Close every pool in this process"""
+    with _pools_lock:
+        pools = list(_pools.values())
+        _pools.clear()
+
+    for pool in pools:
+        pool.close()
+
+
+def get_all_pools_status():
+    """
+    Get occupancy of all pools in this process
+
+    Returns:
+        list: Pool status dicts
+    """
+    with _pools_lock:
+        pools = list(_pools.values())
+
+    return [pool.get_status() for pool in pools]
@@ -6,10 +6,13 @@ Based on real procureuat.sql schema analysis
 
 import frappe
 import pymysql
-from sshtunnel import SSHTunnelForwarder
-import os
+import contextvars
+from concurrent.futures import ThreadPoolExecutor
 from contextlib import contextmanager
 from frappe import _
+from o2o_erpnext.config import circuit_breaker
+from o2o_erpnext.config.connection_pool import acquire_connection
+from o2o_erpnext.config.query_instrumentation import instrument_connection
 
 # Database connection settings (from actual working connection)
 PROCUREUAT_CONFIG = {
@@ -24,47 +27,32 @@ PROCUREUAT_CONFIG = {
     'db_name': 'procureuat'
 }
 
+# Site cache key for the resolved active Database Connection (password excluded)
+ACTIVE_CONNECTION_CACHE_KEY = 'o2o_active_database_connection'
+
+# Per-worker decrypted passwords keyed by (connection name, modified)
+_password_cache = {}
+
+
 def get_active_database_connection():
     """
     Get the active Database Connection from ERPNext
     
+    The resolved config is kept in the site cache and cleared by the
+    Database Connection controller on update/trash. The password never goes
+    into Redis; it is decrypted lazily once per worker.
+    
     Returns:
         dict: Active database connection configuration
     """
     try:
-        # Get active database connection
-        active_conn = frappe.get_all(
-            'Database Connection',
-            filters={'is_active': 1},
-            fields=['name', 'display_name', 'database_type', 'host', 'port', 'database_name', 
-                   'username', 'ssh_tunnel', 'ssh_host', 'ssh_port', 'ssh_username', 'ssh_key_file'],
-            limit=1
-        )
-        
-        if not active_conn:
-            raise frappe.ValidationError("No active Database Connection found. Please activate a connection in Database Connection list.")
-        
-        conn_doc = frappe.get_doc('Database Connection', active_conn[0]['name'])
-        password = conn_doc.get_password('password')
-        
-        config = {
-            'name': conn_doc.name,
-            'display_name': conn_doc.display_name,
-            'database_type': conn_doc.database_type,
-            'host': conn_doc.host,
-            'port': conn_doc.port,
-            'database_name': conn_doc.database_name,
-            'username': conn_doc.username,
-            'password': password,
-            'ssh_tunnel': conn_doc.ssh_tunnel,
-            'ssh_host': conn_doc.ssh_host if conn_doc.ssh_tunnel else None,
-            'ssh_port': conn_doc.ssh_port if conn_doc.ssh_tunnel else None,
-            'ssh_username': conn_doc.ssh_username if conn_doc.ssh_tunnel else None,
-            'ssh_key_file': conn_doc.ssh_key_file if conn_doc.ssh_tunnel else None,
-            'ssl_required': conn_doc.ssl_required
-        }
+        config = frappe.cache().get_value(ACTIVE_CONNECTION_CACHE_KEY)
+        if not config:
+            config = _resolve_active_database_connection()
+            frappe.cache().set_value(ACTIVE_CONNECTION_CACHE_KEY, config)
         
-        frappe.logger().info(f"Using active database connection: {config['display_name']} ({config['name']})")
+        config = dict(config)
+        config['password'] = _get_connection_password(config['name'], config['modified'])
         return config
         
     except Exception as e:
@@ -88,156 +76,314 @@ def get_active_database_connection():
             'ssl_required': 0
         }
 
+def _resolve_active_database_connection():
+    """Read the active Database Connection from the database (without password)"""
+    active_conn = frappe.get_all(
+        'Database Connection',
+        filters={'is_active': 1},
+        fields=['name', 'modified', 'display_name', 'database_type', 'host', 'port', 'database_name',
+               'username', 'ssh_tunnel', 'ssh_host', 'ssh_port', 'ssh_username', 'ssh_key_file',
+               'ssl_required', 'use_read_replica', 'replica_host', 'replica_port', 'replica_username'],
+        limit=1
+    )
+    
+    if not active_conn:
+        raise frappe.ValidationError("No active Database Connection found. Please activate a connection in Database Connection list.")
+    
+    conn = active_conn[0]
+    ssh_tunnel = conn.ssh_tunnel
+    
+    return {
+        'name': conn.name,
+        'modified': str(conn.modified),
+        'display_name': conn.display_name,
+        'database_type': conn.database_type,
+        'host': conn.host,
+        'port': conn.port,
+        'database_name': conn.database_name,
+        'username': conn.username,
+        'ssh_tunnel': ssh_tunnel,
+        'ssh_host': conn.ssh_host if ssh_tunnel else None,
+        'ssh_port': conn.ssh_port if ssh_tunnel else None,
+        'ssh_username': conn.ssh_username if ssh_tunnel else None,
+        'ssh_key_file': conn.ssh_key_file if ssh_tunnel else None,
+        'ssl_required': conn.ssl_required,
+        'use_read_replica': conn.use_read_replica and bool(conn.replica_host),
+        'replica_host': conn.replica_host,
+        'replica_port': conn.replica_port or 3306,
+        'replica_username': conn.replica_username
+    }
+
+def _get_connection_password(connection_name, modified, fieldname='password'):
+    """Decrypt a connection password once per worker and document version"""
+    key = (connection_name, modified, fieldname)
+    if key not in _password_cache:
+        from frappe.utils.password import get_decrypted_password
+        
+        # Drop passwords of older versions of this connection
+        for stale in [k for k in _password_cache
+                      if k[0] == connection_name and k[2] == fieldname]:
+            _password_cache.pop(stale, None)
+        
+        _password_cache[key] = get_decrypted_password(
+            'Database Connection', connection_name, fieldname, raise_exception=False
+        )
+    return _password_cache[key]
+
+def get_replica_connection_name(connection_name):
+    """Pool and tunnel registry key used for a connection's read replica"""
+    return f"{connection_name}::replica"
+
+def get_replica_database_connection(config):
+    """
+    Derive the read replica configuration from a resolved primary config
+    
+    With SSH tunnel enabled the replica is reached through the same SSH host,
+    with the tunnel bound to the replica host/port instead of local MySQL.
+    
+    Args:
+        config (dict): Resolved primary configuration
+        
+    Returns:
+        dict: Replica configuration, or None when no replica is configured
+    """
+    if not config.get('use_read_replica'):
+        return None
+    
+    replica = dict(config)
+    replica['name'] = get_replica_connection_name(config['name'])
+    replica['display_name'] = f"{config['display_name']} (Read Replica)"
+    replica['username'] = config['replica_username'] or config['username']
+    replica['password'] = (
+        _get_connection_password(config['name'], config['modified'], 'replica_password')
+        or config['password']
+    )
+    
+    if config['ssh_tunnel']:
+        replica['tunnel_remote_host'] = config['replica_host']
+        replica['tunnel_remote_port'] = config['replica_port']
+    else:
+        replica['host'] = config['replica_host']
+        replica['port'] = config['replica_port']
+    
+    return replica
+
+def clear_active_connection_cache(connection_name=None):
+    """
+    Forget the cached active connection config and worker-local passwords
+    
+    Args:
+        connection_name (str): Only drop passwords for this connection
+    """
+    frappe.cache().delete_value(ACTIVE_CONNECTION_CACHE_KEY)
+    for key in list(_password_cache):
+        if not connection_name or key[0] == connection_name:
+            _password_cache.pop(key, None)
+
+def _acquire_read_replica(config, timeout=None):
+    """
+    Borrow a replica connection, returning None so callers fall back to the primary
+    
+    Args:
+        config (dict): Resolved primary configuration
+        timeout (float): Cap on acquire/connect time (fast-fail borrows)
+    """
+    replica = get_replica_database_connection(config)
+    if not replica:
+        return None
+    
+    try:
+        return acquire_connection(replica, timeout=timeout)
+    except Exception as e:
+        frappe.logger().warning(
+            f"Read replica unavailable for {config['display_name']}, using primary: {str(e)}"
+        )
+        return None
+
 @contextmanager
-def get_external_db_connection():
+def get_external_db_connection(read_only=False, fast_fail=False, config=None):
     """
     Get database connection to ProcureUAT using active Database Connection configuration
     
+    Connections come from a process-wide pool keyed by Database Connection name,
+    so repeated calls reuse the SSH tunnel and the MySQL session instead of
+    building both from scratch. The connection is returned to the pool on exit.
+    
+    Connectivity failures on the primary feed the shared portal circuit breaker.
+    Every statement is timed by the query instrumentation (see get_portal_query_stats).
+    
+    Args:
+        read_only (bool): Route to the read replica when one is configured.
+            Only pass this for pure SELECT workloads - anything that writes
+            (invoice_counter, invoice inserts/updates) must use the primary.
+        fast_fail (bool): For calls made inside a user request (e.g. Purchase
+            Invoice submit). Raises PortalCircuitOpen immediately while the
+            circuit is open and caps tunnel start, acquire, connect and query
+            read/write time at portal_fast_fail_timeout, on the read replica as
+            well as on the primary.
+        config (dict): Already resolved configuration; lets worker threads skip
+            resolution, which may need frappe.db
+    
     Yields:
         pymysql.Connection: Database connection with DictCursor
     """
-    tunnel = None
-    connection = None
+    pool = None
+    pooled = None
+    on_primary = True
     
     try:
-        # Get active database connection configuration
-        config = get_active_database_connection()
-        
-        if config['ssh_tunnel']:
-            # SSH tunnel connection
-            ssh_key_path = config['ssh_key_file']
-            if not os.path.exists(ssh_key_path):
-                raise FileNotFoundError(f"SSH key not found: {ssh_key_path}")
-            
-            # Check file permissions
-            file_stat = os.stat(ssh_key_path)
-            if oct(file_stat.st_mode)[-3:] != '600':
-                frappe.logger().warning(f"SSH key has incorrect permissions: {ssh_key_path}")
-            
-            # Create SSH tunnel
-            tunnel = SSHTunnelForwarder(
-                (config['ssh_host'], config['ssh_port']),
-                ssh_username=config['ssh_username'],
-                ssh_pkey=ssh_key_path,
-                remote_bind_address=('127.0.0.1', 3306),  # Remote MySQL port
-                local_bind_address=('127.0.0.1', 0)  # Use random available port
-            )
-            
-            tunnel.start()
-            local_port = tunnel.local_bind_port
-            
-            frappe.logger().info(f"SSH tunnel established on local port: {local_port}")
-            
-            # Create database connection through tunnel
-            connection = pymysql.connect(
-                host='127.0.0.1',
-                port=local_port,
-                user=config['username'],
-                password=config['password'],
-                database=config['database_name'],
-                charset='utf8mb4',
-                cursorclass=pymysql.cursors.DictCursor,
-                connect_timeout=30,
-                read_timeout=30,
-                write_timeout=30,
-                autocommit=False
-            )
-        else:
-            # Direct connection
-            conn_params = {
-                'host': config['host'],
-                'port': config['port'],
-                'user': config['username'],
-                'password': config['password'],
-                'database': config['database_name'],
-                'charset': 'utf8mb4',
-                'cursorclass': pymysql.cursors.DictCursor,
-                'connect_timeout': 30,
-                'read_timeout': 30,
-                'write_timeout': 30,
-                'autocommit': False
-            }
-            
-            # Add SSL parameters if required
-            if config.get('ssl_required'):
-                conn_params['ssl'] = {'ssl_disabled': False}
-            else:
-                conn_params['ssl_disabled'] = True
-            
-            connection = pymysql.connect(**conn_params)
-        
-        # Test connection
-        with connection.cursor() as cursor:
-            cursor.execute("SELECT DATABASE() as db_name, USER() as user_name, VERSION() as version")
-            result = cursor.fetchone()
-            frappe.logger().info(f"Connected to {config['display_name']}: {result}")
-        
-        yield connection
+        if fast_fail:
+            circuit_breaker.before_call()
         
+        # Get active database connection configuration
+        config = config or get_active_database_connection()
+        timeout = circuit_breaker.get_fast_fail_timeout() if fast_fail else None
+        acquired = _acquire_read_replica(config, timeout=timeout) if read_only else None
+        on_primary = not acquired
+        pool, pooled = acquired or acquire_connection(config, timeout=timeout)
     except Exception as e:
         frappe.logger().error(f"External database connection failed: {str(e)}")
+        circuit_breaker.record_failure(e)
+        raise
+    
+    discard = False
+    try:
+        yield instrument_connection(pooled, pool.connection_name)
+    except (pymysql.err.OperationalError, pymysql.err.InterfaceError) as e:
+        # Broken session - do not hand it to the next caller
+        discard = True
+        frappe.logger().error(f"External database connection failed: {str(e)}")
+        if on_primary:
+            circuit_breaker.record_failure(e)
         raise
     finally:
-        # Clean up resources
-        if connection:
-            try:
-                connection.close()
-            except:
-                pass
+        pool.release(pooled, discard=discard)
+        if on_primary and not discard:
+            circuit_breaker.record_success()
+
+def stream_portal_query(query, params=None, chunk_size=None, read_only=False):
+    """
+    Stream a portal query through an unbuffered SSDictCursor
+    
+    Rows are read from the socket as the caller consumes them, so memory stays
+    flat regardless of the result size. The pooled connection is held until the
+    generator is exhausted or closed; closing early drains the remaining rows
+    (pymysql requirement), so prefer a LIMIT when only a prefix is needed.
+    No other query may run on the same connection while the stream is open.
+    
+    Args:
+        query (str): SELECT statement
+        params (tuple/list/dict): Query parameters
+        chunk_size (int): Yield lists of up to chunk_size rows instead of single rows
+        read_only (bool): Route to the read replica when one is configured
+        
+    Yields:
+        dict or list: A row, or a chunk of rows when chunk_size is given
+    """
+    net_write_timeout = int((frappe.conf or {}).get('portal_stream_net_write_timeout', 600))
+    
+    with get_external_db_connection(read_only=read_only) as conn:
+        # The server aborts the stream if the consumer stalls longer than
+        # net_write_timeout (default 60s), e.g. while inserting documents
+        with conn.cursor() as cursor:
+            cursor.execute("SET SESSION net_write_timeout = %s", (net_write_timeout,))
         
-        if tunnel:
+        try:
+            with conn.cursor(pymysql.cursors.SSDictCursor) as cursor:
+                cursor.execute(query, params or ())
+                
+                if chunk_size:
+                    while True:
+                        rows = cursor.fetchmany(chunk_size)
+                        if not rows:
+                            break
+                        yield rows
+                else:
+                    for row in cursor:
+                        yield row
+        finally:
             try:
-                tunnel.stop()
-            except:
+                with conn.cursor() as cursor:
+                    cursor.execute("SET SESSION net_write_timeout = DEFAULT")
+            except Exception:
                 pass
 
+def run_portal_queries(queries, read_only=True):
+    """
+    Run independent portal statements concurrently and gather their results
+    
+    Each statement runs on its own pooled connection in a worker thread, so a
+    batch of diagnostics takes as long as its slowest query instead of the sum.
+    Parallelism is capped by portal_parallel_queries (default 4) and by the pool size.
+    
+    Args:
+        queries (dict): Result key -> SQL string or (SQL, params) tuple
+        read_only (bool): Route to the read replica when one is configured
+        
+    Returns:
+        dict: Result key -> list of row dicts
+        
+    Raises:
+        Exception: The first failing statement's error, after all have finished
+    """
+    # Resolve once here: worker threads share this request's frappe.local but must not use frappe.db
+    config = get_active_database_connection()
+    if read_only:
+        get_replica_database_connection(config)
+    
+    max_workers = min(len(queries), int((frappe.conf or {}).get('portal_parallel_queries', 4)))
+    
+    def run_query(query):
+        sql, params = query if isinstance(query, tuple) else (query, None)
+        with get_external_db_connection(read_only=read_only, config=config) as conn:
+            with conn.cursor() as cursor:
+                cursor.execute(sql, params)
+                return cursor.fetchall()
+    
+    if max_workers <= 1:
+        return {key: run_query(query) for key, query in queries.items()}
+    
+    with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='o2o-portal-query') as executor:
+        futures = {
+            key: executor.submit(contextvars.copy_context().run, run_query, query)
+            for key, query in queries.items()
+        }
+        return {key: future.result() for key, future in futures.items()}
+
 def test_external_connection():
     """
     Test the external database connection
     Returns tuple (success: bool, message: str, data: dict)
     """
     try:
-        with get_external_db_connection() as conn:
-            with conn.cursor() as cursor:
-                # Test basic connection
-                cursor.execute("SELECT VERSION() as version, DATABASE() as db_name, USER() as user_name")
-                db_info = cursor.fetchone()
-                
-                # Test table access
-                cursor.execute("SHOW TABLES LIKE 'purchase_requisitions'")
-                pr_table = cursor.fetchone()
-                
-                cursor.execute("SHOW TABLES LIKE 'purchase_order_items'")
-                poi_table = cursor.fetchone()
-                
-                cursor.execute("SHOW TABLES LIKE 'vendors'")
-                vendors_table = cursor.fetchone()
-                
-                # Get record counts
-                cursor.execute("SELECT COUNT(*) as count FROM purchase_requisitions")
-                pr_count = cursor.fetchone()['count']
-                
-                cursor.execute("SELECT COUNT(*) as count FROM purchase_order_items") 
-                poi_count = cursor.fetchone()['count']
-                
-                cursor.execute("SELECT COUNT(*) as count FROM vendors WHERE status = 'active'")
-                vendor_count = cursor.fetchone()['count']
-                
-                data = {
-                    'database_info': db_info,
-                    'tables_found': {
-                        'purchase_requisitions': bool(pr_table),
-                        'purchase_order_items': bool(poi_table),
-                        'vendors': bool(vendors_table)
-                    },
-                    'record_counts': {
-                        'purchase_requisitions': pr_count,
-                        'purchase_order_items': poi_count,
-                        'active_vendors': vendor_count
-                    }
-                }
-                
-                return True, "Connection successful", data
+        results = run_portal_queries({
+            # Test basic connection
+            'db_info': "SELECT VERSION() as version, DATABASE() as db_name, USER() as user_name",
+            # Test table access
+            'pr_table': "SHOW TABLES LIKE 'purchase_requisitions'",
+            'poi_table': "SHOW TABLES LIKE 'purchase_order_items'",
+            'vendors_table': "SHOW TABLES LIKE 'vendors'",
+            # Get record counts
+            'pr_count': "SELECT COUNT(*) as count FROM purchase_requisitions",
+            'poi_count': "SELECT COUNT(*) as count FROM purchase_order_items",
+            'vendor_count': "SELECT COUNT(*) as count FROM vendors WHERE status = 'active'"
+        })
+        
+        data = {
+            'database_info': results['db_info'][0],
+            'tables_found': {
+                'purchase_requisitions': bool(results['pr_table']),
+                'purchase_order_items': bool(results['poi_table']),
+                'vendors': bool(results['vendors_table'])
+            },
+            'record_counts': {
+                'purchase_requisitions': results['pr_count'][0]['count'],
+                'purchase_order_items': results['poi_count'][0]['count'],
+                'active_vendors': results['vendor_count'][0]['count']
+            }
+        }
+        
+        return True, "Connection successful", data
                 
     except Exception as e:
         return False, f"Connection failed: {str(e)}", {}
@@ -248,7 +394,7 @@ def get_procureuat_vendors():
     Returns list of vendor dictionaries
     """
     try:
-        with get_external_db_connection() as conn:
+        with get_external_db_connection(read_only=True) as conn:
             with conn.cursor() as cursor:
                 cursor.execute("""
                     SELECT id, name, code, email, gstn, address, contact_number, website, status
@@ -261,7 +407,7 @@ def get_procureuat_vendors():
         frappe.logger().error(f"Error fetching vendors: {str(e)}")
         return []
 
-def get_procureuat_purchase_requisitions(limit=10, offset=0, filters=None):
+def get_procureuat_purchase_requisitions(limit=10, offset=0, filters=None, after=None):
     """
     Get purchase requisitions from ProcureUAT database
     
@@ -269,58 +415,83 @@ def get_procureuat_purchase_requisitions(limit=10, offset=0, filters=None):
         limit (int): Number of records to fetch
         offset (int): Offset for pagination
         filters (dict): Additional filters
+        after (tuple): (created_at, id) keyset position, replaces offset
         
     Returns:
         list: Purchase requisitions data
     """
     try:
-        with get_external_db_connection() as conn:
-            with conn.cursor() as cursor:
-                # Build query
-                where_conditions = ["pr.is_delete = 0"]
-                params = []
-                
-                if filters:
-                    if filters.get('order_status'):
-                        where_conditions.append("order_status = %s")
-                        params.append(filters['order_status'])
-                    
-                    if filters.get('entity'):
-                        where_conditions.append("entity = %s")
-                        params.append(filters['entity'])
-                    
-                    if filters.get('invoice_generated'):
-                        where_conditions.append("invoice_generated = %s")
-                        params.append(filters['invoice_generated'])
-                
-                where_clause = " AND ".join(where_conditions)
-                
-                query = f"""
-                    SELECT pr.id, pr.invoice_number, pr.entity, pr.subentity_id, pr.order_name, 
-                           pr.challan_number, pr.status, pr.created_at, pr.approved_at,
-                           pr.invoice_generated, pr.acknowledgement, pr.order_status,
-                           e.name as entity_name, e.code as entity_code,
-                           GROUP_CONCAT(DISTINCT s.name ORDER BY s.id SEPARATOR ', ') as subentity_names
-                    FROM purchase_requisitions pr
-                    LEFT JOIN entitys e ON pr.entity = e.id
-                    LEFT JOIN subentitys s ON FIND_IN_SET(s.id, pr.subentity_id) > 0
-                    WHERE {where_clause}
-                    GROUP BY pr.id, pr.invoice_number, pr.entity, pr.subentity_id, pr.order_name, 
-                             pr.challan_number, pr.status, pr.created_at, pr.approved_at,
-                             pr.invoice_generated, pr.acknowledgement, pr.order_status,
-                             e.name, e.code
-                    ORDER BY pr.created_at DESC, pr.id DESC
-                    LIMIT %s OFFSET %s
-                """
-                
-                params.extend([limit, offset])
-                cursor.execute(query, params)
-                return cursor.fetchall()
+        return list(iter_procureuat_purchase_requisitions(limit=limit, offset=offset, filters=filters, after=after))
                 
     except Exception as e:
         frappe.logger().error(f"Error fetching purchase requisitions: {str(e)}")
         return []
 
+def iter_procureuat_purchase_requisitions(limit=None, offset=0, filters=None, chunk_size=None, after=None):
+    """
+    Stream purchase requisitions from ProcureUAT database
+    
+    Args:
+        limit (int): Number of records to fetch, None for all
+        offset (int): Offset for pagination
+        filters (dict): Additional filters
+        chunk_size (int): Yield lists of rows instead of single rows
+        after (tuple): (created_at, id) of the last row already read; rows
+            after it are returned and offset is ignored
+        
+    Yields:
+        dict or list: Purchase requisition rows
+    """
+    # Build query
+    where_conditions = ["pr.is_delete = 0"]
+    params = []
+    
+    if filters:
+        if filters.get('order_status'):
+            where_conditions.append("order_status = %s")
+            params.append(filters['order_status'])
+        
+        if filters.get('entity'):
+            where_conditions.append("entity = %s")
+            params.append(filters['entity'])
+        
+        if filters.get('invoice_generated'):
+            where_conditions.append("invoice_generated = %s")
+            params.append(filters['invoice_generated'])
+    
+    if after:
+        from o2o_erpnext.config.portal_pagination import keyset_condition
+        
+        condition, condition_params = keyset_condition(after)
+        where_conditions.append(condition)
+        params.extend(condition_params)
+        offset = 0
+    
+    where_clause = " AND ".join(where_conditions)
+    
+    query = f"""
+        SELECT pr.id, pr.invoice_number, pr.entity, pr.subentity_id, pr.order_name, 
+               pr.challan_number, pr.status, pr.created_at, pr.approved_at,
+               pr.invoice_generated, pr.acknowledgement, pr.order_status,
+               e.name as entity_name, e.code as entity_code,
+               GROUP_CONCAT(DISTINCT s.name ORDER BY s.id SEPARATOR ', ') as subentity_names
+        FROM purchase_requisitions pr
+        LEFT JOIN entitys e ON pr.entity = e.id
+        LEFT JOIN subentitys s ON FIND_IN_SET(s.id, pr.subentity_id) > 0
+        WHERE {where_clause}
+        GROUP BY pr.id, pr.invoice_number, pr.entity, pr.subentity_id, pr.order_name, 
+                 pr.challan_number, pr.status, pr.created_at, pr.approved_at,
+                 pr.invoice_generated, pr.acknowledgement, pr.order_status,
+                 e.name, e.code
+        ORDER BY pr.created_at DESC, pr.id DESC
+    """
+    
+    if limit:
+        query += " LIMIT %s OFFSET %s"
+        params.extend([int(limit), int(offset or 0)])
+    
+    yield from stream_portal_query(query, params, chunk_size=chunk_size, read_only=True)
+
 def get_procureuat_purchase_order_items(purchase_order_id):
     """
     Get purchase order items for a specific purchase requisition
@@ -332,7 +503,7 @@ def get_procureuat_purchase_order_items(purchase_order_id):
         list: Purchase order items data
     """
     try:
-        with get_external_db_connection() as conn:
+        with get_external_db_connection(read_only=True) as conn:
             with conn.cursor() as cursor:
                 cursor.execute("""
                     SELECT id, purchase_order_id, category_id, subcategory_id, product_id,
@@ -386,7 +557,7 @@ def get_external_orders_for_sync(limit=50):
         dict: Success status and list of orders
     """
     try:
-        with get_external_db_connection() as conn:
+        with get_external_db_connection(read_only=True) as conn:
             with conn.cursor() as cursor:
                 # Get recent purchase requisitions with their items
                 query = """
@@ -0,0 +1,174 @@
+"""
+Portal Indexes Module
+Portal-side (ProcureUAT) indexes backing the invoice number lookups
+
+AGO2O invoice numbers are looked up with prefix patterns ('AGO2O/25-26/%'),
+which MySQL serves as a range scan on an index whose leading columns are
+(is_delete, invoice_number) or (is_delete, order_code). The incremental
+sync cursor walks (updated_at, id); rows without updated_at are backfilled
+from created_at first so the cursor sees them. The indexes are
+created online (ALGORITHM=INPLACE, LOCK=NONE) and only when missing, so the
+migration can be re-run safely:
+
+    bench --site <site> o2o-portal-indexes --dry-run
+    bench --site <site> o2o-portal-indexes --explain
+"""
+
+import frappe
+
+from o2o_erpnext.config.external_db_updated import get_external_db_connection
+
+# (table, index name, columns)
+PORTAL_INDEXES = [
+    ('purchase_requisitions', 'idx_pr_is_delete_invoice_number', ('is_delete', 'invoice_number')),
+    ('purchase_requisitions', 'idx_pr_is_delete_order_code', ('is_delete', 'order_code')),
+    ('purchase_requisitions', 'idx_pr_updated_at_id', ('updated_at', 'id'))
+]
+
+# Rows updated per statement by backfill_requisition_updated_at
+BACKFILL_BATCH_SIZE = 5000
+
+# Lookups the indexes are for, as issued by php_portal_invoices
+EXPLAIN_QUERIES = {
+    'ago2o_all': (
+        "SELECT id FROM purchase_requisitions WHERE is_delete = 0 AND invoice_number LIKE %s",
+        ('AGO2O/%',)
+    ),
+    'ago2o_financial_year': (
+        "SELECT id FROM purchase_requisitions WHERE is_delete = 0 AND invoice_number LIKE %s",
+        ('AGO2O/25-26/%',)
+    ),
+    'order_code_prefix': (
+        "SELECT id FROM purchase_requisitions WHERE is_delete = 0 AND order_code LIKE %s",
+        ('AGO2O/25-26/%',)
+    ),
+    'serial_suggestion': (
+        "SELECT id FROM purchase_requisitions WHERE is_delete = 0 AND invoice_number LIKE %s "
+        "AND CAST(SUBSTRING_INDEX(invoice_number, '/', -1) AS UNSIGNED) = %s "
+        "ORDER BY invoice_number DESC LIMIT 5",
+        ('AGO2O/%', 46)
+    ),
+    'sync_cursor': (
+        "SELECT id FROM purchase_requisitions WHERE (updated_at, id) > (%s, %s) "
+        "ORDER BY updated_at, id LIMIT 50",
+        ('2025-04-01 00:00:00', 0)
+    )
+}
+
+
+def get_existing_portal_indexes(cursor, table):
+    """
+    Get the indexes of a portal table
+
+    Args:
+        cursor: Portal DictCursor
+        table (str): Table name
+
+    Returns:
+        dict: Column tuple by index name
+    """
+    cursor.execute("""
+        SELECT INDEX_NAME as index_name, COLUMN_NAME as column_name
+        FROM information_schema.STATISTICS
+        WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s
+        ORDER BY INDEX_NAME, SEQ_IN_INDEX
+    """, (table,))
+
+    indexes = {}
+    for row in cursor.fetchall():
+        indexes.setdefault(row['index_name'], []).append(row['column_name'])
+    return {name: tuple(columns) for name, columns in indexes.items()}
+
+
+def apply_portal_indexes(dry_run=False):
+    """
+    Create the missing PORTAL_INDEXES on the active portal database
+
+    An index is skipped when the table already has one with the same name or
+    the same leading columns.
+
+    Args:
+        dry_run (bool): Only report what would be created
+
+    Returns:
+        dict: created, existing and statements
+    """
+    result = {'created': [], 'existing': [], 'statements': [], 'backfilled': 0}
+
+    with get_external_db_connection() as conn:
+        with conn.cursor() as cursor:
+            if dry_run:
+                result['statements'].append(
+                    "UPDATE purchase_requisitions SET updated_at = created_at WHERE updated_at IS NULL"
+                )
+            else:
+                result['backfilled'] = backfill_requisition_updated_at(conn)
+
+            for table, index_name, columns in PORTAL_INDEXES:
+                existing = get_existing_portal_indexes(cursor, table)
+                if index_name in existing or any(cols[:len(columns)] == columns for cols in existing.values()):
+                    result['existing'].append(index_name)
+                    continue
+
+                statement = (
+                    f"ALTER TABLE `{table}` ADD INDEX `{index_name}` "
+                    f"({', '.join(f'`{column}`' for column in columns)}), ALGORITHM=INPLACE, LOCK=NONE"
+                )
+                result['statements'].append(statement)
+                if dry_run:
+                    continue
+
+                cursor.execute(statement)
+                result['created'].append(index_name)
+                frappe.logger().info(f"Created portal index {index_name} on {table}")
+
+    return result
+
+
+def backfill_requisition_updated_at(conn):
+    """
+    Set updated_at from created_at on requisitions that never had one, in
+    committed batches, so the (updated_at, id) sync cursor sees every row
+
+    Args:
+        conn: Portal connection (primary)
+
+    Returns:
+        int: Rows backfilled
+    """
+    total = 0
+    with conn.cursor() as cursor:
+        while True:
+            cursor.execute("""
+                UPDATE purchase_requisitions
+                SET updated_at = COALESCE(created_at, NOW())
+                WHERE updated_at IS NULL
+                LIMIT %s
+            """, (BACKFILL_BATCH_SIZE,))
+            conn.commit()
+            total += cursor.rowcount
+            if cursor.rowcount < BACKFILL_BATCH_SIZE:
+                break
+
+    if total:
+        frappe.logger().info(f"Backfilled updated_at on {total} portal requisitions")
+    return total
+
+
+def explain_portal_lookups():
+    """
+    EXPLAIN the invoice number lookups on the active portal database
+
+    Returns:
+        dict: EXPLAIN rows (type, possible_keys, key, rows, Extra) by lookup
+    """
+    plans = {}
+    with get_external_db_connection(read_only=True) as conn:
+        with conn.cursor() as cursor:
+            for name, (query, params) in EXPLAIN_QUERIES.items():
+                cursor.execute(f"EXPLAIN {query}", params)
+                plans[name] = [
+                    {key: row.get(key) for key in ('type', 'possible_keys', 'key', 'rows', 'Extra')}
+                    for row in cursor.fetchall()
+                ]
+    return plans
@@ -0,0 +1,160 @@
+"""
+Portal Pagination Module
+Keyset pagination and cheap row counts for portal requisition listings
+
+Pages are addressed by an opaque cursor holding the (created_at, id) of the
+last row of the previous page, so page N costs the same index range scan as
+page 1 instead of reading and discarding N * limit rows with OFFSET.
+
+Counts are served in one of three modes:
+- exact:    COUNT(*) on every call
+- cached:   exact COUNT(*) cached per connection and filter for portal_count_ttl seconds
+- estimate: information_schema.TABLES.TABLE_ROWS, an InnoDB estimate that also
+            counts soft-deleted rows and ignores filters
+"""
+
+import base64
+import frappe
+import hashlib
+import json
+
+from frappe import _
+
+from o2o_erpnext.config.external_db_updated import (
+    get_active_database_connection,
+    get_external_db_connection
+)
+
+# Pagination defaults - each can be overridden in site_config.json
+DEFAULT_PAGINATION_SETTINGS = {
+    'portal_count_ttl': 300  # Seconds a cached listing count is reused
+}
+
+COUNT_CACHE_KEY = 'o2o_portal_listing_count'
+
+COUNT_MODES = ('exact', 'cached', 'estimate')
+
+# Rows strictly after a cursor in ORDER BY pr.created_at DESC, pr.id DESC
+KEYSET_CONDITION = "(pr.created_at < %s OR (pr.created_at = %s AND pr.id < %s))"
+
+
+def get_pagination_settings():
+    """
+    Get pagination settings from site config, falling back to defaults
+
+    Returns:
+        dict: Pagination settings
+    """
+    conf = frappe.conf or {}
+    return {key: conf.get(key, default) for key, default in DEFAULT_PAGINATION_SETTINGS.items()}
+
+
+def encode_page_cursor(row, created_field='created_at', id_field='id'):
+    """
+    Build the cursor of the page following a row
+
+    Args:
+        row (dict): Last row of the current page
+        created_field (str): Key holding pr.created_at
+        id_field (str): Key holding pr.id
+
+    Returns:
+        str: Opaque, URL-safe cursor token, or None without a row
+    """
+    if not row:
+        return None
+
+    payload = json.dumps([str(row[created_field]), int(row[id_field])], separators=(',', ':'))
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+
+
+def decode_page_cursor(token):
+    """
+    Read a cursor token built by encode_page_cursor()
+
+    Args:
+        token (str): Cursor token
+
+    Returns:
+        tuple: (created_at, id) of the last row of the previous page
+    """
+    try:
+        padded = token + '=' * (-len(token) % 4)
+        created_at, record_id = json.loads(base64.urlsafe_b64decode(padded.encode()).decode())
+        return created_at, int(record_id)
+    except Exception:
+        frappe.throw(_("Invalid pagination cursor"))
+
+
+def keyset_condition(after):
+    """
+    WHERE condition and params selecting the rows after a cursor position
+
+    Args:
+        after (tuple): (created_at, id) from decode_page_cursor()
+
+    Returns:
+        tuple: (condition, params)
+    """
+    created_at, record_id = after
+    return KEYSET_CONDITION, [created_at, created_at, record_id]
+
+
+def count_requisitions(conditions=None, params=None, count_mode='cached'):
+    """
+    Count purchase_requisitions rows (aliased pr) for a listing
+
+    Args:
+        conditions (list): WHERE conditions
+        params (list): Parameters of the conditions
+        count_mode (str): 'exact', 'cached' or 'estimate'
+
+    Returns:
+        dict: total and approximate (True for estimate, and for cached counts
+            which may lag by up to portal_count_ttl seconds)
+    """
+    if count_mode not in COUNT_MODES:
+        frappe.throw(_("Count mode must be one of {0}").format(", ".join(COUNT_MODES)))
+
+    conditions = list(conditions or [])
+    params = list(params or [])
+
+    if count_mode == 'estimate':
+        return {'total': _estimate_requisitions(), 'approximate': True}
+
+    if count_mode == 'exact':
+        return {'total': _count_requisitions(conditions, params), 'approximate': False}
+
+    connection_name = get_active_database_connection()['name']
+    digest = hashlib.md5(json.dumps([conditions, params], default=str).encode()).hexdigest()
+    key = f"{COUNT_CACHE_KEY}:{connection_name}:{digest}"
+
+    total = frappe.cache().get_value(key)
+    if total is None:
+        total = _count_requisitions(conditions, params)
+        frappe.cache().set_value(
+            key, total, expires_in_sec=int(get_pagination_settings()['portal_count_ttl'])
+        )
+    return {'total': total, 'approximate': True}
+
+
+def _count_requisitions(conditions, params):
+    where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+    with get_external_db_connection(read_only=True) as conn:
+        with conn.cursor() as cursor:
+            cursor.execute(f"SELECT COUNT(*) as total FROM purchase_requisitions pr {where}", params)
+            result = cursor.fetchone()
+            return result['total'] if result else 0
+
+
+def _estimate_requisitions():
+    with get_external_db_connection(read_only=True) as conn:
+        with conn.cursor() as cursor:
+            cursor.execute("""
+                SELECT TABLE_ROWS as total
+                FROM information_schema.TABLES
+                WHERE TABLE_SCHEMA = DATABASE()
+                AND TABLE_NAME = 'purchase_requisitions'
+            """)
+            result = cursor.fetchone()
+            return int(result['total'] or 0) if result else 0
@@ -0,0 +1,459 @@
+"""
+Portal Statistics Module
+Cached, incrementally maintained aggregates over active portal requisitions
+(purchase_requisitions LEFT JOIN purchase_order_items), replacing the
+full-table stats query that every invoice listing used to run
+
+- A full rebuild streams the join once and stores each requisition's
+  contribution (item count, sums, vendors) in a cache hash
+- Incremental refreshes only look at requisitions past the high-watermark
+  (id above the last seen id, or updated_at at/after the last seen update),
+  subtract their previous contribution and fold in the new one
+- Reads are served from the cache; stale results can be returned immediately
+  while a background job revalidates them
+"""
+
+import frappe
+import json
+import time
+
+from o2o_erpnext.config.external_db_updated import (
+    get_active_database_connection,
+    get_external_db_connection,
+    stream_portal_query
+)
+
+# Statistics defaults - each can be overridden in site_config.json
+DEFAULT_STATISTICS_SETTINGS = {
+    'portal_stats_ttl': 300,              # Seconds a refresh stays fresh
+    'portal_stats_full_refresh': 86400,   # Seconds between full rebuilds, corrects item-only edits
+    'portal_stats_lock_timeout': 600      # Upper bound for one refresh run
+}
+
+STATISTICS_CACHE_KEY = 'o2o_portal_statistics'
+ROWS_CACHE_KEY = 'o2o_portal_statistics_rows'
+VENDORS_CACHE_KEY = 'o2o_portal_statistics_vendors'
+LOCK_CACHE_KEY = 'o2o_portal_statistics_lock'
+
+# Requisition ids per purchase_order_items IN (...) query
+ITEMS_BATCH_SIZE = 1000
+
+# Matches the WHERE clause of the listings' former stats query
+ACTIVE_CONDITION = "pr.is_delete = 0 AND pr.status = 'active'"
+
+
+def get_statistics_settings():
+    """
+    Get statistics settings from site config, falling back to defaults
+
+    Returns:
+        dict: Statistics settings
+    """
+    conf = frappe.conf or {}
+    return {key: conf.get(key, default) for key, default in DEFAULT_STATISTICS_SETTINGS.items()}
+
+
+def _keys(connection_name):
+    """Cache keys of one portal connection, statistics are kept per connection"""
+    return {
+        'state': f"{STATISTICS_CACHE_KEY}:{connection_name}",
+        'rows': frappe.cache().make_key(f"{ROWS_CACHE_KEY}:{connection_name}"),
+        'vendors': frappe.cache().make_key(f"{VENDORS_CACHE_KEY}:{connection_name}"),
+        'lock': f"{LOCK_CACHE_KEY}:{connection_name}"
+    }
+
+
+def _empty_state(connection_name):
+    return {
+        'connection_name': connection_name,
+        'total_invoices': 0,
+        'total_value': 0.0,
+        'total_gst_value': 0.0,
+        'amount_count': 0,
+        'oldest_invoice': None,
+        'newest_invoice': None,
+        'max_id': 0,
+        'max_updated_at': None,
+        'refreshed_at': None,
+        'rebuilt_at': None
+    }
+
+
+def _new_contribution(created_at):
+    return {'c': created_at, 'n': 0, 't': 0.0, 'g': 0.0, 'a': 0, 'v': {}}
+
+
+def _add_item(contribution, item):
+    """Fold one purchase_order_items row into its requisition's contribution"""
+    if item.get('item_id') is None:
+        return
+    contribution['n'] += 1
+    if item['total_amt'] is not None:
+        contribution['t'] += float(item['total_amt'])
+        contribution['a'] += 1
+    if item['gst_amt'] is not None:
+        contribution['g'] += float(item['gst_amt'])
+    if item['vendor_id'] is not None:
+        vendor_id = str(item['vendor_id'])
+        contribution['v'][vendor_id] = contribution['v'].get(vendor_id, 0) + 1
+
+
+def _apply(state, vendor_deltas, contribution, sign):
+    """Add (sign=1) or subtract (sign=-1) a requisition contribution from the aggregates"""
+    state['total_invoices'] += sign
+    state['total_value'] += sign * contribution['t']
+    state['total_gst_value'] += sign * contribution['g']
+    state['amount_count'] += sign * contribution['a']
+    for vendor_id, count in contribution['v'].items():
+        vendor_deltas[vendor_id] = vendor_deltas.get(vendor_id, 0) + sign * count
+
+
+def _write_vendor_deltas(vendors_key, vendor_deltas):
+    """Apply vendor reference count changes, dropping vendors no longer referenced"""
+    changed = [(vendor_id, delta) for vendor_id, delta in vendor_deltas.items() if delta]
+    if not changed:
+        return
+
+    cache = frappe.cache()
+    pipe = cache.pipeline(transaction=False)
+    for vendor_id, delta in changed:
+        pipe.hincrby(vendors_key, vendor_id, delta)
+    counts = pipe.execute()
+
+    unreferenced = [vendor_id for (vendor_id, _delta), count in zip(changed, counts) if int(count) <= 0]
+    if unreferenced:
+        pipe.hdel(vendors_key, *unreferenced)
+        pipe.execute()
+
+
+def _stringify(value):
+    return str(value) if value is not None else None
+
+
+def _fetch_watermarks(cursor):
+    cursor.execute("SELECT MAX(id) as max_id, MAX(updated_at) as max_updated_at FROM purchase_requisitions")
+    row = cursor.fetchone() or {}
+    return row.get('max_id') or 0, _stringify(row.get('max_updated_at'))
+
+
+def _fetch_bounds(cursor):
+    cursor.execute(f"""
+        SELECT MIN(pr.created_at) as oldest, MAX(pr.created_at) as newest
+        FROM purchase_requisitions pr
+        WHERE {ACTIVE_CONDITION}
+    """)
+    row = cursor.fetchone() or {}
+    return _stringify(row.get('oldest')), _stringify(row.get('newest'))
+
+
+def rebuild_portal_statistics(connection_name):
+    """
+    Recompute every requisition contribution from scratch
+
+    Args:
+        connection_name (str): Active portal connection
+
+    Returns:
+        dict: New statistics state
+    """
+    keys = _keys(connection_name)
+    state = _empty_state(connection_name)
+
+    # Watermarks are taken before the scan; rows changing during it are
+    # picked up again by the next incremental refresh, which is idempotent
+    with get_external_db_connection(read_only=True) as conn:
+        with conn.cursor() as cursor:
+            state['max_id'], state['max_updated_at'] = _fetch_watermarks(cursor)
+
+    contributions = {}
+    rows = stream_portal_query(f"""
+        SELECT pr.id, pr.created_at, poi.id as item_id, poi.vendor_id, poi.total_amt, poi.gst_amt
+        FROM purchase_requisitions pr
+        LEFT JOIN purchase_order_items poi ON pr.id = poi.purchase_order_id
+        WHERE {ACTIVE_CONDITION}
+    """, read_only=True)
+
+    for row in rows:
+        contribution = contributions.get(row['id'])
+        if contribution is None:
+            contribution = contributions[row['id']] = _new_contribution(_stringify(row['created_at']))
+        _add_item(contribution, row)
+
+    vendor_counts = {}
+    for contribution in contributions.values():
+        _apply(state, vendor_counts, contribution, 1)
+
+    created = [c['c'] for c in contributions.values() if c['c']]
+    state['oldest_invoice'] = min(created) if created else None
+    state['newest_invoice'] = max(created) if created else None
+
+    cache = frappe.cache()
+    pipe = cache.pipeline(transaction=False)
+    pipe.delete(keys['rows'], keys['vendors'])
+    for index, (requisition_id, contribution) in enumerate(contributions.items(), 1):
+        pipe.hset(keys['rows'], requisition_id, json.dumps(contribution))
+        if index % ITEMS_BATCH_SIZE == 0:
+            pipe.execute()
+    for vendor_id, count in vendor_counts.items():
+        if count > 0:
+            pipe.hset(keys['vendors'], vendor_id, count)
+    pipe.execute()
+
+    state['refreshed_at'] = state['rebuilt_at'] = time.time()
+    cache.set_value(keys['state'], state)
+    frappe.logger().info(
+        f"Rebuilt portal statistics for {connection_name}: {state['total_invoices']} requisitions"
+    )
+    return state
+
+
+def _fetch_changed_requisitions(cursor, state):
+    """Requisitions past the id watermark or updated at/after the update watermark"""
+    cursor.execute(f"""
+        SELECT pr.id, pr.created_at, pr.updated_at, ({ACTIVE_CONDITION}) as is_active
+        FROM purchase_requisitions pr
+        WHERE pr.id > %s
+    """, (state['max_id'],))
+    changed = {row['id']: row for row in cursor.fetchall()}
+
+    if state['max_updated_at']:
+        cursor.execute(f"""
+            SELECT pr.id, pr.created_at, pr.updated_at, ({ACTIVE_CONDITION}) as is_active
+            FROM purchase_requisitions pr
+            WHERE pr.updated_at >= %s AND pr.id <= %s
+        """, (state['max_updated_at'], state['max_id']))
+        for row in cursor.fetchall():
+            changed[row['id']] = row
+
+    return changed
+
+
+def _fetch_contributions(cursor, requisitions):
+    """Contributions of the given active requisitions, one IN query per batch"""
+    contributions = {
+        requisition_id: _new_contribution(_stringify(row['created_at']))
+        for requisition_id, row in requisitions.items()
+    }
+    requisition_ids = list(contributions)
+
+    for i in range(0, len(requisition_ids), ITEMS_BATCH_SIZE):
+        batch = requisition_ids[i:i + ITEMS_BATCH_SIZE]
+        placeholders = ', '.join(['%s'] * len(batch))
+        cursor.execute(f"""
+            SELECT purchase_order_id, id as item_id, vendor_id, total_amt, gst_amt
+            FROM purchase_order_items
+            WHERE purchase_order_id IN ({placeholders})
+        """, batch)
+        for item in cursor.fetchall():
+            _add_item(contributions[item['purchase_order_id']], item)
+
+    return contributions
+
+
+def refresh_portal_statistics_incrementally(state):
+    """
+    Fold requisitions changed since the watermarks into the aggregates
+
+    Args:
+        state (dict): Current statistics state
+
+    Returns:
+        dict: Updated statistics state
+    """
+    keys = _keys(state['connection_name'])
+    cache = frappe.cache()
+
+    with get_external_db_connection(read_only=True) as conn:
+        with conn.cursor() as cursor:
+            changed = _fetch_changed_requisitions(cursor, state)
+            if not changed:
+                state['refreshed_at'] = time.time()
+                cache.set_value(keys['state'], state)
+                return state
+
+            requisition_ids = list(changed)
+            pipe = cache.pipeline(transaction=False)
+            pipe.hmget(keys['rows'], requisition_ids)
+            previous = {
+                requisition_id: json.loads(raw)
+                for requisition_id, raw in zip(requisition_ids, pipe.execute()[0])
+                if raw
+            }
+            contributions = _fetch_contributions(
+                cursor, {rid: row for rid, row in changed.items() if row['is_active']}
+            )
+
+            vendor_deltas = {}
+            bounds_dirty = False
+            for requisition_id, contribution in previous.items():
+                _apply(state, vendor_deltas, contribution, -1)
+                if contribution['c'] in (state['oldest_invoice'], state['newest_invoice']):
+                    bounds_dirty = True
+
+            for contribution in contributions.values():
+                _apply(state, vendor_deltas, contribution, 1)
+                if contribution['c']:
+                    if not state['oldest_invoice'] or contribution['c'] < state['oldest_invoice']:
+                        state['oldest_invoice'] = contribution['c']
+                    if not state['newest_invoice'] or contribution['c'] > state['newest_invoice']:
+                        state['newest_invoice'] = contribution['c']
+
+            if bounds_dirty:
+                state['oldest_invoice'], state['newest_invoice'] = _fetch_bounds(cursor)
+
+    pipe = cache.pipeline(transaction=False)
+    removed = [rid for rid in previous if rid not in contributions]
+    if removed:
+        pipe.hdel(keys['rows'], *removed)
+    for requisition_id, contribution in contributions.items():
+        pipe.hset(keys['rows'], requisition_id, json.dumps(contribution))
+    pipe.execute()
+    _write_vendor_deltas(keys['vendors'], vendor_deltas)
+
+    state['max_id'] = max([state['max_id']] + requisition_ids)
+    updated = [_stringify(row['updated_at']) for row in changed.values() if row['updated_at']]
+    if updated:
+        state['max_updated_at'] = max([state['max_updated_at'] or ''] + updated)
+    state['refreshed_at'] = time.time()
+    cache.set_value(keys['state'], state)
+    return state
+
+
+def refresh_portal_statistics(full=False):
+    """
+    Bring the cached statistics of the active connection up to date.
+    Only one refresh runs at a time per connection across all workers.
+
+    Args:
+        full (bool): Force a full rebuild instead of an incremental refresh
+
+    Returns:
+        dict: Statistics state, or None when another worker holds the refresh lock
+              and nothing is cached yet
+    """
+    connection_name = get_active_database_connection()['name']
+    keys = _keys(connection_name)
+    settings = get_statistics_settings()
+    cache = frappe.cache()
+
+    if not cache.set(cache.make_key(keys['lock']), 1, nx=True, ex=int(settings['portal_stats_lock_timeout'])):
+        return cache.get_value(keys['state'])
+
+    try:
+        state = cache.get_value(keys['state'])
+        full_refresh_due = not state or not state.get('rebuilt_at') or (
+            time.time() - state['rebuilt_at'] >= settings['portal_stats_full_refresh']
+        )
+        if full or full_refresh_due:
+            return rebuild_portal_statistics(connection_name)
+        return refresh_portal_statistics_incrementally(state)
+
+    finally:
+        cache.delete_value(keys['lock'])
+
+
+def format_statistics(state, stale=False):
+    """
+    Shape a statistics state like the listings' statistics dict
+
+    Args:
+        state (dict): Statistics state
+        stale (bool): Whether the state is past its TTL
+
+    Returns:
+        dict: Statistics
+    """
+    pipe = frappe.cache().pipeline(transaction=False)
+    pipe.hlen(_keys(state['connection_name'])['vendors'])
+    amount_count = state['amount_count']
+
+    return {
+        'total_invoices': state['total_invoices'],
+        'total_vendors': pipe.execute()[0],
+        'total_value': state['total_value'],
+        'total_gst_value': state['total_gst_value'],
+        'avg_invoice_value': state['total_value'] / amount_count if amount_count else 0.0,
+        'oldest_invoice': (state['oldest_invoice'] or '')[:10],
+        'newest_invoice': (state['newest_invoice'] or '')[:10],
+        'cached_at': state['refreshed_at'],
+        'stale': stale
+    }
+
+
+def get_portal_statistics(stale_ok=True):
+    """
+    Get statistics over active portal requisitions from the cache
+
+    Fresh results are returned as is. Past the TTL, stale_ok returns the cached
+    result immediately and revalidates in a background job; otherwise the
+    caller waits for an incremental refresh. With nothing cached yet the full
+    build is queued and empty statistics marked stale are returned, so no
+    request waits for a scan of the portal tables.
+
+    Args:
+        stale_ok (bool): Allow stale-while-revalidate
+
+    Returns:
+        dict: Statistics, see format_statistics()
+    """
+    connection_name = get_active_database_connection()['name']
+    state = frappe.cache().get_value(_keys(connection_name)['state'])
+
+    if state:
+        age = time.time() - (state['refreshed_at'] or 0)
+        if age < get_statistics_settings()['portal_stats_ttl']:
+            return format_statistics(state)
+
+        if frappe.utils.cint(stale_ok):
+            enqueue_refresh(connection_name)
+            return format_statistics(state, stale=True)
+
+        state = refresh_portal_statistics()
+        if state:
+            return format_statistics(state)
+    else:
+        # First build streams the whole join, so it runs on the long queue
+        enqueue_refresh(connection_name, queue='long')
+
+    return format_statistics(_empty_state(connection_name), stale=True)
+
+
+def enqueue_refresh(connection_name, queue='short'):
+    """
+    Queue a refresh of the cached statistics, at most one per connection
+
+    Args:
+        connection_name (str): Database Connection the statistics belong to
+        queue (str): RQ queue to run the refresh on
+    """
+    frappe.enqueue(
+        'o2o_erpnext.config.portal_statistics.refresh_portal_statistics',
+        queue=queue,
+        job_id=f"o2o_portal_statistics:{connection_name}",
+        deduplicate=True
+    )
+
+
+def scheduled_refresh():
+    """
+    Keep cached statistics warm between listing calls.
+    Called by the scheduler; does nothing until the statistics were used once.
+    """
+    connection_name = get_active_database_connection()['name']
+    if frappe.cache().get_value(_keys(connection_name)['state']):
+        refresh_portal_statistics()
+
+
+def clear_portal_statistics(connection_name=None):
+    """
+    Drop cached statistics so the next read rebuilds them
+
+    Args:
+        connection_name (str): Connection to clear, defaults to the active one
+    """
+    connection_name = connection_name or get_active_database_connection()['name']
+    keys = _keys(connection_name)
+    frappe.cache().delete_value(keys['state'])
+    pipe = frappe.cache().pipeline(transaction=False)
+    pipe.delete(keys['rows'], keys['vendors'])
+    pipe.execute()
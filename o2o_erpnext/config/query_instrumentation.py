@@ -0,0 +1,393 @@
+"""
+Portal Query Instrumentation Module
+Times every statement executed on a portal connection and aggregates rolling
+per-endpoint latency histograms in the site cache. Statements slower than the
+configured threshold are queued and written to the Portal Slow Query log by a
+scheduled job, so the portal call itself never waits on an ERPNext insert.
+"""
+
+import frappe
+import json
+import os
+import socket
+import sys
+import time
+
+import pymysql.cursors
+
+# Instrumentation defaults - each can be overridden in site_config.json
+DEFAULT_INSTRUMENTATION_SETTINGS = {
+    'portal_query_stats': 1,                 # Set to 0 to disable instrumentation
+    'portal_slow_query_threshold_ms': 1000,  # Statements at or above this are logged
+    'portal_query_stats_window': 60,         # Seconds per histogram window
+    'portal_query_stats_retention': 60       # Number of windows kept in the cache
+}
+
+# Upper bounds (ms) of the latency histogram buckets, +Inf is implied
+LATENCY_BUCKETS_MS = (5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000)
+
+STATS_CACHE_KEY = 'o2o_portal_query_stats'
+SLOW_QUERY_QUEUE_KEY = 'o2o_portal_slow_query_queue'
+SLOW_QUERY_QUEUE_MAX = 1000
+
+# Modules skipped when looking for the function that issued a query
+_INTERNAL_MODULE_PREFIXES = ('pymysql', 'contextlib', __name__,
+                             'o2o_erpnext.config.external_db_updated')
+
+_instrumented_classes = {}
+
+
+def get_instrumentation_settings():
+    """
+    Get instrumentation settings from site config, falling back to defaults
+
+    Returns:
+        dict: Instrumentation settings
+    """
+    conf = frappe.conf or {}
+    return {key: conf.get(key, default) for key, default in DEFAULT_INSTRUMENTATION_SETTINGS.items()}
+
+
+class _InstrumentedCursorMixin:
+    """Records every execute() of a buffered cursor"""
+
+    _o2o_context = None
+
+    def execute(self, query, args=None):
+        start = time.perf_counter()
+        try:
+            return super().execute(query, args)
+        finally:
+            self._o2o_record(query, time.perf_counter() - start)
+
+    def _o2o_record(self, query, elapsed):
+        record_query(self._o2o_context, query, elapsed, max(self.rowcount or 0, 0))
+
+
+class _InstrumentedUnbufferedMixin(_InstrumentedCursorMixin):
+    """
+    Records execute() of an unbuffered cursor once the stream is closed.
+    Wall time is the time to the first row; rows are counted as they are read.
+    """
+
+    _o2o_pending = None
+
+    def _o2o_record(self, query, elapsed):
+        self._o2o_flush()
+        self._o2o_pending = [query, elapsed, 0]
+
+    def read_next(self):
+        row = super().read_next()
+        if row is not None and self._o2o_pending:
+            self._o2o_pending[2] += 1
+        return row
+
+    def close(self):
+        self._o2o_flush()
+        super().close()
+
+    def _o2o_flush(self):
+        if self._o2o_pending:
+            query, elapsed, rows = self._o2o_pending
+            self._o2o_pending = None
+            record_query(self._o2o_context, query, elapsed, rows)
+
+
+def _instrumented_class(cursor_class):
+    """Get (and cache) the instrumented subclass of a pymysql cursor class"""
+    if cursor_class not in _instrumented_classes:
+        mixin = (_InstrumentedUnbufferedMixin
+                 if issubclass(cursor_class, pymysql.cursors.SSCursor)
+                 else _InstrumentedCursorMixin)
+        _instrumented_classes[cursor_class] = type(
+            f"Instrumented{cursor_class.__name__}", (mixin, cursor_class), {}
+        )
+    return _instrumented_classes[cursor_class]
+
+
+class InstrumentedConnection:
+    """
+    Thin proxy over a pymysql connection whose cursors record their statements.
+    Everything except cursor() is delegated to the wrapped connection.
+    """
+
+    def __init__(self, connection, context):
+        self._connection = connection
+        self._context = context
+
+    def cursor(self, cursor=None):
+        cursor_class = _instrumented_class(cursor or self._connection.cursorclass)
+        instance = self._connection.cursor(cursor_class)
+        instance._o2o_context = self._context
+        return instance
+
+    def __getattr__(self, name):
+        return getattr(self._connection, name)
+
+
+def instrument_connection(pooled, connection_name):
+    """
+    Wrap a pooled connection for the duration of one borrow
+
+    Args:
+        pooled (PooledConnection): Borrowed connection
+        connection_name (str): Pool the connection belongs to
+
+    Returns:
+        InstrumentedConnection or pymysql.Connection: Raw connection when disabled
+    """
+    if not get_instrumentation_settings()['portal_query_stats']:
+        return pooled.connection
+
+    return InstrumentedConnection(pooled.connection, {
+        'connection_name': connection_name,
+        'tunnel_reused': pooled.tunnel_reused,
+        'connection_reused': pooled.reused
+    })
+
+
+def record_query(context, query, elapsed, rows):
+    """
+    Record one executed statement
+
+    Args:
+        context (dict): Connection details captured at borrow time
+        query (str): Executed SQL (parameters are never recorded)
+        elapsed (float): Seconds spent in execute()
+        rows (int): Rows returned or affected
+    """
+    try:
+        settings = get_instrumentation_settings()
+        elapsed_ms = elapsed * 1000
+        caller = _get_calling_function()
+        endpoint = _get_endpoint(caller)
+
+        _record_histogram(endpoint, elapsed_ms, rows, context or {}, settings)
+
+        if elapsed_ms >= settings['portal_slow_query_threshold_ms']:
+            _queue_slow_query(endpoint, caller, query, elapsed_ms, rows, context or {})
+
+    except Exception:
+        # Instrumentation must never break a portal call
+        pass
+
+
+def _get_calling_function():
+    """Find the first frame outside pymysql and the portal plumbing"""
+    frame = sys._getframe(2)
+    while frame:
+        module = frame.f_globals.get('__name__', '')
+        if not module.startswith(_INTERNAL_MODULE_PREFIXES):
+            return f"{module}.{frame.f_code.co_name}"
+        frame = frame.f_back
+    return 'unknown'
+
+
+def _get_endpoint(caller):
+    """Whitelisted method or request path of the current request, else the calling function"""
+    form_dict = getattr(frappe.local, 'form_dict', None)
+    if form_dict and form_dict.get('cmd'):
+        return form_dict.get('cmd')
+
+    request = getattr(frappe.local, 'request', None)
+    if request is not None:
+        return request.path
+
+    return caller
+
+
+def _window_key(window):
+    return frappe.cache().make_key(f"{STATS_CACHE_KEY}:{window}")
+
+
+def _current_window(settings):
+    return int(time.time() // settings['portal_query_stats_window'])
+
+
+def _bucket_index(elapsed_ms):
+    for index, bound in enumerate(LATENCY_BUCKETS_MS):
+        if elapsed_ms <= bound:
+            return index
+    return len(LATENCY_BUCKETS_MS)
+
+
+def _record_histogram(endpoint, elapsed_ms, rows, context, settings):
+    """Increment the endpoint's counters in the current window with one round trip"""
+    key = _window_key(_current_window(settings))
+    ttl = settings['portal_query_stats_window'] * (settings['portal_query_stats_retention'] + 1)
+
+    pipe = frappe.cache().pipeline(transaction=False)
+    pipe.hincrby(key, f"{endpoint}|count", 1)
+    pipe.hincrbyfloat(key, f"{endpoint}|sum_ms", round(elapsed_ms, 3))
+    pipe.hincrby(key, f"{endpoint}|rows", int(rows or 0))
+    pipe.hincrby(key, f"{endpoint}|b{_bucket_index(elapsed_ms)}", 1)
+    if context.get('tunnel_reused'):
+        pipe.hincrby(key, f"{endpoint}|tunnel_reused", 1)
+    if context.get('connection_reused'):
+        pipe.hincrby(key, f"{endpoint}|connection_reused", 1)
+    pipe.expire(key, ttl)
+    pipe.execute()
+
+
+def _queue_slow_query(endpoint, caller, query, elapsed_ms, rows, context):
+    """Push a slow statement onto the bounded cache queue drained by flush_slow_queries()"""
+    entry = json.dumps({
+        'endpoint': endpoint[:140],
+        'calling_function': caller[:140],
+        'query': ' '.join(str(query).split())[:5000],
+        'duration_ms': round(elapsed_ms, 2),
+        'rows_returned': int(rows or 0),
+        'connection_name': context.get('connection_name'),
+        'tunnel_reused': 1 if context.get('tunnel_reused') else 0,
+        'connection_reused': 1 if context.get('connection_reused') else 0,
+        'worker': f"{socket.gethostname()}:{os.getpid()}",
+        'executed_at': str(frappe.utils.now_datetime())
+    })
+
+    key = frappe.cache().make_key(SLOW_QUERY_QUEUE_KEY)
+    pipe = frappe.cache().pipeline(transaction=False)
+    pipe.lpush(key, entry)
+    pipe.ltrim(key, 0, SLOW_QUERY_QUEUE_MAX - 1)
+    pipe.execute()
+
+
+def flush_slow_queries(limit=500):
+    """
+    Move queued slow statements into the Portal Slow Query log.
+    Called by the scheduler.
+
+    Args:
+        limit (int): Maximum entries written per run
+
+    Returns:
+        int: Number of entries written
+    """
+    # Same made key as _queue_slow_query(); the wrapper's rpop() would prefix it again
+    key = frappe.cache().make_key(SLOW_QUERY_QUEUE_KEY)
+    written = 0
+
+    while written < limit:
+        pipe = frappe.cache().pipeline(transaction=False)
+        pipe.rpop(key)
+        raw = pipe.execute()[0]
+        if not raw:
+            break
+
+        try:
+            entry = json.loads(frappe.safe_decode(raw))
+            frappe.get_doc({'doctype': 'Portal Slow Query', **entry}).insert(ignore_permissions=True)
+            written += 1
+        except Exception as e:
+            frappe.logger().error(f"Could not log slow portal query: {str(e)}")
+
+    if written:
+        frappe.db.commit()
+
+    return written
+
+
+def get_query_stats(minutes=15):
+    """
+    Aggregate the per-endpoint histograms over the last N minutes
+
+    Args:
+        minutes (int): Size of the rolling window
+
+    Returns:
+        dict: Stats per endpoint, sorted by total time spent
+    """
+    settings = get_instrumentation_settings()
+    window_seconds = settings['portal_query_stats_window']
+    windows = max(1, min(int(int(minutes) * 60 // window_seconds), settings['portal_query_stats_retention']))
+    current = _current_window(settings)
+
+    pipe = frappe.cache().pipeline(transaction=False)
+    for window in range(current - windows + 1, current + 1):
+        pipe.hgetall(_window_key(window))
+
+    totals = {}
+    for window_data in pipe.execute():
+        for field, value in (window_data or {}).items():
+            endpoint, metric = frappe.safe_decode(field).rsplit('|', 1)
+            counters = totals.setdefault(endpoint, {})
+            counters[metric] = counters.get(metric, 0) + float(value)
+
+    stats = {}
+    for endpoint, counters in totals.items():
+        count = int(counters.get('count', 0))
+        if not count:
+            continue
+
+        buckets = [int(counters.get(f"b{i}", 0)) for i in range(len(LATENCY_BUCKETS_MS) + 1)]
+        stats[endpoint] = {
+            'count': count,
+            'total_ms': round(counters.get('sum_ms', 0), 2),
+            'avg_ms': round(counters.get('sum_ms', 0) / count, 2),
+            'p50_ms': _estimate_percentile(buckets, count, 0.50),
+            'p95_ms': _estimate_percentile(buckets, count, 0.95),
+            'p99_ms': _estimate_percentile(buckets, count, 0.99),
+            'rows': int(counters.get('rows', 0)),
+            'tunnel_reuse_ratio': round(counters.get('tunnel_reused', 0) / count, 3),
+            'connection_reuse_ratio': round(counters.get('connection_reused', 0) / count, 3),
+            'buckets': buckets
+        }
+
+    return dict(sorted(stats.items(), key=lambda item: item[1]['total_ms'], reverse=True))
+
+
+def _estimate_percentile(buckets, count, quantile):
+    """Upper bound of the bucket holding the requested quantile (None means above the last bound)"""
+    target = quantile * count
+    seen = 0
+    for index, bucket_count in enumerate(buckets):
+        seen += bucket_count
+        if seen >= target:
+            return LATENCY_BUCKETS_MS[index] if index < len(LATENCY_BUCKETS_MS) else None
+    return None
+
+
+def render_prometheus(minutes=15):
+    """
+    Render the rolling stats in Prometheus text exposition format
+
+    Values cover the last N minutes rather than process lifetime, so every
+    series is exposed as a gauge; histogram_quantile() still works on the
+    cumulative le buckets.
+
+    Args:
+        minutes (int): Size of the rolling window
+
+    Returns:
+        str: Exposition text
+    """
+    stats = get_query_stats(minutes)
+
+    lines = [
+        f"# HELP o2o_portal_query_duration_ms Portal query latency over the last {minutes} minutes",
+        "# TYPE o2o_portal_query_duration_ms gauge"
+    ]
+    for endpoint, data in stats.items():
+        label = _prometheus_label(endpoint)
+        cumulative = 0
+        for index, bucket_count in enumerate(data['buckets']):
+            cumulative += bucket_count
+            bound = LATENCY_BUCKETS_MS[index] if index < len(LATENCY_BUCKETS_MS) else '+Inf'
+            lines.append(f'o2o_portal_query_duration_ms_bucket{{endpoint="{label}",le="{bound}"}} {cumulative}')
+        lines.append(f'o2o_portal_query_duration_ms_sum{{endpoint="{label}"}} {data["total_ms"]}')
+        lines.append(f'o2o_portal_query_duration_ms_count{{endpoint="{label}"}} {data["count"]}')
+
+    for metric, key, help_text in (
+        ('o2o_portal_query_rows', 'rows', 'Rows returned or affected by portal queries'),
+        ('o2o_portal_tunnel_reuse_ratio', 'tunnel_reuse_ratio', 'Share of portal queries on an already open SSH tunnel'),
+        ('o2o_portal_connection_reuse_ratio', 'connection_reuse_ratio', 'Share of portal queries on a pooled connection')
+    ):
+        lines.append(f"# HELP {metric} {help_text}")
+        lines.append(f"# TYPE {metric} gauge")
+        for endpoint, data in stats.items():
+            lines.append(f'{metric}{{endpoint="{_prometheus_label(endpoint)}"}} {data[key]}')
+
+    return '\n'.join(lines) + '\n'
+
+
+def _prometheus_label(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
@@ -13,7 +13,16 @@ import threading
 
 # Global registry to store active tunnels
 _active_tunnels = {}
-_tunnel_lock = threading.Lock()
+# Re-entrant: status helpers are called while the registry lock is already held.
+# Guards the registry only; nothing slow (SSH handshakes) runs under it
+_tunnel_lock = threading.RLock()
+# One lock per connection name, serialising tunnel starts for that connection only
+_tunnel_start_locks = {}
+
+
+def _get_start_lock(connection_name):
+    with _tunnel_lock:
+        return _tunnel_start_locks.setdefault(connection_name, threading.Lock())
 
 
 class SSHTunnelManager:
@@ -300,6 +309,129 @@ class SSHTunnelManager:
                 'db_port': tunnel_info.get('db_port')
             }
     
+    @staticmethod
+    def ensure_tunnel(config, timeout=None):
+        """
+        Get a live local port for a resolved connection config, starting and
+        registering a tunnel only when no active one exists for it.
+        Used on the hot path by the portal connection pool, so it does not
+        write connection status back to the Database Connection document.
+        
+        Args:
+            config (dict): Resolved configuration from get_active_database_connection()
+            timeout (float): Optional cap on the SSH handshake when a tunnel has to be started
+            
+        Returns:
+            tuple: (local_port, reused) - reused is True when an existing tunnel was used
+        """
+        connection_name = config['name']
+        
+        local_port = SSHTunnelManager._get_live_port(connection_name)
+        if local_port:
+            return local_port, True
+        
+        # Starts for other connections, and lookups of live tunnels, are not blocked
+        # while this one connects; concurrent callers for this connection wait for it
+        with _get_start_lock(connection_name):
+            local_port = SSHTunnelManager._get_live_port(connection_name)
+            if local_port:
+                return local_port, True
+            
+            ssh_key_path = config['ssh_key_file']
+            if not ssh_key_path or not os.path.exists(ssh_key_path):
+                raise FileNotFoundError(f"SSH key not found: {ssh_key_path}")
+            
+            # Check file permissions
+            file_stat = os.stat(ssh_key_path)
+            if oct(file_stat.st_mode)[-3:] != '600':
+                frappe.logger().warning(f"SSH key has incorrect permissions: {ssh_key_path}")
+            
+            # Replica configs bind to the replica host instead of MySQL on the SSH host
+            db_host = config.get('tunnel_remote_host') or '127.0.0.1'
+            db_port = config.get('tunnel_remote_port') or 3306
+            
+            tunnel = SSHTunnelForwarder(
+                (config['ssh_host'], config['ssh_port']),
+                ssh_username=config['ssh_username'],
+                ssh_pkey=ssh_key_path,
+                remote_bind_address=(db_host, db_port),
+                local_bind_address=('127.0.0.1', 0),  # Use random available port
+                set_keepalive=float((frappe.conf or {}).get('portal_tunnel_keepalive', 30)),
+                gateway_timeout=timeout
+            )
+            tunnel.start()
+            local_port = tunnel.local_bind_port
+            
+            with _tunnel_lock:
+                _active_tunnels[connection_name] = {
+                    'tunnel': tunnel,
+                    'connection_name': connection_name,
+                    'local_port': local_port,
+                    'started_at': datetime.now(),
+                    'ssh_host': config['ssh_host'],
+                    'ssh_port': config['ssh_port'],
+                    'db_host': db_host,
+                    'db_port': db_port
+                }
+            
+            frappe.logger().info(f"SSH tunnel established for {connection_name} on local port: {local_port}")
+            return local_port, False
+    
+    @staticmethod
+    def _get_live_port(connection_name):
+        """Local port of the registered tunnel if it is active, dropping it from the registry when dead"""
+        with _tunnel_lock:
+            tunnel_info = _active_tunnels.get(connection_name)
+            if not tunnel_info:
+                return None
+            if tunnel_info['tunnel'].is_active:
+                return tunnel_info['local_port']
+            del _active_tunnels[connection_name]
+        
+        # Stopping may wait on the forwarder's threads, so it runs outside the lock
+        try:
+            tunnel_info['tunnel'].stop()
+        except Exception:
+            pass
+        return None
+    
+    @staticmethod
+    def probe_tunnel(connection_name):
+        """
+        Check a registered tunnel end to end, dropping it from the registry when dead.
+        Opens a test connection through the forwarder, which also keeps it warm.
+        
+        Args:
+            connection_name (str): Registry key of the tunnel
+            
+        Returns:
+            int: Local port of the live tunnel, or None if missing/dead
+        """
+        with _tunnel_lock:
+            tunnel_info = _active_tunnels.get(connection_name)
+        
+        if not tunnel_info:
+            return None
+        
+        tunnel = tunnel_info['tunnel']
+        try:
+            # Probe outside the lock so hot-path lookups are not blocked
+            tunnel.check_tunnels()
+            alive = tunnel.is_active and all(tunnel.tunnel_is_up.values())
+        except Exception:
+            alive = False
+        
+        if alive:
+            return tunnel_info['local_port']
+        
+        with _tunnel_lock:
+            # Only clean up if nobody replaced it meanwhile
+            if _active_tunnels.get(connection_name) is tunnel_info:
+                SSHTunnelManager._cleanup_tunnel(connection_name)
+        
+        frappe.logger().warning(f"SSH tunnel for {connection_name} is down")
+        return None
+    
     @staticmethod
     def _cleanup_tunnel(connection_name):
         """Internal method to cleanup a dead tunnel"""
@@ -0,0 +1,222 @@
+"""
+SSH Tunnel Supervisor Module
+Background thread per worker process that keeps portal SSH tunnels warm
+
+- Pre-warms tunnels for the active Database Connection (and its read replica)
+  as soon as the worker serves its first request
+- Probes each tunnel on an interval, which also acts as a keepalive
+- Restarts dropped tunnels with exponential backoff
+- Publishes per-worker tunnel health to the site cache
+"""
+
+import frappe
+import os
+import socket
+import threading
+import time
+
+from o2o_erpnext.config.ssh_tunnel_manager import SSHTunnelManager
+
+# Supervisor defaults - each can be overridden in site_config.json
+DEFAULT_SUPERVISOR_SETTINGS = {
+    'portal_tunnel_supervisor': 1,           # Set to 0 to disable the supervisor
+    'portal_tunnel_supervisor_interval': 30,  # Seconds between health checks
+    'portal_tunnel_backoff_base': 5,          # First restart retry delay in seconds
+    'portal_tunnel_backoff_max': 300          # Upper bound for the retry delay
+}
+
+TUNNEL_HEALTH_CACHE_KEY = 'o2o_portal_tunnel_health'
+
+# Supervisors of this process keyed by site
+_supervisors = {}
+_supervisors_lock = threading.Lock()
+
+
+def get_supervisor_settings():
+    """
+    Get supervisor settings from site config, falling back to defaults
+
+    Returns:
+        dict: Supervisor settings
+    """
+    conf = frappe.conf or {}
+    return {key: conf.get(key, default) for key, default in DEFAULT_SUPERVISOR_SETTINGS.items()}
+
+
+def get_worker_id():
+    """Identify this worker process in published health"""
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+class TunnelSupervisor(threading.Thread):
+    """Daemon thread that supervises the portal tunnels of one site"""
+
+    def __init__(self, site, sites_path):
+        super().__init__(name=f"o2o-tunnel-supervisor-{site}", daemon=True)
+        self.site = site
+        self.sites_path = sites_path
+        self.pid = os.getpid()
+        self._stop_event = threading.Event()
+        # connection name -> (consecutive failures, next attempt timestamp)
+        self._backoff = {}
+
+    def stop(self):
+        self._stop_event.set()
+
+    def run(self):
+        while not self._stop_event.is_set():
+            interval = DEFAULT_SUPERVISOR_SETTINGS['portal_tunnel_supervisor_interval']
+            try:
+                frappe.init(site=self.site, sites_path=self.sites_path)
+                frappe.connect()
+                settings = get_supervisor_settings()
+                interval = settings['portal_tunnel_supervisor_interval']
+                if not settings['portal_tunnel_supervisor']:
+                    break
+                self.check_tunnels(settings)
+            except Exception as e:
+                try:
+                    frappe.logger().error(f"Tunnel supervisor error on {self.site}: {str(e)}")
+                except Exception:
+                    pass
+            finally:
+                frappe.destroy()
+
+            self._stop_event.wait(interval)
+
+    def check_tunnels(self, settings):
+        """Probe every supervised tunnel once, restarting dead ones"""
+        for config in get_supervised_configs():
+            self.supervise(config, settings)
+
+    def supervise(self, config, settings):
+        """
+        Probe one tunnel and restart it when down, respecting the backoff
+
+        Args:
+            config (dict): Resolved connection configuration with ssh_tunnel set
+            settings (dict): Supervisor settings
+        """
+        connection_name = config['name']
+        now = time.time()
+
+        local_port = SSHTunnelManager.probe_tunnel(connection_name)
+        if local_port:
+            self._backoff.pop(connection_name, None)
+            publish_health(connection_name, 'up', local_port=local_port)
+            return
+
+        failures, next_attempt = self._backoff.get(connection_name, (0, 0))
+        if now < next_attempt:
+            publish_health(connection_name, 'down', failures=failures, next_retry=next_attempt)
+            return
+
+        try:
+            local_port, _reused = SSHTunnelManager.ensure_tunnel(config)
+            self._backoff.pop(connection_name, None)
+            frappe.logger().info(
+                f"Tunnel supervisor {'restarted' if failures else 'warmed'} {connection_name} on port {local_port}"
+            )
+            publish_health(connection_name, 'up', local_port=local_port)
+
+        except Exception as e:
+            failures += 1
+            delay = min(settings['portal_tunnel_backoff_base'] * 2 ** (failures - 1),
+                        settings['portal_tunnel_backoff_max'])
+            self._backoff[connection_name] = (failures, now + delay)
+            frappe.logger().error(
+                f"Tunnel supervisor could not start {connection_name} "
+                f"(attempt {failures}, retry in {delay}s): {str(e)}"
+            )
+            publish_health(connection_name, 'down', failures=failures,
+                           next_retry=now + delay, error=str(e))
+
+
+def get_supervised_configs():
+    """
+    Get the tunnelled connection configs that should be kept warm
+
+    Returns:
+        list: Resolved configs for the active connection and its read replica
+    """
+    from o2o_erpnext.config.external_db_updated import (
+        get_active_database_connection,
+        get_replica_database_connection
+    )
+
+    config = get_active_database_connection()
+    if not config.get('ssh_tunnel'):
+        return []
+
+    configs = [config]
+    replica = get_replica_database_connection(config)
+    if replica:
+        configs.append(replica)
+    return configs
+
+
+def publish_health(connection_name, status, local_port=None, failures=0, next_retry=None, error=None):
+    """
+    Publish this worker's view of a tunnel to the site cache
+
+    Args:
+        connection_name (str): Tunnel registry key
+        status (str): 'up' or 'down'
+    """
+    frappe.cache().hset(TUNNEL_HEALTH_CACHE_KEY, f"{get_worker_id()}:{connection_name}", {
+        'worker': get_worker_id(),
+        'connection_name': connection_name,
+        'status': status,
+        'local_port': local_port,
+        'failures': failures,
+        'next_retry': next_retry,
+        'error': error[:200] if error else None,
+        'checked_at': time.time()
+    })
+
+
+def get_tunnel_health():
+    """
+    Get tunnel health published by all workers of this site
+
+    Returns:
+        list: Health dicts, newest check first
+    """
+    health = frappe.cache().hgetall(TUNNEL_HEALTH_CACHE_KEY) or {}
+    return sorted(health.values(), key=lambda h: h.get('checked_at') or 0, reverse=True)
+
+
+def ensure_supervisor():
+    """
+    Start the supervisor for the current site if this process has none yet.
+    Hooked on before_request, so it must stay cheap on the hot path.
+    """
+    site = getattr(frappe.local, 'site', None)
+    if not site:
+        return
+
+    supervisor = _supervisors.get(site)
+    if supervisor and supervisor.is_alive() and supervisor.pid == os.getpid():
+        return
+
+    if not get_supervisor_settings()['portal_tunnel_supervisor']:
+        return
+
+    with _supervisors_lock:
+        supervisor = _supervisors.get(site)
+        if supervisor and supervisor.is_alive() and supervisor.pid == os.getpid():
+            return
+
+        supervisor = TunnelSupervisor(site, frappe.local.sites_path)
+        _supervisors[site] = supervisor
+        supervisor.start()
+
+
+def stop_all_supervisors():
+    """Stop every supervisor thread in this process"""
+    with _supervisors_lock:
+        supervisors = list(_supervisors.values())
+        _supervisors.clear()
+
+    for supervisor in supervisors:
+        supervisor.stop()
@@ -152,8 +152,18 @@ override_doctype_class = {
 # Scheduled Tasks
 # ---------------
 
-# Scheduled Tasks
-# ---------------
+scheduler_events = {
+    "cron": {
+        "*/5 * * * *": [
+            "o2o_erpnext.config.query_instrumentation.flush_slow_queries",
+            "o2o_erpnext.config.portal_statistics.scheduled_refresh",
+            "o2o_erpnext.api.invoice_number_allocator.reclaim_invoice_number_gaps"
+        ],
+        "* * * * *": [
+            "o2o_erpnext.sync.portal_outbox.dispatch_portal_outbox"
+        ]
+    }
+}
 
 
 
@@ -187,7 +197,8 @@ override_doctype_class = {
 
 # Request Events
 # ----------------
-# before_request = ["o2o_erpnext.utils.before_request"]
+# Starts the per-worker SSH tunnel supervisor on the first request
+before_request = ["o2o_erpnext.config.tunnel_supervisor.ensure_supervisor"]
 # after_request = ["o2o_erpnext.utils.after_request"]
 
 # Job Events
@@ -229,9 +240,9 @@ override_doctype_class = {
 # Automatically update python controller files with type annotations for this app.
 # export_python_type_annotations = True
 
-# default_log_clearing_doctypes = {
-# 	"Logging DocType Name": 30  # days to retain logs
-# }
+default_log_clearing_doctypes = {
+    "Portal Slow Query": 30  # days to retain logs
+}
 
 fixtures = [
     #"Role",
@@ -329,7 +340,9 @@ doctype_list_js = {
 # Commands
 # --------
 commands = [
-    "o2o_erpnext.commands.test_connection"
+    "o2o_erpnext.commands.test_connection",
+    "o2o_erpnext.commands.portal_indexes",
+    "o2o_erpnext.commands.invoice_counter"
 ]
 
 # Reports
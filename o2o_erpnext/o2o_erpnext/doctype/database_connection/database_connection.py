@@ -1,9 +1,27 @@
 # Copyright (c) 2025, Ascratech LLP and contributors
 # For license information, please see license.txt
 
-# import frappe
+import frappe
 from frappe.model.document import Document
 
+from o2o_erpnext.config.connection_pool import close_pool
+from o2o_erpnext.config.external_db_updated import (
+	clear_active_connection_cache,
+	get_replica_connection_name,
+)
+
 
 class DatabaseConnection(Document):
-	pass
+	def on_update(self):
+		self.clear_connection_cache()
+
+	def on_trash(self):
+		self.clear_connection_cache()
+
+	def clear_connection_cache(self):
+		# Cached config and pooled sessions may hold the old credentials
+		clear_active_connection_cache(self.name)
+		close_pool(self.name)
+		close_pool(get_replica_connection_name(self.name))
+		# A concurrent request may re-cache the old row before this transaction commits
+		frappe.db.after_commit.add(lambda: clear_active_connection_cache(self.name))
@@ -0,0 +1,32 @@
+// Copyright (c) 2026, Ascratech LLP and contributors
+// For license information, please see license.txt
+
+frappe.ui.form.on('Portal Import Job', {
+    refresh: function(frm) {
+        if (!frm.doc.__islocal && ['Queued', 'Running', 'Failed'].includes(frm.doc.status)) {
+            frm.add_custom_button(__('Resume'), function() {
+                frappe.call({
+                    method: 'o2o_erpnext.api.portal_import_jobs.resume_portal_import_job',
+                    args: { job_name: frm.doc.name },
+                    callback: function(r) {
+                        if (r.message) {
+                            frappe.show_alert({
+                                message: r.message.message,
+                                indicator: r.message.success ? 'green' : 'red'
+                            }, 5);
+                            frm.reload_doc();
+                        }
+                    }
+                });
+            });
+        }
+    },
+
+    onload: function(frm) {
+        frappe.realtime.on('portal_import_job_progress', function(data) {
+            if (data.job === frm.doc.name && !frm.is_dirty()) {
+                frm.reload_doc();
+            }
+        });
+    }
+});
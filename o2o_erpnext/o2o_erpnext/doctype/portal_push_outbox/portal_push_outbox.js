@@ -0,0 +1,24 @@
+// Copyright (c) 2026, Ascratech LLP and contributors
+// For license information, please see license.txt
+
+frappe.ui.form.on('Portal Push Outbox', {
+    refresh: function(frm) {
+        if (frm.doc.status === 'Failed') {
+            frm.add_custom_button(__('Retry'), function() {
+                frappe.call({
+                    method: 'o2o_erpnext.sync.portal_outbox.retry_outbox_entry',
+                    args: { name: frm.doc.name },
+                    callback: function(r) {
+                        if (r.message) {
+                            frappe.show_alert({
+                                message: r.message.message,
+                                indicator: r.message.success ? 'green' : 'red'
+                            }, 5);
+                            frm.reload_doc();
+                        }
+                    }
+                });
+            });
+        }
+    }
+});
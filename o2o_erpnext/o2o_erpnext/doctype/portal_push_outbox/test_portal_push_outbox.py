@@ -0,0 +1,9 @@
+# Copyright (c) 2026, Ascratech LLP and Contributors
+# See license.txt
+
+# import frappe
+from frappe.tests.utils import FrappeTestCase
+
+
+class TestPortalPushOutbox(FrappeTestCase):
+	pass
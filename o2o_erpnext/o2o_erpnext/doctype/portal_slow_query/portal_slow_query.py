@@ -0,0 +1,15 @@
+# Copyright (c) 2026, Ascratech LLP and contributors
+# For license information, please see license.txt
+
+import frappe
+from frappe.model.document import Document
+from frappe.query_builder import Interval
+from frappe.query_builder.functions import Now
+
+
+class PortalSlowQuery(Document):
+	@staticmethod
+	def clear_old_logs(days=30):
+		"""Used by Log Settings to prune old entries"""
+		table = frappe.qb.DocType("Portal Slow Query")
+		frappe.db.delete(table, filters=(table.creation < (Now() - Interval(days=days))))
@@ -0,0 +1,41 @@
+# Copyright (c) 2026, Ascratech LLP and Contributors
+# See license.txt
+
+import frappe
+from frappe.tests.utils import FrappeTestCase
+
+from o2o_erpnext.config.query_instrumentation import (
+	SLOW_QUERY_QUEUE_KEY,
+	_queue_slow_query,
+	flush_slow_queries,
+)
+
+
+class TestPortalSlowQuery(FrappeTestCase):
+	def setUp(self):
+		self.clear_queue()
+
+	def tearDown(self):
+		self.clear_queue()
+
+	def clear_queue(self):
+		pipe = frappe.cache().pipeline(transaction=False)
+		pipe.delete(frappe.cache().make_key(SLOW_QUERY_QUEUE_KEY))
+		pipe.execute()
+
+	def test_flush_writes_queued_slow_query(self):
+		_queue_slow_query(
+			"test_endpoint",
+			"test_portal_slow_query.caller",
+			"SELECT SLEEP(1)",
+			1234.5,
+			1,
+			{"connection_name": "Test Connection"},
+		)
+
+		self.assertEqual(flush_slow_queries(), 1)
+		self.assertTrue(
+			frappe.db.exists("Portal Slow Query", {"endpoint": "test_endpoint", "duration_ms": 1234.5})
+		)
+		# Drained: a second run has nothing to write
+		self.assertEqual(flush_slow_queries(), 0)
@@ -66,7 +66,7 @@ class CustomPurchaseInvoice(PurchaseInvoice):
                 financial_year = f"{fy_start:02d}-{fy_end:02d}"
             
             # Get next invoice code from remote database counter
-            next_invoice_code = creator.get_next_invoice_code('AGO2O', financial_year)
+            next_invoice_code = creator.get_next_invoice_code('AGO2O', financial_year, fast_fail=True)
             
             # Set the document name
             self.name = next_invoice_code
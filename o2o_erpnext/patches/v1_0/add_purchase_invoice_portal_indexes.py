@@ -0,0 +1,15 @@
+import frappe
+
+
+def execute():
+	"""
+	Index the Purchase Invoice columns used to detect already imported portal invoices.
+
+	Imports resolve existing invoices by title (portal invoice number) and by
+	custom_portal_invoice_id; without these indexes every lookup scans the table.
+	"""
+	frappe.db.add_index("Purchase Invoice", ["title"], "portal_title_index")
+
+	# Custom field, only present when the portal import fields were set up
+	if frappe.db.has_column("Purchase Invoice", "custom_portal_invoice_id"):
+		frappe.db.add_index("Purchase Invoice", ["custom_portal_invoice_id"], "portal_invoice_id_index")
@@ -0,0 +1,17 @@
+import frappe
+
+
+def execute():
+	"""
+	Bootstrap the portal invoice counter of the current financial year.
+
+	Moves table creation and the counter backfill off the naming path. A portal
+	that is not reachable during migrate is bootstrapped by the first lease.
+	"""
+	from o2o_erpnext.api.invoice_number_allocator import bootstrap_invoice_counter
+	from o2o_erpnext.api.remote_naming_series import get_current_financial_year
+
+	try:
+		bootstrap_invoice_counter("AGO2O", get_current_financial_year())
+	except Exception as e:
+		frappe.log_error(f"Invoice counter bootstrap skipped: {str(e)}", "Invoice Counter Bootstrap")
@@ -31,9 +31,42 @@ frappe.listview_settings['Purchase Invoice'] = {
         }, 600);
         
         console.log("Portal Sync Tools dropdown and Print buttons setup complete");
+    },
+
+    refresh: function(listview) {
+        flag_remote_duplicates(listview);
     }
 };
 
+// Flag draft invoices that already exist in the portal (one call per list refresh)
+function flag_remote_duplicates(listview) {
+    let drafts = (listview.data || []).filter(row => row.docstatus === 0).map(row => row.name);
+    if (!drafts.length) {
+        return;
+    }
+
+    frappe.call({
+        method: 'o2o_erpnext.api.purchase_invoice_controller.check_remote_duplicates',
+        args: { names: drafts },
+        callback: function(r) {
+            if (!r.message || !r.message.success) {
+                return;
+            }
+
+            $.each(r.message.duplicates, function(name, matches) {
+                let $row = listview.$result.find(`.list-row-checkbox[data-name="${CSS.escape(name)}"]`).closest('.list-row');
+                let portal_ids = Object.values(matches).map(match => match.portal_id).join(', ');
+                $row.find('.portal-duplicate-flag').remove();
+                $row.find('.list-subject').append(
+                    `<span class="portal-duplicate-flag indicator-pill red" title="${__('Already in portal (ID {0})', [portal_ids])}">
+                        ${__('Portal Duplicate')}
+                    </span>`
+                );
+            });
+        }
+    });
+}
+
 function add_portal_sync_dropdown(listview) {
     console.log("🔧 Adding Portal Sync Tools dropdown");
     
@@ -639,58 +672,67 @@ window.batch_import_invoices = function() {
             
             import_progress_dialog.show();
             
-            // Simulate import progress
-            let import_progress = 0;
             const import_progress_bar = import_progress_dialog.$wrapper.find('#import-progress-bar');
             const import_progress_status = import_progress_dialog.$wrapper.find('#import-progress-status');
             const import_progress_details = import_progress_dialog.$wrapper.find('#import-progress-details');
+            let import_job = null;
             
-            // Step 1: Preparing
-            setTimeout(() => {
-                import_progress = 20;
-                import_progress_bar.css('width', import_progress + '%');
-                import_progress_status.text('Fetching portal data...');
-                import_progress_details.text('Retrieving invoices from PHP portal...');
-            }, 300);
+            // Progress is pushed by the background chunks as they commit
+            const on_import_progress = function(data) {
+                if (!import_job || data.job !== import_job) return;
+                
+                import_progress_bar.css('width', data.percent + '%');
+                import_progress_status.text(__('Imported {0}, skipped {1}, errors {2}', 
+                    [data.imported_count, data.skipped_count, data.error_count]));
+                import_progress_details.text(__('{0} of {1} chunks completed ({2})', 
+                    [data.chunks_completed, data.chunks_total, import_job]));
+                
+                if (['Completed', 'Completed with Errors', 'Failed'].includes(data.status)) {
+                    frappe.realtime.off('portal_import_job_progress', on_import_progress);
+                    
+                    setTimeout(() => {
+                        import_progress_dialog.hide();
+                        frappe.show_alert({
+                            message: __('Import {0}: {1} imported, {2} skipped, {3} errors', 
+                                [data.status, data.imported_count, data.skipped_count, data.error_count]),
+                            indicator: data.error_count || data.status === 'Failed' ? 'orange' : 'green'
+                        }, 8);
+                        if (cur_list) cur_list.refresh();
+                    }, 1000);
+                }
+            };
+            frappe.realtime.on('portal_import_job_progress', on_import_progress);
             
-            // Step 2: Processing
-            setTimeout(() => {
-                import_progress = 60;
-                import_progress_bar.css('width', import_progress + '%');
-                import_progress_status.text('Processing invoices...');
-                import_progress_details.text('Creating Purchase Invoice records...');
-            }, 1000);
+            import_progress_status.text(__('Queuing import...'));
+            import_progress_details.text(__('Selecting portal invoices...'));
             
-            // Call the actual batch import API
+            // Queue the import as a background Portal Import Job
             frappe.call({
                 method: 'o2o_erpnext.api.php_portal_invoices.batch_import_invoices',
-                args: values,
+                args: Object.assign({}, values, { background: 1 }),
                 callback: function(r) {
-                    // Complete progress
-                    import_progress = 100;
-                    import_progress_bar.css('width', import_progress + '%');
-                    import_progress_status.text('Import Complete!');
-                    import_progress_details.text('Successfully processed all invoices');
-                    
-                    setTimeout(() => {
-                        import_progress_dialog.hide();
+                    if (r.message && r.message.success && r.message.job) {
+                        import_job = r.message.job;
+                        import_progress_status.text(__('Import queued'));
+                        import_progress_details.text(r.message.message);
                         
-                        if (r.message && r.message.success) {
-                            frappe.show_alert({
-                                message: __('Successfully imported {0} invoices', [r.message.imported_count]),
-                                indicator: 'green'
-                            }, 5);
-                            if (cur_list) cur_list.refresh();
-                        } else {
-                            frappe.msgprint({
-                                title: __('Import Failed'),
-                                message: r.message ? r.message.message : __('Unknown error occurred'),
-                                indicator: 'red'
-                            });
+                        if (!r.message.total_invoices) {
+                            frappe.realtime.off('portal_import_job_progress', on_import_progress);
+                            import_progress_dialog.hide();
+                            frappe.show_alert({ message: r.message.message, indicator: 'blue' }, 5);
                         }
-                    }, 1000);
+                    } else {
+                        frappe.realtime.off('portal_import_job_progress', on_import_progress);
+                        import_progress_dialog.hide();
+                        frappe.msgprint({
+                            title: __('Import Failed'),
+                            message: r.message ? r.message.message : __('Unknown error occurred'),
+                            indicator: 'red'
+                        });
+                    }
                 },
                 error: function(err) {
+                    frappe.realtime.off('portal_import_job_progress', on_import_progress);
                     import_progress_dialog.hide();
                     frappe.msgprint({
                         title: __('Import Error'),
@@ -2379,6 +2421,7 @@ window.show_advanced_portal_dashboard = function() {
                 if (r.message && r.message.status === 'success') {
                     const requisitions = r.message.data || [];
                     const pagination = r.message.pagination || {};
+                    requisitions_next_cursor = pagination.next_cursor || null;
                     
                     // Show success alert briefly
                     frappe.show_alert({
@@ -3204,6 +3247,9 @@ function generate_statistics_html(stats) {
     `;
 }
 
+// Keyset cursor of the next requisitions page, see get_recent_purchase_requisitions
+let requisitions_next_cursor = null;
+
 // Load More Requisitions Function
 function load_more_requisitions(dialog, current_invoices) {
     console.log("📥 Loading more requisitions...");
@@ -3213,20 +3259,30 @@ function load_more_requisitions(dialog, current_invoices) {
     const originalText = $loadMoreBtn.html();
     $loadMoreBtn.prop('disabled', true).html('⏳ Loading...');
     
-    // Calculate current offset
     const current_count = current_invoices.length;
     const load_count = 300;
     
+    if (!requisitions_next_cursor) {
+        frappe.show_alert({
+            message: __('No more records to load'),
+            indicator: 'orange'
+        });
+        $loadMoreBtn.prop('disabled', true).html('📭 No More Records');
+        return;
+    }
+    
+    // Continue after the last loaded row, deep pages cost the same as the first
     frappe.call({
         method: 'o2o_erpnext.api.php_portal_invoices.get_recent_purchase_requisitions',
         args: { 
             limit: load_count,
-            offset: current_count 
+            cursor: requisitions_next_cursor
         },
         callback: function(r) {
             if (r.message && r.message.status === 'success') {
                 const new_requisitions = r.message.data || [];
                 const pagination = r.message.pagination || {};
+                requisitions_next_cursor = pagination.next_cursor || null;
                 
                 if (new_requisitions.length === 0) {
                     frappe.show_alert({
@@ -3256,7 +3312,11 @@ function load_more_requisitions(dialog, current_invoices) {
                 
                 // Update button text with new count
                 const total_loaded = current_count + new_requisitions.length;
-                $loadMoreBtn.prop('disabled', false).html(`📥 Load More Records (+300) | Loaded: ${total_loaded}`);
+                if (requisitions_next_cursor) {
+                    $loadMoreBtn.prop('disabled', false).html(`📥 Load More Records (+300) | Loaded: ${total_loaded}`);
+                } else {
+                    $loadMoreBtn.prop('disabled', true).html(`📭 No More Records | Loaded: ${total_loaded}`);
+                }
                 
                 // Show success message
                 frappe.show_alert({
@@ -13,10 +13,13 @@ from decimal import Decimal
 
 # Import our database connection module
 from o2o_erpnext.config.external_db_updated import get_external_db_connection
+from o2o_erpnext.sync.portal_outbox import enqueue_portal_push
+from o2o_erpnext.sync.portal_push import PortalPushPipeline
 
 def auto_push_invoice_on_submit(doc, method=None):
     """
-    Automatic push function called by ERPNext hooks on Purchase Invoice submission
+    Automatic push function called by ERPNext hooks on Purchase Invoice submission.
+    Only adds the push to the Portal Push Outbox, so the submit does not wait on the portal.
     
     Args:
         doc: Purchase Invoice document being submitted
@@ -31,19 +34,10 @@ def auto_push_invoice_on_submit(doc, method=None):
         frappe.logger().info(f"Skipping external sync for invoice {doc.name} - sync disabled by user")
         return
     
-    try:
-        # Call the main push function
-        result = push_invoice_to_procureuat(doc.name, force_update=False)
-        
-        if result['success']:
-            frappe.logger().info(f"Successfully auto-pushed invoice {doc.name} to portal on submission")
-        else:
-            # Log the error but don't fail the submission
-            frappe.logger().warning(f"Failed to auto-push invoice {doc.name} to portal: {result['message']}")
-            
-    except Exception as e:
-        # Log the error but don't fail the submission
-        frappe.logger().error(f"Error auto-pushing invoice {doc.name} to portal: {str(e)}")
+    # Queue the push in the submit transaction; the outbox dispatcher pushes
+    # the invoice once the submit has committed
+    if enqueue_portal_push(doc, 'Push to ProcureUAT'):
+        frappe.logger().info(f"Queued invoice {doc.name} for push to portal on submission")
 
 @frappe.whitelist()
 def push_invoice_to_procureuat(invoice_name, force_update=False):
@@ -798,27 +792,9 @@ def sync_multiple_invoices(invoice_names):
         if isinstance(invoice_names, str):
             invoice_names = json.loads(invoice_names)
         
-        results = []
-        success_count = 0
-        failed_count = 0
-        
-        for invoice_name in invoice_names:
-            try:
-                result = push_invoice_to_procureuat(invoice_name)
-                results.append(result)
-                
-                if result['success']:
-                    success_count += 1
-                else:
-                    failed_count += 1
-                    
-            except Exception as e:
-                failed_count += 1
-                results.append({
-                    'success': False,
-                    'message': f"Error: {str(e)}",
-                    'invoice_name': invoice_name
-                })
+        results = ProcureUATPushPipeline().run(invoice_names)
+        success_count = sum(1 for result in results if result['success'])
+        failed_count = len(results) - success_count
         
         return {
             'success': failed_count == 0,
@@ -833,4 +809,59 @@ def sync_multiple_invoices(invoice_names):
         return {
             'success': False,
             'message': f"Bulk sync failed: {str(e)}"
-        }
\ No newline at end of file
+        }
+
+class ProcureUATPushPipeline(PortalPushPipeline):
+    """
+    Batched push_invoice_to_procureuat: invoices are matched by ERPNext
+    invoice number (order_code), then by supplier invoice number
+    """
+    
+    key_column = 'order_code'
+    
+    # Match columns as reported by check_invoice_exists_in_portal()
+    match_types = {'order_code': 'erpnext_invoice_number', 'invoice_number': 'supplier_invoice_number'}
+    
+    def __init__(self, force_update=False, chunk_size=None):
+        super().__init__(force_update=force_update, chunk_size=chunk_size)
+        create_sync_custom_fields()
+    
+    def validate(self, doc):
+        validation = validate_invoice_for_push(doc)
+        return None if validation['valid'] else validation['message']
+    
+    def match_keys(self, doc):
+        return [('order_code', doc.name), ('invoice_number', doc.get('bill_no'))]
+    
+    def transform(self, doc):
+        return transform_invoice_to_portal_format(doc)
+    
+    def mark_synced(self, doc, portal_id, operation):
+        frappe.db.set_value('Purchase Invoice', doc.name, {
+            'custom_portal_sync_id': portal_id,
+            'custom_portal_sync_status': 'Synced',
+            'custom_portal_sync_date': datetime.now(),
+            'custom_portal_sync_operation': operation
+        })
+    
+    def pushed_result(self, doc, portal_id, operation):
+        return {
+            'success': True,
+            'message': f'Invoice {operation} successfully in portal with ID {portal_id}',
+            'invoice_name': doc.name,
+            'portal_record_id': portal_id,
+            'portal_status': 'active',
+            'operation': operation,
+            'notes': f'Successfully pushed to purchase_requisitions table'
+        }
+    
+    def duplicate_result(self, doc, match):
+        match = dict(match, match_type=self.match_types[match['match_type']])
+        match_info = f"Duplicate found by {match['match_type']}: '{match['match_value']}'"
+        return {
+            'success': False,
+            'message': f'Invoice already exists in portal with ID {match["portal_id"]}. {match_info}. Use force_update=True to override.',
+            'invoice_name': doc.name,
+            'portal_record_id': match['portal_id'],
+            'duplicate_match': dict(match, exists=True)
+        }
@@ -11,7 +11,7 @@ import json
 # Import our updated modules
 from o2o_erpnext.config.external_db_updated import (
     get_external_db_connection,
-    get_procureuat_purchase_requisitions,
+    iter_procureuat_purchase_requisitions,
     get_procureuat_purchase_order_items
 )
 from o2o_erpnext.config.field_mappings_sql_based import (
@@ -87,7 +87,10 @@ def create_new_erpnext_invoice(order_data, sync_log):
         if not invoice.supplier:
             raise frappe.ValidationError("Could not determine supplier from ProcureUAT data")
         
-        invoice.posting_date = getdate(requisition['created_at']) if requisition['created_at'] else getdate()
+        # Same day as PORTAL_INVOICE_DATE_SQL, which invoice reconciliation buckets by
+        invoice_date = requisition.get('requisition_at') or requisition['created_at']
+        invoice.posting_date = getdate(invoice_date) if invoice_date else getdate()
+        invoice.set_posting_time = 1
         invoice.due_date = getdate(requisition['delivery_date']) if requisition['delivery_date'] else None
         invoice.bill_no = requisition.get('invoice_number')
         invoice.bill_date = getdate(requisition['invoice_generated_at']) if requisition.get('invoice_generated_at') else None
@@ -368,14 +371,16 @@ def sync_orders_from_procureuat(limit=10, filters=None):
         if isinstance(filters, str):
             filters = json.loads(filters) if filters else {}
         
-        # Get orders from ProcureUAT
-        orders = get_procureuat_purchase_requisitions(limit=limit, filters=filters)
+        # Stream orders from ProcureUAT
+        orders = iter_procureuat_purchase_requisitions(limit=limit, filters=filters)
         
         results = []
+        total = 0
         success_count = 0
         failed_count = 0
         
         for order in orders:
+            total += 1
             try:
                 result = sync_order_from_procureuat(order['id'])
                 results.append(result)
@@ -395,7 +400,7 @@ def sync_orders_from_procureuat(limit=10, filters=None):
         
         return {
             'success': failed_count == 0,
-            'total': len(orders),
+            'total': total,
             'success_count': success_count,
             'failed_count': failed_count,
             'results': results
@@ -0,0 +1,272 @@
+"""
+Portal Push Outbox Module
+Transactional outbox for the on-submit portal pushes
+
+Submitting a Purchase Invoice only inserts a Portal Push Outbox row, inside the
+submit transaction, so the submit never waits on the SSH tunnel or the portal
+database and a rolled back submit leaves no push behind. The dispatcher drains
+the outbox in batches through the batched push pipelines:
+
+- it is enqueued after every commit that added entries and runs every minute
+  from the scheduler for retries,
+- entries of one invoice are dispatched in insertion order, an entry waits
+  while an earlier one for the same invoice is still Pending or Processing,
+- failed entries are retried with exponential backoff and marked Failed
+  after portal_outbox_max_attempts,
+- entries are claimed (Pending -> Processing) and finished (Processing -> Done)
+  with conditional updates, so a second dispatcher never processes an entry
+  twice and the pipelines' existence checks make a re-run after a crash safe.
+"""
+
+import frappe
+
+from frappe import _
+from frappe.utils import add_to_date, cint, now_datetime
+
+# Outbox defaults - each can be overridden in site_config.json
+DEFAULT_OUTBOX_SETTINGS = {
+    'portal_outbox_batch_size': 100,   # Entries claimed per dispatch batch
+    'portal_outbox_max_attempts': 8,   # Attempts before an entry is marked Failed
+    'portal_outbox_base_delay': 60,    # Seconds before the first retry, doubled per attempt
+    'portal_outbox_max_delay': 3600,   # Upper bound of the retry delay
+    'portal_outbox_lock_timeout': 900  # Seconds before a crashed dispatcher's lock and claims expire
+}
+
+OUTBOX_LOCK_KEY = 'o2o_portal_outbox_dispatch'
+
+# Push pipeline of each outbox action
+OUTBOX_ACTIONS = {
+    'Create Remote Invoice': 'o2o_erpnext.api.remote_invoice_creator.RemoteInvoicePushPipeline',
+    'Push to ProcureUAT': 'o2o_erpnext.sync.erpnext_to_external_updated.ProcureUATPushPipeline'
+}
+
+
+def get_outbox_settings():
+    """
+    Get outbox settings from site config, falling back to defaults
+
+    Returns:
+        dict: Outbox settings
+    """
+    conf = frappe.conf or {}
+    return {key: conf.get(key, default) for key, default in DEFAULT_OUTBOX_SETTINGS.items()}
+
+
+def enqueue_portal_push(doc, action):
+    """
+    Add a portal push of a Purchase Invoice to the outbox, in the caller's transaction
+
+    Args:
+        doc: Purchase Invoice being submitted
+        action (str): Key of OUTBOX_ACTIONS
+
+    Returns:
+        str: Outbox entry name, or None when one is already waiting
+    """
+    if frappe.db.exists('Portal Push Outbox', {
+        'purchase_invoice': doc.name,
+        'action': action,
+        'status': ['in', ['Pending', 'Processing']]
+    }):
+        return None
+
+    entry = frappe.get_doc({
+        'doctype': 'Portal Push Outbox',
+        'purchase_invoice': doc.name,
+        'action': action,
+        'status': 'Pending'
+    }).insert(ignore_permissions=True)
+
+    # Dispatch right after the submit commits; the scheduler picks up anything missed
+    frappe.enqueue(
+        'o2o_erpnext.sync.portal_outbox.dispatch_portal_outbox',
+        queue='short',
+        job_id=OUTBOX_LOCK_KEY,
+        deduplicate=True,
+        enqueue_after_commit=True
+    )
+    return entry.name
+
+
+def dispatch_portal_outbox():
+    """
+    Drain the due outbox entries batch by batch. Runs from the scheduler and
+    after submits; a run that finds another dispatcher active returns at once.
+
+    Returns:
+        dict: Entries done, retried and failed by this run
+    """
+    settings = get_outbox_settings()
+    cache = frappe.cache()
+    lock_timeout = cint(settings['portal_outbox_lock_timeout'])
+    if not cache.set(cache.make_key(OUTBOX_LOCK_KEY), 1, nx=True, ex=lock_timeout):
+        return {'done': 0, 'retried': 0, 'failed': 0}
+
+    counts = {'done': 0, 'retried': 0, 'failed': 0}
+    try:
+        release_stale_claims(lock_timeout)
+        while True:
+            entries = claim_due_entries(cint(settings['portal_outbox_batch_size']))
+            if not entries:
+                break
+            for key, value in dispatch_entries(entries, settings).items():
+                counts[key] += value
+    finally:
+        cache.delete_value(OUTBOX_LOCK_KEY)
+
+    return counts
+
+
+def release_stale_claims(lock_timeout):
+    """Return entries left Processing by a crashed dispatcher to Pending"""
+    frappe.db.sql("""
+        UPDATE `tabPortal Push Outbox`
+        SET status = 'Pending'
+        WHERE status = 'Processing' AND modified < %s
+    """, (add_to_date(now_datetime(), seconds=-lock_timeout),))
+    frappe.db.commit()
+
+
+def claim_due_entries(limit):
+    """
+    Claim the due entries that are first in line for their invoice
+
+    Returns:
+        list: Claimed entries (name, purchase_invoice, action, attempts)
+    """
+    entries = frappe.db.sql("""
+        SELECT o.name, o.purchase_invoice, o.action, o.attempts
+        FROM `tabPortal Push Outbox` o
+        WHERE o.status = 'Pending'
+        AND (o.next_attempt_at IS NULL OR o.next_attempt_at <= %(now)s)
+        AND NOT EXISTS (
+            SELECT 1 FROM `tabPortal Push Outbox` earlier
+            WHERE earlier.purchase_invoice = o.purchase_invoice
+            AND earlier.status IN ('Pending', 'Processing')
+            AND earlier.name < o.name
+        )
+        ORDER BY o.name
+        LIMIT %(limit)s
+    """, {'now': now_datetime(), 'limit': limit}, as_dict=True)
+
+    if not entries:
+        return []
+
+    # The claim time tags this run's claims; entries claimed meanwhile by
+    # another dispatcher are left out
+    claimed_at = now_datetime()
+    names = [entry.name for entry in entries]
+    frappe.db.sql("""
+        UPDATE `tabPortal Push Outbox`
+        SET status = 'Processing', modified = %(claimed_at)s
+        WHERE name IN %(names)s AND status = 'Pending'
+    """, {'claimed_at': claimed_at, 'names': names})
+    claimed_names = set(frappe.db.sql_list("""
+        SELECT name FROM `tabPortal Push Outbox`
+        WHERE name IN %(names)s AND status = 'Processing' AND modified = %(claimed_at)s
+    """, {'claimed_at': claimed_at, 'names': names}))
+    frappe.db.commit()
+
+    return [entry for entry in entries if entry.name in claimed_names]
+
+
+def dispatch_entries(entries, settings):
+    """
+    Push the invoices of claimed entries, one pipeline run per action
+
+    Returns:
+        dict: done, retried and failed counts
+    """
+    counts = {'done': 0, 'retried': 0, 'failed': 0}
+    by_action = {}
+    for entry in entries:
+        by_action.setdefault(entry.action, []).append(entry)
+
+    for action, action_entries in by_action.items():
+        try:
+            pipeline = frappe.get_attr(OUTBOX_ACTIONS[action])()
+            results = pipeline.run([entry.purchase_invoice for entry in action_entries])
+        except Exception as e:
+            results = [{'success': False, 'message': str(e)} for entry in action_entries]
+
+        for entry, result in zip(action_entries, results):
+            status = finish_entry(entry, result, settings)
+            counts['done' if status == 'Done' else 'failed' if status == 'Failed' else 'retried'] += 1
+
+    frappe.db.commit()
+    return counts
+
+
+def finish_entry(entry, result, settings):
+    """
+    Record the outcome of an entry; only an entry still Processing is updated
+
+    A push that finds a portal row whose order_code is this invoice's name
+    counts as done, as it means an earlier attempt went through. A match on
+    the supplier's bill_no may be another supplier's invoice, so it is
+    retried and ends Failed like any other error.
+
+    Returns:
+        str: New status
+    """
+    now = now_datetime()
+    message = (result.get('message') or '')[:1000]
+
+    duplicate = result.get('duplicate_match') or {}
+    if result.get('success') or duplicate.get('match_type') == 'erpnext_invoice_number':
+        values = {'status': 'Done', 'processed_at': now, 'result': message, 'last_error': None}
+    else:
+        attempts = cint(entry.attempts) + 1
+        if attempts >= cint(settings['portal_outbox_max_attempts']):
+            values = {'status': 'Failed', 'attempts': attempts, 'processed_at': now, 'last_error': message}
+        else:
+            delay = min(
+                cint(settings['portal_outbox_base_delay']) * 2 ** (attempts - 1),
+                cint(settings['portal_outbox_max_delay'])
+            )
+            values = {
+                'status': 'Pending',
+                'attempts': attempts,
+                'next_attempt_at': add_to_date(now, seconds=delay),
+                'last_error': message
+            }
+
+    assignments = ', '.join(f"`{field}` = %({field})s" for field in values)
+    frappe.db.sql(f"""
+        UPDATE `tabPortal Push Outbox`
+        SET {assignments}, modified = %(modified)s
+        WHERE name = %(name)s AND status = 'Processing'
+    """, dict(values, modified=now, name=entry.name))
+    return values['status']
+
+
+@frappe.whitelist()
+def retry_outbox_entry(name):
+    """
+    Put a Failed outbox entry back in line
+
+    Args:
+        name (str): Portal Push Outbox entry
+
+    Returns:
+        dict: Operation result
+    """
+    frappe.only_for('System Manager')
+
+    status = frappe.db.get_value('Portal Push Outbox', name, 'status')
+    if status != 'Failed':
+        return {'success': False, 'message': _('Only Failed entries can be retried')}
+
+    frappe.db.set_value('Portal Push Outbox', name, {
+        'status': 'Pending',
+        'attempts': 0,
+        'next_attempt_at': None
+    })
+    frappe.enqueue(
+        'o2o_erpnext.sync.portal_outbox.dispatch_portal_outbox',
+        queue='short',
+        job_id=OUTBOX_LOCK_KEY,
+        deduplicate=True,
+        enqueue_after_commit=True
+    )
+    return {'success': True, 'message': _('Entry queued for dispatch')}
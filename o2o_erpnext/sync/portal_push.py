@@ -0,0 +1,322 @@
+"""
+Portal Push Module
+Batched push of ERPNext Purchase Invoices into portal purchase_requisitions
+
+A push run holds one pooled portal connection and works through the invoices
+in chunks. Per chunk it:
+- checks which invoices already exist with one IN query per match column,
+- inserts the new ones with a multi-row INSERT (executemany),
+- updates the existing ones (force_update) with a multi-row
+  INSERT ... ON DUPLICATE KEY UPDATE on the primary key,
+- commits the portal once and then the ERPNext sync status once.
+When a chunk's multi-row statement fails, the chunk is rolled back and retried
+row by row, so a bad invoice fails alone and every invoice gets its own result.
+
+The push paths (push_multiple_invoices, sync_multiple_invoices and
+batch_sync_invoices) keep their own validation, field mapping and result
+format by subclassing PortalPushPipeline.
+"""
+
+import frappe
+import pymysql.cursors
+
+from frappe.utils import cint
+
+from o2o_erpnext.config.external_db_updated import get_external_db_connection
+
+# Push defaults - each can be overridden in site_config.json
+DEFAULT_PUSH_SETTINGS = {
+    'portal_push_chunk_size': 200  # Invoices written and committed together
+}
+
+
+def get_push_settings():
+    """
+    Get push settings from site config, falling back to defaults
+
+    Returns:
+        dict: Push settings
+    """
+    conf = frappe.conf or {}
+    return {key: conf.get(key, default) for key, default in DEFAULT_PUSH_SETTINGS.items()}
+
+
+class PortalPushPipeline:
+    """
+    Batched push of Purchase Invoices to purchase_requisitions
+
+    Subclasses provide the push path's rules through the hooks below.
+
+    Usage:
+        results = MyPushPipeline(force_update=True).run(invoice_names)
+    """
+
+    # purchase_requisitions column holding the ERPNext invoice name, used to
+    # read back the ids of inserted rows
+    key_column = 'order_code'
+
+    def __init__(self, force_update=False, chunk_size=None):
+        self.force_update = cint(force_update)
+        self.chunk_size = cint(chunk_size or get_push_settings()['portal_push_chunk_size']) or 1
+
+    # Hooks
+
+    def skip(self, doc):
+        """Result for an invoice that needs no push, or None"""
+        return None
+
+    def prepare_chunk(self, docs, cursor):
+        """Bulk lookups the validation of a chunk needs (optional)"""
+
+    def validate(self, doc):
+        """Validation error message of an invoice, or None when it can be pushed"""
+        return None
+
+    def match_keys(self, doc):
+        """(column, value) pairs identifying an existing portal row, in priority order"""
+        return [(self.key_column, doc.name)]
+
+    def transform(self, doc):
+        """purchase_requisitions row of an invoice"""
+        raise NotImplementedError
+
+    def mark_synced(self, doc, portal_id, operation):
+        """Record the push on the ERPNext invoice, committed with the chunk"""
+
+    def pushed_result(self, doc, portal_id, operation):
+        return {
+            'success': True,
+            'message': f'Invoice {operation} successfully in portal with ID {portal_id}',
+            'invoice_name': doc.name,
+            'portal_id': portal_id,
+            'operation': operation
+        }
+
+    def duplicate_result(self, doc, match):
+        return {
+            'success': False,
+            'message': f'Invoice already exists in portal with ID {match["portal_id"]}. Use force_update=True to override.',
+            'invoice_name': doc.name,
+            'portal_id': match['portal_id']
+        }
+
+    def failed_result(self, invoice_name, message):
+        return {
+            'success': False,
+            'message': message,
+            'invoice_name': invoice_name
+        }
+
+    # Pipeline
+
+    def run(self, invoice_names):
+        """
+        Push invoices to the portal
+
+        Args:
+            invoice_names (list): Purchase Invoice names
+
+        Returns:
+            list: One result per invoice, in input order
+        """
+        results = {}
+        with get_external_db_connection() as conn:
+            for start in range(0, len(invoice_names), self.chunk_size):
+                chunk = invoice_names[start:start + self.chunk_size]
+                try:
+                    results.update(self.push_chunk(conn, chunk))
+                except Exception as e:
+                    conn.rollback()
+                    frappe.db.rollback()
+                    frappe.logger().error(f"Portal push chunk failed: {str(e)}")
+                    for invoice_name in chunk:
+                        results.setdefault(invoice_name, self.failed_result(invoice_name, f'Error pushing invoice: {str(e)}'))
+
+        return [results[invoice_name] for invoice_name in invoice_names]
+
+    def push_chunk(self, conn, invoice_names):
+        results, docs = {}, []
+        for invoice_name in invoice_names:
+            try:
+                doc = frappe.get_doc('Purchase Invoice', invoice_name)
+            except frappe.DoesNotExistError:
+                results[invoice_name] = self.failed_result(invoice_name, f'Purchase Invoice {invoice_name} not found')
+                continue
+
+            skipped = self.skip(doc)
+            if skipped:
+                results[invoice_name] = skipped
+            else:
+                docs.append(doc)
+
+        if not docs:
+            return results
+
+        with conn.cursor(pymysql.cursors.DictCursor) as cursor:
+            self.prepare_chunk(docs, cursor)
+
+            to_push = []
+            for doc in docs:
+                error = self.validate(doc)
+                if error:
+                    results[doc.name] = self.failed_result(doc.name, f'Validation failed: {error}')
+                else:
+                    to_push.append(doc)
+
+            inserts, updates = [], []
+            for doc, match in zip(to_push, self.find_existing(cursor, to_push)):
+                if not match:
+                    inserts.append(doc)
+                elif match.get('duplicate_of'):
+                    results[doc.name] = self.failed_result(
+                        doc.name, f"Invoice duplicates {match['duplicate_of']} by {match['match_type']} in this batch"
+                    )
+                elif self.force_update:
+                    updates.append((doc, match['portal_id']))
+                else:
+                    results[doc.name] = self.duplicate_result(doc, match)
+
+            rows = {}
+            for doc in inserts + [doc for doc, portal_id in updates]:
+                try:
+                    rows[doc.name] = self.transform(doc)
+                except Exception as e:
+                    results[doc.name] = self.failed_result(doc.name, f'Error pushing invoice: {str(e)}')
+            inserts = [doc for doc in inserts if doc.name in rows]
+            updates = [(doc, portal_id) for doc, portal_id in updates if doc.name in rows]
+
+            try:
+                pushed = self.write_rows(cursor, inserts, updates, rows)
+                conn.commit()
+            except Exception as e:
+                conn.rollback()
+                frappe.logger().warning(f"Multi-row portal push failed, retrying row by row: {str(e)}")
+                pushed = {}
+                for doc in inserts:
+                    pushed.update(self.write_one(conn, cursor, doc, None, rows, results))
+                for doc, portal_id in updates:
+                    pushed.update(self.write_one(conn, cursor, doc, portal_id, rows, results))
+
+        for doc in inserts + [doc for doc, portal_id in updates]:
+            if doc.name not in pushed:
+                continue
+            portal_id, operation = pushed[doc.name]
+            self.mark_synced(doc, portal_id, operation)
+            results[doc.name] = self.pushed_result(doc, portal_id, operation)
+        frappe.db.commit()
+
+        return results
+
+    def find_existing(self, cursor, docs):
+        """
+        Resolve existing portal rows of a chunk with one IN query per match column
+
+        Invoices sharing a key with an earlier invoice of the chunk match that
+        invoice, so a chunk never inserts the same key twice.
+
+        Returns:
+            list: Match dict (portal_id, match_type, match_value) or None, per doc
+        """
+        values_by_column = {}
+        for doc in docs:
+            for column, value in self.match_keys(doc):
+                if value:
+                    values_by_column.setdefault(column, set()).add(value)
+
+        existing = {}
+        for column, values in values_by_column.items():
+            values = list(values)
+            for start in range(0, len(values), 1000):
+                batch = values[start:start + 1000]
+                cursor.execute(
+                    f"SELECT id, `{column}` as match_value FROM purchase_requisitions "
+                    f"WHERE is_delete = 0 AND `{column}` IN ({', '.join(['%s'] * len(batch))})",
+                    batch
+                )
+                for row in cursor.fetchall():
+                    existing.setdefault((column, row['match_value']), row['id'])
+
+        matches, claimed = [], {}
+        for doc in docs:
+            match = None
+            for column, value in self.match_keys(doc):
+                if not value:
+                    continue
+                if (column, value) in existing:
+                    match = {'portal_id': existing[(column, value)], 'match_type': column, 'match_value': value}
+                    break
+                if (column, value) in claimed:
+                    match = {'portal_id': None, 'match_type': column, 'match_value': value,
+                             'duplicate_of': claimed[(column, value)]}
+                    break
+            if not match:
+                for column, value in self.match_keys(doc):
+                    if value:
+                        claimed[(column, value)] = doc.name
+            matches.append(match)
+        return matches
+
+    def write_rows(self, cursor, inserts, updates, rows):
+        """
+        Write a chunk with one multi-row statement per column layout
+
+        Returns:
+            dict: (portal_id, operation) by invoice name
+        """
+        pushed = {}
+
+        for columns, docs in self.group_by_columns(inserts, rows).items():
+            cursor.executemany(
+                f"INSERT INTO purchase_requisitions ({', '.join(f'`{c}`' for c in columns)}) "
+                f"VALUES ({', '.join(['%s'] * len(columns))})",
+                [[rows[doc.name][c] for c in columns] for doc in docs]
+            )
+        if inserts:
+            inserted_ids = self.inserted_ids(cursor, [doc.name for doc in inserts])
+            for doc in inserts:
+                pushed[doc.name] = (inserted_ids[doc.name], 'created')
+
+        update_docs = [doc for doc, portal_id in updates]
+        portal_ids = {doc.name: portal_id for doc, portal_id in updates}
+        for columns, docs in self.group_by_columns(update_docs, rows).items():
+            cursor.executemany(
+                f"INSERT INTO purchase_requisitions (`id`, {', '.join(f'`{c}`' for c in columns)}) "
+                f"VALUES (%s, {', '.join(['%s'] * len(columns))}) "
+                f"ON DUPLICATE KEY UPDATE {', '.join(f'`{c}` = VALUES(`{c}`)' for c in columns)}",
+                [[portal_ids[doc.name]] + [rows[doc.name][c] for c in columns] for doc in docs]
+            )
+            for doc in docs:
+                pushed[doc.name] = (portal_ids[doc.name], 'updated')
+
+        return pushed
+
+    def write_one(self, conn, cursor, doc, portal_id, rows, results):
+        """Write and commit a single invoice, recording its failure in results"""
+        try:
+            if portal_id:
+                pushed = self.write_rows(cursor, [], [(doc, portal_id)], rows)
+            else:
+                pushed = self.write_rows(cursor, [doc], [], rows)
+            conn.commit()
+            return pushed
+        except Exception as e:
+            conn.rollback()
+            results[doc.name] = self.failed_result(doc.name, f'Error pushing invoice: {str(e)}')
+            return {}
+
+    @staticmethod
+    def group_by_columns(docs, rows):
+        groups = {}
+        for doc in docs:
+            groups.setdefault(tuple(rows[doc.name]), []).append(doc)
+        return groups
+
+    def inserted_ids(self, cursor, invoice_names):
+        """Ids of the rows just inserted, read back by key column (newest row per key)"""
+        cursor.execute(
+            f"SELECT `{self.key_column}` as invoice_name, MAX(id) as id FROM purchase_requisitions "
+            f"WHERE is_delete = 0 AND `{self.key_column}` IN ({', '.join(['%s'] * len(invoice_names))}) "
+            f"GROUP BY `{self.key_column}`",
+            invoice_names
+        )
+        return {row['invoice_name']: row['id'] for row in cursor.fetchall()}
@@ -0,0 +1,267 @@
+"""
+Portal Sync Cursor Module
+Keyset cursor over portal purchase_requisitions, persisted per Database
+Connection and sync type in the Portal Sync Cursor doctype
+
+Rows are read in (updated_at, id) order strictly after the stored position,
+a range scan on the idx_pr_updated_at_id portal index (bench o2o-portal-indexes),
+so a run costs O(changed rows) and a backlog larger than one batch is drained
+over successive batches instead of being skipped. Rows without updated_at
+are backfilled from created_at at the start of each run. The cursor is
+advanced inside the transaction of each batch, right before the caller
+commits it.
+
+Rows that failed to sync are kept in the cursor's retry list and read again,
+before the new rows, at the start of the next run until they go through.
+"""
+
+import json
+
+
+import frappe
+import pymysql.cursors
+
+from contextlib import contextmanager
+from frappe import _
+from frappe.utils import now_datetime
+
+from o2o_erpnext.config.external_db_updated import (
+    get_active_database_connection,
+    get_external_db_connection
+)
+from o2o_erpnext.config.portal_indexes import backfill_requisition_updated_at
+
+# Sync cursor defaults - each can be overridden in site_config.json
+DEFAULT_SYNC_CURSOR_SETTINGS = {
+    'portal_sync_batch_size': 50,         # Rows fetched and committed together
+    'portal_sync_max_rows_per_run': 5000,  # Bound for one scheduled run, the rest waits for the next
+    'portal_sync_lock_timeout': 3600      # Seconds before a crashed run's lock expires
+}
+
+SYNC_CURSOR_LOCK_KEY = 'o2o_portal_sync_cursor_lock'
+
+# Change timestamp of a requisition, kept NOT NULL by backfill_requisition_updated_at
+SYNC_TIMESTAMP = "pr.updated_at"
+
+
+class PortalSyncInProgress(Exception):
+    """Raised when another worker is already running the same sync"""
+
+
+def get_sync_cursor_settings():
+    """
+    Get sync cursor settings from site config, falling back to defaults
+
+    Returns:
+        dict: Sync cursor settings
+    """
+    conf = frappe.conf or {}
+    return {key: conf.get(key, default) for key, default in DEFAULT_SYNC_CURSOR_SETTINGS.items()}
+
+
+def get_sync_cursor(sync_type, connection_name=None):
+    """
+    Get the sync cursor of a connection, creating it at the start of the table
+
+    Args:
+        sync_type (str): 'Invoice Import' or 'Order Sync'
+        connection_name (str): Database Connection, defaults to the active one
+
+    Returns:
+        Document: Portal Sync Cursor
+    """
+    connection_name = connection_name or get_active_database_connection()['name']
+    if not frappe.db.exists('Database Connection', connection_name):
+        frappe.throw(_("Incremental portal sync needs an active Database Connection record"))
+
+    name = frappe.db.get_value('Portal Sync Cursor', {
+        'database_connection': connection_name,
+        'sync_type': sync_type
+    })
+    if name:
+        return frappe.get_doc('Portal Sync Cursor', name)
+
+    return frappe.get_doc({
+        'doctype': 'Portal Sync Cursor',
+        'database_connection': connection_name,
+        'sync_type': sync_type
+    }).insert(ignore_permissions=True)
+
+
+@contextmanager
+def locked_sync_cursor(sync_type, connection_name=None):
+    """
+    Hold the sync cursor exclusively for one run
+
+    Args:
+        sync_type (str): 'Invoice Import' or 'Order Sync'
+        connection_name (str): Database Connection, defaults to the active one
+
+    Yields:
+        Document: Portal Sync Cursor
+
+    Raises:
+        PortalSyncInProgress: When another worker holds the cursor
+    """
+    sync_cursor = get_sync_cursor(sync_type, connection_name)
+    lock_key = f"{SYNC_CURSOR_LOCK_KEY}:{sync_cursor.name}"
+    cache = frappe.cache()
+
+    timeout = int(get_sync_cursor_settings()['portal_sync_lock_timeout'])
+    if not cache.set(cache.make_key(lock_key), 1, nx=True, ex=timeout):
+        raise PortalSyncInProgress(f"{sync_cursor.name} is already running")
+
+    try:
+        sync_cursor.db_set({'last_run_at': now_datetime(), 'last_run_count': 0})
+        frappe.db.commit()
+        yield sync_cursor
+    finally:
+        cache.delete_value(lock_key)
+
+
+def iter_requisitions_after_cursor(sync_cursor, columns, conditions=None, batch_size=None, limit=None):
+    """
+    Yield batches of purchase_requisitions rows to sync: first the rows of
+    the retry list, then the rows past the cursor
+
+    Each row carries sync_id, sync_timestamp and sync_retry in addition to
+    the selected columns. The cursor document itself is only moved by
+    advance_sync_cursor().
+
+    Args:
+        sync_cursor (Document): Portal Sync Cursor
+        columns (str): SELECT list over purchase_requisitions aliased as pr
+        conditions (list): Extra WHERE conditions
+        batch_size (int): Rows per batch
+        limit (int): Stop after this many rows
+
+    Yields:
+        list: Rows ordered by (sync_timestamp, sync_id)
+    """
+    settings = get_sync_cursor_settings()
+    batch_size = int(batch_size or settings['portal_sync_batch_size'])
+    remaining = int(limit) if limit else None
+
+    # Read from the primary: a lagging replica could let the cursor pass rows
+    with get_external_db_connection() as conn:
+        backfill_requisition_updated_at(conn)
+
+    retry_ids = get_retry_ids(sync_cursor)
+    for start in range(0, len(retry_ids), batch_size):
+        if remaining is not None and remaining <= 0:
+            return
+        ids = retry_ids[start:start + batch_size]
+        rows = fetch_requisitions(
+            columns,
+            list(conditions or []) + [f"pr.id IN ({', '.join(['%s'] * len(ids))})"],
+            ids,
+            retry=True
+        )
+
+        # Rows deleted or filtered out since they failed are dropped from the list
+        found = {row['sync_id'] for row in rows}
+        gone = [sync_id for sync_id in ids if sync_id not in found]
+        if gone:
+            set_retry_ids(sync_cursor, [sync_id for sync_id in get_retry_ids(sync_cursor) if sync_id not in gone])
+
+        if rows:
+            yield rows
+            if remaining is not None:
+                remaining -= len(rows)
+
+    last_timestamp = sync_cursor.last_updated_at
+    last_id = sync_cursor.last_id or 0
+
+    while remaining is None or remaining > 0:
+        where = list(conditions or [])
+        params = []
+        if last_timestamp:
+            where.append(f"({SYNC_TIMESTAMP}, pr.id) > (%s, %s)")
+            params.extend([last_timestamp, last_id])
+
+        rows = fetch_requisitions(
+            columns, where, params,
+            limit=min(batch_size, remaining) if remaining else batch_size
+        )
+        if not rows:
+            return
+
+        yield rows
+
+        last_timestamp, last_id = rows[-1]['sync_timestamp'], rows[-1]['sync_id']
+        if remaining is not None:
+            remaining -= len(rows)
+        if len(rows) < batch_size:
+            return
+
+
+def fetch_requisitions(columns, where, params, limit=None, retry=False):
+    """Rows of purchase_requisitions in cursor order, read from the primary"""
+    query = f"""
+        SELECT {columns}, pr.id as sync_id, {SYNC_TIMESTAMP} as sync_timestamp, {1 if retry else 0} as sync_retry
+        FROM purchase_requisitions pr
+        {'WHERE ' + ' AND '.join(where) if where else ''}
+        ORDER BY {SYNC_TIMESTAMP}, pr.id
+        {'LIMIT %s' if limit else ''}
+    """
+    params = list(params) + ([limit] if limit else [])
+
+    with get_external_db_connection() as conn:
+        with conn.cursor(pymysql.cursors.DictCursor) as cursor:
+            cursor.execute(query, params)
+            return cursor.fetchall()
+
+
+def get_retry_ids(sync_cursor):
+    """
+    Returns:
+        list: Portal ids of rows waiting for another sync attempt
+    """
+    return json.loads(sync_cursor.retry_ids or '[]')
+
+
+def set_retry_ids(sync_cursor, retry_ids):
+    sync_cursor.db_set('retry_ids', json.dumps(sorted(set(retry_ids))) if retry_ids else None)
+
+
+def advance_sync_cursor(sync_cursor, rows, failed_ids=None):
+    """
+    Record a processed batch: move the cursor past its new rows and keep its
+    failed rows in the retry list. Call before committing the batch, so the
+    documents and the cursor are committed together.
+
+    Args:
+        sync_cursor (Document): Portal Sync Cursor
+        rows (list): Batch from iter_requisitions_after_cursor()
+        failed_ids (iterable): sync_id of the rows that failed
+    """
+    if not rows:
+        return
+
+    failed_ids = set(failed_ids or [])
+    attempted = {row['sync_id'] for row in rows}
+    retry_ids = [sync_id for sync_id in get_retry_ids(sync_cursor) if sync_id not in attempted]
+    set_retry_ids(sync_cursor, retry_ids + list(failed_ids))
+
+    values = {
+        'last_run_count': (sync_cursor.last_run_count or 0) + len(rows),
+        'total_synced': (sync_cursor.total_synced or 0) + len(attempted - failed_ids)
+    }
+    new_rows = [row for row in rows if not row.get('sync_retry')]
+    if new_rows:
+        values['last_id'] = new_rows[-1]['sync_id']
+        values['last_updated_at'] = new_rows[-1]['sync_timestamp']
+    sync_cursor.db_set(values)
+
+
+def reset_sync_cursor(sync_type, connection_name=None):
+    """
+    Move a cursor back to the start of the table, the next run resyncs everything
+
+    Args:
+        sync_type (str): 'Invoice Import' or 'Order Sync'
+        connection_name (str): Database Connection, defaults to the active one
+    """
+    sync_cursor = get_sync_cursor(sync_type, connection_name)
+    sync_cursor.db_set({'last_id': 0, 'last_updated_at': None, 'retry_ids': None})
+    frappe.db.commit()
@@ -9,6 +9,13 @@ import json
 from o2o_erpnext.config.external_db_updated import test_external_connection, get_external_db_connection
 from o2o_erpnext.sync.erpnext_to_external_updated import sync_invoice_to_procureuat, sync_multiple_invoices
 from o2o_erpnext.sync.external_to_erpnext_updated import sync_order_from_procureuat, sync_orders_from_procureuat
+from o2o_erpnext.sync.sync_cursor import (
+    PortalSyncInProgress,
+    advance_sync_cursor,
+    get_sync_cursor_settings,
+    iter_requisitions_after_cursor,
+    locked_sync_cursor
+)
 
 # Connection Testing Functions
 
@@ -50,53 +57,42 @@ def get_external_database_info(connection_name="ProcureUAT"):
         dict: Database information
     """
     try:
-        from o2o_erpnext.config.external_db_updated import get_external_db_connection
+        from o2o_erpnext.config.external_db_updated import run_portal_queries
+        
+        rows = run_portal_queries({
+            # Get database version and basic info
+            'db_info': "SELECT VERSION() as version, DATABASE() as database_name, NOW() as current_time",
+            # Get invoices table info
+            'invoice_columns': "DESCRIBE invoices",
+            # Get vendors table info
+            'vendor_columns': "DESCRIBE vendors",
+            # Get record counts
+            'invoice_count': "SELECT COUNT(*) as count FROM invoices",
+            'vendor_count': "SELECT COUNT(*) as count FROM vendors",
+            # Get recent invoices
+            'recent_invoices': """
+                SELECT id, invoice_number, invoice_date, total_amount, payment_status, vendor_id
+                FROM invoices 
+                ORDER BY updated_at DESC 
+                LIMIT 5
+            """
+        })
         
-        with get_external_db_connection(connection_name) as conn:
-            with conn.cursor() as cursor:
-                # Get database version and basic info
-                cursor.execute("SELECT VERSION() as version, DATABASE() as database_name, NOW() as current_time")
-                db_info = cursor.fetchone()
-                
-                # Get invoices table info
-                cursor.execute("DESCRIBE invoices")
-                invoice_columns = cursor.fetchall()
-                
-                # Get vendors table info
-                cursor.execute("DESCRIBE vendors")
-                vendor_columns = cursor.fetchall()
-                
-                # Get record counts
-                cursor.execute("SELECT COUNT(*) as count FROM invoices")
-                invoice_count = cursor.fetchone()
-                
-                cursor.execute("SELECT COUNT(*) as count FROM vendors")
-                vendor_count = cursor.fetchone()
-                
-                # Get recent invoices
-                cursor.execute("""
-                    SELECT id, invoice_number, invoice_date, total_amount, payment_status, vendor_id
-                    FROM invoices 
-                    ORDER BY updated_at DESC 
-                    LIMIT 5
-                """)
-                recent_invoices = cursor.fetchall()
-                
-                return {
-                    'status': 'success',
-                    'data': {
-                        'database_info': db_info,
-                        'invoices_table': {
-                            'columns': invoice_columns,
-                            'count': invoice_count['count']
-                        },
-                        'vendors_table': {
-                            'columns': vendor_columns,
-                            'count': vendor_count['count']
-                        },
-                        'recent_invoices': recent_invoices
-                    }
-                }
+        return {
+            'status': 'success',
+            'data': {
+                'database_info': rows['db_info'][0],
+                'invoices_table': {
+                    'columns': rows['invoice_columns'],
+                    'count': rows['invoice_count'][0]['count']
+                },
+                'vendors_table': {
+                    'columns': rows['vendor_columns'],
+                    'count': rows['vendor_count'][0]['count']
+                },
+                'recent_invoices': rows['recent_invoices']
+            }
+        }
                 
     except Exception as e:
         return {
@@ -507,21 +503,18 @@ def sync_vendor_supplier_mappings():
         dict: Mapping sync results
     """
     try:
-        from o2o_erpnext.config.external_db_updated import get_external_db_connection
-        
-        with get_external_db_connection() as conn:
-            with conn.cursor() as cursor:
-                # Get all vendors from external database
-                cursor.execute("""
-                    SELECT id, vname, email, gstn, address
-                    FROM vendors
-                    WHERE vname IS NOT NULL AND vname != ''
-                    ORDER BY vname
-                """)
-                vendors = cursor.fetchall()
+        from o2o_erpnext.config.external_db_updated import stream_portal_query
+        
+        # Stream all vendors from external database
+        vendors = stream_portal_query("""
+            SELECT id, vname, email, gstn, address
+            FROM vendors
+            WHERE vname IS NOT NULL AND vname != ''
+            ORDER BY vname
+        """, read_only=True)
         
         results = {
-            'total_vendors': len(vendors),
+            'total_vendors': 0,
             'mapped': 0,
             'created': 0,
             'skipped': 0,
@@ -529,6 +522,7 @@ def sync_vendor_supplier_mappings():
         }
         
         for vendor in vendors:
+            results['total_vendors'] += 1
             try:
                 # Check if supplier already exists with this vendor ID
                 existing_supplier = frappe.get_all("Supplier",
@@ -605,17 +599,67 @@ def scheduled_sync_from_external():
     """
     Scheduled function to sync invoices from external database
     Called by Frappe scheduler
+    
+    Only requisitions past the Order Sync cursor are read, in committed
+    batches, so a run costs O(new rows) and a backlog is drained over runs.
     """
     try:
-        # Get last sync timestamp from system settings or default to 24 hours ago
-        from_date = add_days(nowdate(), -1)  # Last 24 hours
-        
-        result = sync_orders_from_procureuat(limit=50)
+        settings = get_sync_cursor_settings()
+        total = 0
+        success_count = 0
+        failed_count = 0
+        
+        with locked_sync_cursor('Order Sync') as sync_cursor:
+            batches = iter_requisitions_after_cursor(
+                sync_cursor,
+                "pr.invoice_number",
+                conditions=["pr.is_delete = 0"],
+                limit=settings['portal_sync_max_rows_per_run']
+            )
+            
+            for orders in batches:
+                failed_ids = []
+                for order in orders:
+                    total += 1
+                    try:
+                        result = sync_order_from_procureuat(order['sync_id'])
+                        if result['success']:
+                            success_count += 1
+                        else:
+                            failed_count += 1
+                            failed_ids.append(order['sync_id'])
+                    except Exception as e:
+                        failed_count += 1
+                        failed_ids.append(order['sync_id'])
+                        frappe.log_error(
+                            message=f"Scheduled sync of portal order {order['sync_id']} failed: {str(e)}",
+                            title="Scheduled External Sync Error"
+                        )
+                
+                # The cursor moves in the same transaction as the batch; failed
+                # orders stay in its retry list for the next run
+                advance_sync_cursor(sync_cursor, orders, failed_ids)
+                frappe.db.commit()
+        
+        result = {
+            'success': failed_count == 0,
+            'message': f"Synced {success_count} of {total} changed portal orders, {failed_count} failed",
+            'total': total,
+            'success_count': success_count,
+            'failed_count': failed_count
+        }
         
         frappe.logger().info(f"Scheduled external sync: {result['message']}")
         
         return result
         
+    except PortalSyncInProgress as e:
+        frappe.logger().info(f"Scheduled external sync skipped: {str(e)}")
+        return {
+            'status': 'skipped',
+            'message': str(e)
+        }
+        
     except Exception as e:
         frappe.logger().error(f"Scheduled external sync failed: {str(e)}")
         return {